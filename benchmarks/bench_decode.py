@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the table decode paths: XML (incremental ElementTree) versus JSON, eager versus lazy, on synthetic
+payloads. Every run ends with a sweep that reads objid and tags of every object, as a tag audit would.
+Run from the repository root: python -m benchmarks.bench_decode [items]
+"""
+
+from io import BytesIO
+import json
+import sys
+import time
+from xml.sax.saxutils import escape
+
+from prtg.client import Connection
+
+COLUMNS = ['objid', 'parentid', 'name', 'tags', 'active', 'status', 'device', 'group', 'probe', 'lastvalue']
+
+
+def build_items(total):
+    return [{'objid': str(3000 + i), 'parentid': str(2000 + i % 500), 'name': 'Ping {}'.format(i),
+             'tags': 'pingsensor tag{} site{}'.format(i % 300, i % 7), 'active': 'true',
+             'status': 'Up' if i % 9 else 'Down', 'device': 'device {}'.format(i % 500),
+             'group': 'group {}'.format(i % 40), 'probe': 'Local Probe', 'lastvalue': '{} msec'.format(i % 97)}
+            for i in range(total)]
+
+
+def build_xml(items):
+    out = ['<?xml version="1.0" encoding="UTF-8" ?><sensors totalcount="{}" listend="1">'.format(len(items)),
+           '<prtg-version>15.1.14.1609+</prtg-version>']
+    for item in items:
+        out.append('<item>' + ''.join('<{0}>{1}</{0}>'.format(k, escape(item[k])) for k in COLUMNS) + '</item>')
+    out.append('</sensors>')
+    return '\n'.join(out).encode('utf-8')
+
+
+def build_json(items):
+    return json.dumps({'prtg-version': '15.1.14.1609+', 'treesize': len(items), 'sensors': items}).encode('utf-8')
+
+
+def measure(output, payload, lazy=False, rounds=3):
+    conn = Connection()
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        objects, _, _ = conn._process_response(BytesIO(payload), output=output, lazy=lazy)
+        for obj in objects:
+            obj.objid, obj.tags
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(objects)
+
+
+def main(total=50000):
+    items = build_items(total)
+    for output, payload in (('xml', build_xml(items)), ('json', build_json(items))):
+        for mode, lazy in (('eager', False), ('lazy', True)):
+            elapsed, count = measure(output, payload, lazy)
+            print('{:>4} {:>5}: {:>10,} bytes  {:>7.3f} s  {:>9,.0f} objects/s'.format(
+                output, mode, len(payload), elapsed, count / elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
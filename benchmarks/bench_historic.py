@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the historic data decode path (historicdata.csv into NumPy arrays), on a synthetic payload.
+Run from the repository root: python -m benchmarks.bench_historic [samples]
+"""
+
+from datetime import datetime, timedelta
+import sys
+import time
+
+from prtg.historic import decode_csv
+from tests.fake_prtg import build_historic_csv
+
+
+def main(samples=2500000):
+    start = datetime(2016, 1, 1)
+    payload = build_historic_csv('1001', start, start + timedelta(minutes=samples))
+    began = time.perf_counter()
+    data = decode_csv(payload)
+    elapsed = time.perf_counter() - began
+    points = len(data) * (len(data.channels) + 1)
+    print('{:>12,} bytes  {:>10,} points  {:>7.3f} s  {:>12,.0f} points/s'.format(len(payload), points, elapsed,
+                                                                              points / elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
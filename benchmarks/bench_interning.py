@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the memory taken by decoded sensors with and without interning repeated values (prtg.client.Interner),
+on a synthetic fleet whose sensors share a few hundred tags and a few thousand parents.
+Run from the repository root: python -m benchmarks.bench_interning [sensors]
+"""
+
+from io import BytesIO
+import sys
+import time
+import tracemalloc
+from xml.sax.saxutils import escape
+
+from prtg.client import Connection, Interner
+
+COLUMNS = ['objid', 'parentid', 'name', 'tags', 'active', 'status', 'device', 'group', 'probe']
+
+
+def build_xml(total, devices=4000, tags=300):
+    out = ['<?xml version="1.0" encoding="UTF-8" ?><sensors totalcount="{}" listend="1">'.format(total),
+           '<prtg-version>15.1.14.1609+</prtg-version>']
+    for i in range(total):
+        device = i % devices
+        item = {'objid': str(10000 + i), 'parentid': str(2000 + device), 'name': 'Ping {}'.format(i),
+                'tags': 'pingsensor tag{} site{}'.format(device % tags, device % 7), 'active': 'true',
+                'status': 'Up' if i % 9 else 'Down', 'device': 'device {}'.format(device),
+                'group': 'group {}'.format(device % 40), 'probe': 'Probe {}'.format(device % 3)}
+        out.append('<item>' + ''.join('<{0}>{1}</{0}>'.format(k, escape(item[k])) for k in COLUMNS) + '</item>')
+    out.append('</sensors>')
+    return '\n'.join(out).encode('utf-8')
+
+
+def measure(payload, interner):
+    tracemalloc.start()
+    objects, _, _ = Connection(interner=interner)._process_response(BytesIO(payload))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    # Decode time without tracemalloc's overhead.
+    interner.clear()
+    start = time.perf_counter()
+    objects, _, _ = Connection(interner=interner)._process_response(BytesIO(payload))
+    elapsed = time.perf_counter() - start
+    return size, elapsed, len(objects)
+
+
+def main(total=200000):
+    payload = build_xml(total)
+    # An interner of size 0 keeps nothing, which is plain decoding.
+    for label, interner in (('plain', Interner(max_size=0)), ('interned', Interner())):
+        size, elapsed, count = measure(payload, interner)
+        print('{:>8}: {:>8.1f} MiB  {:>5.0f} bytes/sensor  {:>6.2f} s'.format(label, size / 2 ** 20, size / count,
+                                                                           elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
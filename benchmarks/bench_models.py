@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the model classes: memory and construction rate of the slotted record classes versus the previous
+dictionary-based ones (reproduced below as LegacySensor), for the default and the full sensor columns.
+Run from the repository root: python -m benchmarks.bench_models [objects]
+"""
+
+import sys
+import time
+import tracemalloc
+
+from prtg.models import PrtgObject, Sensor
+
+DEFAULT_COLUMNS = ['objid', 'parentid', 'name', 'tags', 'active', 'status']
+
+
+class LegacySensor(object):
+    """
+    Sensor as it was built before the record classes: a __dict__ per instance, filled field by field.
+    """
+
+    common_columns = frozenset(PrtgObject.column_table['all'])
+    columns = frozenset(PrtgObject.column_table['sensors'])
+
+    def __init__(self, **kwargs):
+        self.type = str(self.__class__.__name__)
+        for key in self.common_columns.intersection(kwargs):
+            value = kwargs[key]
+            if key == 'tags':
+                value = value.split(' ') if value else []
+            self.__setattr__(key, value)
+        for key in self.columns.intersection(kwargs):
+            self.__setattr__(key, kwargs[key])
+
+
+def build_items(total, columns):
+    return [dict((column, '{} {}'.format(column, i) if column != 'tags' else 'ta tb{}'.format(i % 3))
+                 for column in columns) for i in range(total)]
+
+
+def measure(build, items):
+    tracemalloc.start()
+    objects = [build(item) for item in items]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Construction rate without tracemalloc's overhead.
+    del objects
+    start = time.perf_counter()
+    objects = [build(item) for item in items]
+    elapsed = time.perf_counter() - start
+    return size, elapsed, len(objects)
+
+
+def main(total=100000):
+    full_columns = sorted(set(PrtgObject.column_table['all'] + PrtgObject.column_table['sensors']))
+    for name, columns in (('default', DEFAULT_COLUMNS), ('full', full_columns)):
+        items = build_items(total, columns)
+        for label, build in (('legacy', lambda item: LegacySensor(**item)), ('record', Sensor.build)):
+            size, elapsed, count = measure(build, items)
+            print('{:>7} columns, {:>6}: {:>7.0f} bytes/object  {:>10,.0f} objects/s'.format(
+                name, label, size / count, count / elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+Python library for Paessler's PRTG (http://www.paessler.com/)
+Asyncio client: the same prtg.models.Query objects and prtg.cache.Cache, without blocking the event loop.
+"""
+
+import asyncio
+from collections import deque
+from io import BytesIO
+import logging
+import time
+from urllib.error import HTTPError
+import urllib.parse
+
+from prtg.cache import Cache
+from prtg.client import Connection
+from prtg.exceptions import DeadlineExceeded
+from prtg.latency import Deadline
+from prtg.pool import ACCEPT_ENCODING, ConnectionPool, create_ssl_context, decompress
+from prtg.throttle import Limiter
+
+
+class AsyncConnectionPool(object):
+    """
+    Pool of persistent (keep-alive) HTTP/1.1 connections to a single PRTG node, built on asyncio streams. The pool
+    size is also the maximum number of requests in flight to the node. Unlike prtg.pool.ConnectionPool, it always
+    connects straight to the node: it ignores any HTTP(S) proxy set in the environment, and it does not follow
+    redirects (a 3xx answer raises HTTPError).
+    """
+
+    def __init__(self, endpoint, size=ConnectionPool.DEFAULT_SIZE, idle_timeout=ConnectionPool.DEFAULT_IDLE_TIMEOUT,
+                 timeout=None):
+        """
+        :param endpoint: Root URL of the PRTG node (e.g.: 'http://127.0.0.1:8080').
+        :param size: Maximum number of simultaneous connections (and requests) to the node.
+        :param idle_timeout: Seconds after which an unused connection is closed instead of being reused.
+        :param timeout: Seconds to wait for a whole response (None means no limit).
+        """
+        url = urllib.parse.urlsplit(endpoint)
+        self.scheme = url.scheme or 'http'
+        self.host = url.hostname
+        self.port = url.port or (443 if self.scheme == 'https' else 80)
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.handshakes = 0
+        self.requests = 0
+        self.bytes_wire = 0
+        self.bytes_decoded = 0
+        self._idle = deque()
+        self._slots = asyncio.Semaphore(size)
+        self._ssl_context = create_ssl_context() if self.scheme == 'https' else None
+
+    async def _new_connection(self):
+        self.handshakes += 1
+        logging.debug('Opening pooled connection #{} to {}://{}:{}'.format(self.handshakes, self.scheme, self.host,
+                                                                          self.port))
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self._ssl_context)
+        return reader, writer
+
+    async def _get_connection(self):
+        """
+        :return: A tuple (reader, writer, reused), reused being True if it was taken from the idle connections.
+        """
+        now = time.monotonic()
+        while self._idle:
+            reader, writer, last_used = self._idle.pop()
+            if now - last_used <= self.idle_timeout and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await self._new_connection()
+        return reader, writer, False
+
+    @staticmethod
+    async def _read_response(reader):
+        """
+        Reads an HTTP/1.x response.
+        :param reader: asyncio.StreamReader instance.
+        :return: Tuple (status, reason, headers, body, keep_alive).
+        """
+        status_line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+        if not status_line:
+            raise ConnectionResetError('Connection closed by the server')
+        version, status, reason = (status_line.split(' ', 2) + [''])[:3]
+        headers = dict()
+        while True:
+            line = (await reader.readline()).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int((await reader.readline()).split(b';', 1)[0], 16)
+                if not size:
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):  # Trailers.
+                        pass
+                    break
+                body += await reader.readexactly(size)
+                await reader.readexactly(2)
+            body = bytes(body)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return int(status), reason, headers, body, keep_alive
+
+    async def _send(self, reader, writer, method, target):
+        writer.write('{} {} HTTP/1.1\r\nHost: {}:{}\r\nAccept: */*\r\nAccept-Encoding: {}\r\n\r\n'.format(
+            method, target, self.host, self.port, ACCEPT_ENCODING).encode('latin-1'))
+        await writer.drain()
+        return await self._read_response(reader)
+
+    async def urlopen(self, url, method='GET'):
+        """
+        Sends a request through a pooled connection.
+        :param url: Full URL of the request.
+        :param method: HTTP method.
+        :return: Response body (bytes).
+        :raise HTTPError: If the server answers with an error status (>= 400) or a redirect (3xx).
+        """
+        body, _ = await self.fetch(url, method)
+        return body
+
+    async def fetch(self, url, method='GET'):
+        """
+        Sends a request through a pooled connection.
+        :param url: Full URL of the request.
+        :param method: HTTP method.
+        :return: Tuple (body, bytes_wire): the decompressed response body (bytes) and how many bytes it took on the
+                 wire.
+        :raise HTTPError: If the server answers with an error status (>= 400) or a redirect (3xx).
+        """
+        split_url = urllib.parse.urlsplit(url)
+        target = split_url.path + ('?' + split_url.query if split_url.query else '')
+        async with self._slots:
+            reader, writer, reused = await self._get_connection()
+            try:
+                try:
+                    response = await asyncio.wait_for(self._send(reader, writer, method, target), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    if not reused:
+                        raise
+                    # The server dropped an idle keep-alive connection: retry once over a fresh one.
+                    logging.debug('Pooled connection went stale, reconnecting')
+                    reader, writer = await self._new_connection()
+                    response = await asyncio.wait_for(self._send(reader, writer, method, target), self.timeout)
+            except BaseException:
+                writer.close()
+                raise
+            status, reason, headers, body, keep_alive = response
+            self.requests += 1
+            if keep_alive:
+                self._idle.append((reader, writer, time.monotonic()))
+            else:
+                writer.close()
+        if status >= 300:
+            raise HTTPError(url, status, reason, headers, None)
+        bytes_wire = len(body)
+        self.bytes_wire += bytes_wire
+        if headers.get('content-encoding'):
+            body = decompress(body, headers['content-encoding'])
+        self.bytes_decoded += len(body)
+        return body, bytes_wire
+
+    def close(self):
+        """
+        Closes every idle connection.
+        """
+        while self._idle:
+            self._idle.pop()[1].close()
+
+
+class AsyncConnection(Connection):
+    """
+    PRTG Connection Object for asyncio. Same response handling as prtg.client.Connection, but every request is
+    awaited through an AsyncConnectionPool and back-offs do not block the event loop. Table pages after the first
+    one are requested all at once; the pool bounds how many of them are actually in flight.
+    """
+
+    def __init__(self, pool, limiter=None, interner=None):
+        """
+        :param pool: AsyncConnectionPool instance.
+        :param limiter: prtg.throttle.Limiter instance every request goes through (default: an unlimited one).
+        :param interner: prtg.client.Interner instance decoded objects go through (default: a new one).
+        """
+        Connection.__init__(self, limiter=limiter if limiter is not None else Limiter(max_concurrency=pool.size),
+                            interner=interner)
+        self.pool = pool
+
+    async def _fetch_page(self, query):
+        """
+        Make an HTTP request to retrieve a single page of items, retrying with exponential back-off.
+        :param query: prtg.models.Query instance (its counter tells which page).
+        :return: Tuple (objects, ended, totalcount), as returned by _process_response.
+        :raise DeadlineExceeded: If the query's deadline passed before the page could be read.
+        """
+        url = str(query)
+        logging.info('Making request: {}'.format(query))
+
+        trial = 0
+        while True:
+            trial += 1
+            timeout = self._time_left(query)
+            try:
+                async with self.limiter.request_async(timeout):
+                    body, bytes_wire = await asyncio.wait_for(
+                        self.pool.fetch(url, query.method),
+                        query.deadline.remaining() if query.deadline is not None else None)
+                self.bytes_read += bytes_wire
+                self.bytes_decoded += len(body)
+                return self._page_result(
+                    query, *self._process_response(BytesIO(body), query.expect_response, query.output,
+                                                   query.extra.get('content'), query.lazy))
+            except asyncio.TimeoutError as e:
+                self._check_deadline_error(query, e)
+                raise
+            except HTTPError as e:
+                back_off = self._retry_back_off(query, trial)
+                if back_off is None:
+                    return list(), self._give_up(query, e), None
+                await asyncio.sleep(back_off)
+
+    async def get_request(self, query, cache):
+        """
+        Make HTTP requests to retrieve the full list of items. When it finishes, the query's bytes_wire and
+        bytes_decoded tell how many bytes came through the wire and how many they were once decompressed. If the query
+        has a timeout, its deadline starts now; a table query that runs out of time keeps the pages read so far and is
+        marked as partial.
+        :param query: prtg.models.Query instance.
+        :param cache: prtg.Cache instance.
+        :raise DeadlineExceeded: If a query other than a table runs out of time.
+        """
+        query.deadline = Deadline(query.timeout) if query.timeout is not None else None
+        query.partial = False
+        bytes_read, bytes_decoded = self.bytes_read, self.bytes_decoded
+        try:
+            await self._get_pages(query, cache)
+        except DeadlineExceeded:
+            if query.target_name != 'table':
+                raise
+            query.partial = True
+            logging.warning('Deadline exceeded, the response is partial: {}'.format(query.key()))
+        finally:
+            self.interner.clear()
+            query.bytes_wire += self.bytes_read - bytes_read
+            query.bytes_decoded += self.bytes_decoded - bytes_decoded
+            logging.debug('Query read {} bytes ({} decoded): {}'.format(query.bytes_wire, query.bytes_decoded,
+                                                                       query.key()))
+
+    async def _get_pages(self, query, cache):
+        resp, ended, total = await self._fetch_page(query)
+        self._store(query, resp, cache)
+        if not int(ended) and total is not None and query.target_name == 'table':
+            pages = [query.page(start) for start in range(query.counter + query.maximum, int(total), query.maximum)]
+            results = await asyncio.gather(*[self._fetch_page(page) for page in pages], return_exceptions=True)
+            errors = [result for result in results if isinstance(result, BaseException)]
+            for result in results:
+                if not isinstance(result, BaseException):
+                    resp, ended, _ = result
+                    self._store(query, resp, cache)
+            if errors:
+                raise errors[0]  # The pages that did arrive are stored, in case the query ends up partial.
+            if pages:
+                query.counter = pages[-1].counter
+        while not int(ended):  # Either the server gave no 'totalcount' or the list grew while it was being read.
+            query.increment()
+            resp, ended, _ = await self._fetch_page(query)
+            self._store(query, resp, cache)
+
+
+class AsyncClient(object):
+    """
+    PRTG Client for asyncio. It accepts the same prtg.models.Query objects as prtg.client.Client and feeds the same
+    kind of prtg.cache.Cache.
+    """
+
+    DEFAULT_CONCURRENCY = 8
+
+    def __init__(self, endpoint, username, password, cache_dir=None, concurrency=DEFAULT_CONCURRENCY,
+                 idle_timeout=ConnectionPool.DEFAULT_IDLE_TIMEOUT, timeout=None, rate_limit=None, limiter=None):
+        """
+        :param endpoint: Root URL of the PRTG node (e.g.: 'http://127.0.0.1:8080').
+        :param username: PRTG username.
+        :param password: Password.
+        :param cache_dir: Directory where the cache file is going to be written.
+        :param concurrency: Maximum number of requests in flight (and persistent connections) to the node.
+        :param idle_timeout: Seconds a pooled connection may stay unused before being closed.
+        :param timeout: Seconds to wait for each response (None means no limit).
+        :param rate_limit: Maximum requests per second to the node (None means no limit).
+        :param limiter: prtg.throttle.Limiter instance shared by every request of this client (by default, one
+                        limited to rate_limit with an adaptive concurrency window of up to 'concurrency' requests).
+        """
+        self.endpoint = endpoint
+        self.username = username
+        self.password = password
+        if cache_dir:
+            self.cache = Cache(cache_dir)
+        else:
+            self.cache = Cache()
+        self.pool = AsyncConnectionPool(endpoint, concurrency, idle_timeout, timeout)
+        self.limiter = limiter if limiter is not None else Limiter(rate_limit, max_concurrency=concurrency)
+
+    async def query(self, query):
+        """
+        Sends a query, returning its response from the server.
+        :param query: prtg.models.Query instance.
+        :return: If not 'table', returns the queried value.
+        """
+        conn = AsyncConnection(self.pool, self.limiter)
+        await conn.get_request(query, self.cache)
+        return conn.response
+
+    def close(self):
+        """
+        Closes the idle connections to the node.
+        """
+        self.pool.close()
@@ -4,10 +4,13 @@ Python library for Paessler's PRTG (http://www.paessler.com/)
 """
 
 import atexit
+from collections import OrderedDict
 import logging
 import os
 import shelve
 import tempfile
+from threading import Lock, RLock
+import time
 
 from prtg.exceptions import UnknownObjectType
 from prtg.models import CONTENT_TYPE_ALL, PrtgObject
@@ -21,11 +24,14 @@ class Cache(object):
     Wrapper around 'shelve' (https://docs.python.org/2/library/shelve.html), a persistence library.
     Upon initialisation, it looks for cached dictionaries 'devices', 'groups', 'sensors' and 'status' and, if not
     present, it creates them.
+    Objects of several PRTG servers can share a cache through namespaces (see namespace), their ids being prefixed
+    with the namespace so that they do not collide.
     """
 
     __FILE_PREFIX = 'prtg.'
     __FILE_SUFFIX = '.cache'
     __DIR = None
+    NAMESPACE_SEPARATOR = '/'
 
     def __init__(self, directory=__DIR):
         """
@@ -38,60 +44,117 @@ class Cache(object):
         # TODO: Figure out how to do this gracefully and not leaving a potential (but insignificant) security hole.
         os.remove(self.cache_filename)
         self.cache = shelve.open(self.cache_filename)
+        self._lock = RLock()  # Several clients (e.g.: one per server) may write into the same cache.
         atexit.register(self._stop)
 
-    def write_content(self, content, force=False):
+    def _key(self, objectid, namespace=None):
+        if namespace is None:
+            return str(objectid)
+        return '{}{}{}'.format(namespace, self.NAMESPACE_SEPARATOR, objectid)
+
+    def namespace(self, name):
+        """
+        View of this cache for the objects of one server.
+        :param name: Namespace name (e.g.: the server's name). It cannot contain NAMESPACE_SEPARATOR.
+        :return: CacheNamespace instance.
+        """
+        return CacheNamespace(self, name)
+
+    def write_content(self, content, force=False, namespace=None):
         """
         Stores the contents into the main cache by objid.
         :param content: List of instances of prtg.models.PrtgObject to put in the cache.
         :param force: Forces the insertion of the object in the cache.
+        :param namespace: Namespace of the objects (None means no namespace).
         """
         logging.debug('Writing Cache')
-        for obj in content:
-            if not isinstance(obj, PrtgObject):
-                raise UnknownObjectType
-            if not str(obj.objid) in self.cache:
-                # TODO: Compare new objects with cached objects.
-                logging.debug('Writing new object {} to cache'.format(str(obj.objid)))
-                self.cache[str(obj.objid)] = obj
-            elif force:
-                logging.debug('Updating object {} in cache'.format(str(obj.objid)))
-                obj.changed = True
-                self.cache[str(obj.objid)] = obj
-            else:
-                logging.debug('Object {} already cached'.format(str(obj.objid)))
+        with self._lock:
+            for obj in content:
+                if not isinstance(obj, PrtgObject):
+                    raise UnknownObjectType
+                key = self._key(obj.objid, namespace)
+                if key not in self.cache:
+                    # TODO: Compare new objects with cached objects.
+                    logging.debug('Writing new object {} to cache'.format(key))
+                    self.cache[key] = obj
+                elif force:
+                    logging.debug('Updating object {} in cache'.format(key))
+                    obj.changed = True
+                    self.cache[key] = obj
+                else:
+                    logging.debug('Object {} already cached'.format(key))
 
-    def get_object(self, objectid):
+    def get_object(self, objectid, namespace=None):
         """
         Gets the object by id.
         :param objectid: Object id to retrieve.
+        :param namespace: Namespace of the object (None means no namespace).
         :return: The requested object, that has to exist.
         :raise KeyError: If no such id is in the cache.
         """
-        with shelve.open(self.cache_filename) as cache:
-            return cache[str(objectid)]
+        return self.cache[self._key(objectid, namespace)]
 
-    def get_content(self, content_type):
+    def update_object(self, objectid, key, value, inherited_values=None, namespace=None):
+        """
+        Updates a field of a cached object without re-reading it from the server (e.g.: after setting a property).
+        :param objectid: Object id.
+        :param key: Field name.
+        :param value: New value (as sent to the server).
+        :param inherited_values: Parent object's values, for inherited properties (e.g.: tags).
+        :param namespace: Namespace of the object (None means no namespace).
+        :return: True if the object was cached (and thus updated), False otherwise.
+        """
+        with self._lock:
+            try:
+                cached_object = self.cache[self._key(objectid, namespace)]
+            except KeyError:
+                return False
+            cached_object.update_field(key, value, inherited_values)
+            self.write_content([cached_object], True, namespace)
+        return True
+
+    def delete_object(self, objectid, namespace=None):
+        """
+        Removes an object from the cache.
+        :param objectid: Object id.
+        :param namespace: Namespace of the object (None means no namespace).
+        :return: True if the object was cached, False otherwise.
+        """
+        key = self._key(objectid, namespace)
+        with self._lock:
+            try:
+                del self.cache[key]
+            except KeyError:
+                return False
+        logging.debug('Deleted object {} from cache'.format(key))
+        return True
+
+    def get_content(self, content_type, namespace=None):
         """
         Generator that retrieves objects by content type.
         :param content_type: Content type to retrieve.
+        :param namespace: Namespace of the objects (None means every object, whatever its namespace).
         :yield: Objects contained in the cache with the specified content type.
         """
-        for objid, value in self.cache.items():  # items() is a generator, thus this usage.
+        prefix = self._key('', namespace) if namespace is not None else None
+        for key, value in self.cache.items():  # items() is a generator, thus this usage.
+            if prefix is not None and not key.startswith(prefix):
+                continue
             try:
                 if content_type == CONTENT_TYPE_ALL or value.content_type == content_type:
                     yield value
             except AttributeError:
                 logging.warning('Bad object returned from cache: {}'.format(value))
 
-    def get_changed_content(self, content_type):
+    def get_changed_content(self, content_type, namespace=None):
         """
         Generator that retrieves changed objects by content type.
         :param content_type: Content type to retrieve.
+        :param namespace: Namespace of the objects (None means every object, whatever its namespace).
         :yield: Objects contained in the cache with the specified content type, that have been changed in the life of
                 the cache.
         """
-        for value in self.get_content(content_type):
+        for value in self.get_content(content_type, namespace):
             if value.changed:
                 yield value
 
@@ -108,3 +171,129 @@ class Cache(object):
             except:
                 logging.error("Couldn't delete cache file '{}'".format(self.cache_filename))
                 raise
+
+
+class CacheNamespace(object):
+    """
+    View of a Cache holding the objects of a single server: it has the same methods as Cache, and the ids it is given
+    and the objects it yields are those of its own namespace. It can be used wherever a Cache is (e.g.: as the cache
+    of a prtg.client.Client).
+    """
+
+    def __init__(self, cache, name):
+        """
+        :param cache: Cache instance.
+        :param name: Namespace name.
+        """
+        if Cache.NAMESPACE_SEPARATOR in str(name):
+            raise ValueError('Invalid cache namespace: {}'.format(name))
+        self.cache = cache
+        self.name = str(name)
+
+    def write_content(self, content, force=False):
+        self.cache.write_content(content, force, self.name)
+
+    def get_object(self, objectid):
+        return self.cache.get_object(objectid, self.name)
+
+    def update_object(self, objectid, key, value, inherited_values=None):
+        return self.cache.update_object(objectid, key, value, inherited_values, self.name)
+
+    def delete_object(self, objectid):
+        return self.cache.delete_object(objectid, self.name)
+
+    def get_content(self, content_type):
+        return self.cache.get_content(content_type, self.name)
+
+    def get_changed_content(self, content_type):
+        return self.cache.get_changed_content(content_type, self.name)
+
+    def __repr__(self):
+        return 'CacheNamespace' + str({'name': self.name})
+
+
+class ResponseCache(object):
+    """
+    In-memory cache of responses to read-only queries, keyed by prtg.models.Query.key() (target and parameters, one
+    entry per table page). Every target has its own time to live (targets without one are not cached) and, when the
+    cache is full, the least recently used entries are evicted. Responses are shared by everyone who gets them, so
+    they must not be modified.
+    """
+
+    DEFAULT_MAX_SIZE = 1024
+    DEFAULT_TTLS = {'getstatus': 10, 'getobjectproperty': 60, 'getsensordetails': 30, 'table': 30}
+
+    def __init__(self, ttls=None, max_size=DEFAULT_MAX_SIZE):
+        """
+        :param ttls: Dictionary of target name (e.g.: 'getstatus') to seconds its responses are fresh.
+        :param max_size: Maximum number of entries.
+        """
+        self.ttls = dict(self.DEFAULT_TTLS if ttls is None else ttls)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, query):
+        """
+        :param query: prtg.models.Query instance.
+        :return: The cached response (objects, ended, totalcount), or None if there is no fresh one.
+        """
+        if query.target_name not in self.ttls:
+            return None
+        key = query.key()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, query, response):
+        """
+        :param query: prtg.models.Query instance.
+        :param response: Response (objects, ended, totalcount) to cache.
+        """
+        ttl = self.ttls.get(query.target_name)
+        if not ttl:
+            return
+        objids = set(str(getattr(obj, 'objid', None)) for obj in response[0])
+        if 'id' in query.extra:
+            objids.add(str(query.extra['id']))
+        with self._lock:
+            self._entries[query.key()] = (time.monotonic() + ttl, response, query.target_name,
+                                          query.extra.get('name'), objids)
+            self._entries.move_to_end(query.key())
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, objid, name=None):
+        """
+        Drops the entries a property change may have made stale: getobjectproperty responses for that object and
+        property, and any other response (table pages, details) containing the object.
+        :param objid: Object id.
+        :param name: Property name (None means every property).
+        """
+        objid = str(objid)
+        with self._lock:
+            for key, (_, _, target_name, entry_name, objids) in list(self._entries.items()):
+                if objid in objids and (target_name != 'getobjectproperty' or name is None or name == entry_name):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return 'ResponseCache' + str({'size': len(self), 'hits': self.hits, 'misses': self.misses,
+                                      'evictions': self.evictions})
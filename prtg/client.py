@@ -3,15 +3,28 @@
 Python library for Paessler's PRTG (http://www.paessler.com/)
 """
 
+from collections import deque, OrderedDict
+from concurrent.futures import as_completed, Future, ThreadPoolExecutor
+import json
 import logging
-from time import sleep
+from threading import Lock
+from time import sleep, time
 from urllib import request
 from urllib.error import HTTPError
 import xml.etree.ElementTree as Et
 
 from prtg.cache import Cache
-from prtg.models import Sensor, Device, Group, Status, PrtgObject
-from prtg.exceptions import UnknownResponse
+from prtg.models import LIST_TYPE_PROPS, TABLE_CONTENT_TYPES, Query, Sensor, Device, Group, Status, SensorDetails, \
+    PrtgObject, Channel
+from prtg.details import SensorInfo
+from prtg.exceptions import DeadlineExceeded, UnknownResponse
+from prtg.historic import decode_csv, HistoricDataFetcher
+from prtg.latency import Deadline, Hedger
+from prtg.paging import AdaptivePageSize
+from prtg.pool import ACCEPT_ENCODING, ConnectionPool, create_ssl_context, DecompressingReader
+from prtg.sync import CacheSync
+from prtg.throttle import Limiter
+from prtg.values import convert_page
 
 
 __OPENER = None
@@ -20,61 +33,401 @@ __OPENER = None
 def install_opener():
     global __OPENER
     if __OPENER is None:
-        import ssl
-        context = ssl._create_stdlib_context(cert_reqs=ssl.CERT_NONE, check_hostname=False, certfile=None, keyfile=None,
-                                             cafile=None, capath=None, cadata=None)
-        https_handler = request.HTTPSHandler(context=context, check_hostname=None)
+        https_handler = request.HTTPSHandler(context=create_ssl_context(), check_hostname=None)
         __OPENER = request.build_opener(https_handler)
         request.install_opener(__OPENER)
 
 
+class Interner(object):
+    """
+    Pool of the values that repeat across decoded objects (parent ids, statuses, names of the groups, devices and
+    probes above them...), so that every distinct value is held once however many objects have it. Tags become
+    tuples, shared by every object with the same tags. An interner is meant to last as long as a sweep: every Connection
+    has its own, cleared once its query is done, so that nothing is kept alive after it. The pool is bounded: once it
+    is full, new values are kept as they come.
+    """
+
+    COLUMNS = frozenset([
+        'parentid', 'type', 'active', 'status', 'status_raw', 'priority', 'interval', 'probe', 'group', 'device',
+        'grpdev', 'probegroupdevice', 'access', 'dependency', 'schedule', 'favorite', 'sensortype', 'probename',
+        'parentgroupname', 'parentdevicename', 'parentdeviceid', 'statustext', 'statusid',
+    ])
+    DEFAULT_MAX_SIZE = 100000
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        """
+        :param max_size: Maximum number of distinct values (and of distinct tag lists) kept.
+        """
+        self.max_size = max_size
+        self.values = dict()
+        self.tags = dict()
+
+    def value(self, value):
+        shared = self.values.get(value)
+        if shared is None:
+            if len(self.values) >= self.max_size:
+                return value
+            shared = self.values.setdefault(value, value)
+        return shared
+
+    def tuple(self, tags):
+        """
+        :param tags: Tags, as PRTG gives them (separated by spaces).
+        :return: Shared tuple of (shared) tags.
+        """
+        shared = self.tags.get(tags)
+        if shared is None:
+            shared = tuple(self.value(tag) for tag in tags.split(' ')) if tags else ()
+            if len(self.tags) < self.max_size:
+                shared = self.tags.setdefault(tags, shared)
+        return shared
+
+    def intern(self, fields):
+        """
+        Replaces, in place, the repeated values of an item by their shared copies.
+        :param fields: Dictionary of column name to value (as text).
+        :return: The same dictionary.
+        """
+        for key, value in fields.items():
+            if value.__class__ is str:
+                if key in self.COLUMNS:
+                    fields[key] = self.value(value)
+                elif key in LIST_TYPE_PROPS:
+                    fields[key] = self.tuple(value)
+        return fields
+
+    def clear(self):
+        self.values.clear()
+        self.tags.clear()
+
+
 class PrtgEncoder(object):
     """
-    PRTG object encoder.
+    PRTG object encoder. Decoded items go through an interner (if one is given) before becoming objects.
     """
 
-    # TODO: Change
+    MODELS = {'groups': Group, 'devices': Device, 'sensors': Sensor, 'channels': Channel}
+
     @staticmethod
-    def encode_dict(entity_dict, entity_type):
-        attributes = dict()
-        for key, value in entity_dict.items():
-            attributes[key] = value
-        if entity_type == 'groups':
-            return Group(**attributes)
-        if entity_type == 'devices':
-            return Device(**attributes)
-        if entity_type == 'sensors':
-            return Sensor(**attributes)
+    def encode_dict(entity_dict, entity_type, interner=None):
+        model = PrtgEncoder.MODELS.get(entity_type)
+        if model is not None:
+            if interner is not None:
+                interner.intern(entity_dict)
+            return model.build(entity_dict)
+
+    @staticmethod
+    def materialise(key, value):
+        """
+        Decodes a field of a lazy object (see encode_lazy) the first time it is read. It does not intern: lazy fields
+        are mostly read after the sweep that decoded them, whose interner is gone by then.
+        """
+        if key in LIST_TYPE_PROPS and value.__class__ is str:
+            return tuple(value.split(' ')) if value else ()
+        return value
+
+    @staticmethod
+    def encode_lazy(keys, values, entity_type, materialise=None):
+        """
+        Lazy counterpart of encode_dict: the object keeps the raw values and decodes its fields on first access.
+        :param keys: Tuple of the column names of the item.
+        :param values: Tuple of their raw values.
+        :param entity_type: Table name ('groups', 'devices', 'sensors' or 'channels').
+        :param materialise: Function (column name, raw value) -> value (default: PrtgEncoder.materialise).
+        :return: Model object (None if the table is unknown).
+        """
+        model = PrtgEncoder.MODELS.get(entity_type)
+        if model is not None:
+            return model.build_lazy(keys, values, materialise or PrtgEncoder.materialise)
+
+
+class JsonDecoder(object):
+    """
+    Decoder of PRTG JSON responses (output=json). It builds the same model objects as the XML path, straight from the
+    decoded dictionaries. Values are kept as text, the way they come in XML responses.
+    """
+
+    @staticmethod
+    def _text(value):
+        if value is None or isinstance(value, str):
+            return value
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        return str(value)
+
+    @staticmethod
+    def materialise(key, value):
+        return PrtgEncoder.materialise(key, JsonDecoder._text(value))
+
+    @staticmethod
+    def decode(data, lazy=False, interner=None):
+        """
+        Decodes a JSON response.
+        :param data: Response body (bytes).
+        :param lazy: If True, table items become lazy objects (see PrtgEncoder.encode_lazy).
+        :param interner: Interner instance the (eager) table items go through (None means no interning).
+        :return: Tuple (objects, ended, totalcount), as returned by Connection._process_response. Since JSON tables
+                 carry no 'listend', ended is None for them (it has to be worked out from the page).
+        :raise UnknownResponse: If the response is not a JSON object.
+        """
+        text = JsonDecoder._text
+        try:
+            document = json.loads(data.decode('utf-8'))
+        except ValueError as e:
+            raise UnknownResponse(e)
+        if not isinstance(document, dict):
+            raise UnknownResponse('Unexpected JSON response: {}'.format(type(document).__name__))
+        for tag in TABLE_CONTENT_TYPES:
+            if tag in document:
+                out = list()
+                for item in document[tag]:
+                    if lazy:
+                        entity = PrtgEncoder.encode_lazy(tuple(item), tuple(item.values()), tag,
+                                                         JsonDecoder.materialise)
+                    else:
+                        entity = PrtgEncoder.encode_dict(dict([(key, text(value)) for key, value in item.items()]),
+                                                         tag, interner)
+                    if entity is not None:
+                        out.append(entity)
+                total = document.get('treesize')
+                return out, None, text(total)
+        if 'sensordata' in document:
+            attributes = dict([(key, text(value)) for key, value in document['sensordata'].items()])
+            return [SensorDetails.build(attributes)], 1, None
+        return [Status.build(dict([(key, text(value)) for key, value in document.items()]))], 1, None
+
+
+class ResponseParser(object):
+    """
+    Incremental parser of PRTG XML responses. Data is fed as it comes from the socket and, for tables, every <item> is
+    turned into a model object (prtg.models.Group, Device or Sensor) as soon as it is closed, and then discarded, so
+    only one item at a time is held as XML. In lazy mode, items become lazy objects holding the text of their fields
+    (see PrtgEncoder.encode_lazy).
+    """
+
+    def __init__(self, lazy=False, interner=None):
+        """
+        :param lazy: If True, table items become lazy objects.
+        :param interner: Interner instance the (eager) table items go through (None means no interning).
+        """
+        self.lazy = lazy
+        self.interner = interner
+        self.objects = list()
+        self.root = None
+        self.ended = 1
+        self.total = None
+        self._depth = 0
+        self._parser = Et.XMLPullParser(events=('start', 'end'))
+
+    def feed(self, data):
+        """
+        Feeds a chunk of the response.
+        :param data: Bytes.
+        :raise UnknownResponse: If the response is not well-formed XML.
+        """
+        try:
+            self._parser.feed(data)
+            self._process_events()  # Parse errors come out of read_events.
+        except Et.ParseError as e:
+            raise UnknownResponse(e)
+
+    def close(self):
+        """
+        Finishes the parsing.
+        :return: Tuple (objects, ended, totalcount), as returned by Connection._process_response.
+        :raise UnknownResponse: If the response is not well-formed XML.
+        """
+        try:
+            self._parser.close()
+            self._process_events()
+        except Et.ParseError as e:
+            raise UnknownResponse(e)
+        if self.root is None:
+            raise UnknownResponse('Empty response')
+        if self.root.tag not in TABLE_CONTENT_TYPES:
+            self.objects += Connection._encode_response(self.root, self.root.tag)
+        return self.objects, self.ended, self.total
+
+    def _process_events(self):
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                if self._depth == 0:
+                    self.root = element
+                    self.ended = element.attrib.get('listend', 1)
+                    self.total = element.attrib.get('totalcount')
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 1 and element.tag == 'item' and self.root.tag in TABLE_CONTENT_TYPES:
+                    if self.lazy:
+                        entity = PrtgEncoder.encode_lazy(tuple([field.tag for field in element]),
+                                                         tuple([field.text for field in element]), self.root.tag)
+                    else:
+                        entity = Connection._encode_item(element, self.root.tag, self.interner)
+                    if entity is not None:
+                        self.objects.append(entity)
+                    self.root.remove(element)
+
+
+class SensorTreeParser(object):
+    """
+    Incremental parser of sensortree responses (table content=sensortree), which hold the whole hierarchy of groups
+    (probes included), devices and sensors in a single document. Every node is turned into a model object as soon as
+    it is closed and then discarded. Its parentid comes from the nesting, and devices and sensors also get the names
+    of the probe, group (and device) above them, as in their tables.
+    """
+
+    NODES = {'group': 'groups', 'probenode': 'groups', 'device': 'devices', 'sensor': 'sensors'}
+
+    def __init__(self, interner=None):
+        """
+        :param interner: Interner instance the nodes go through (None means no interning).
+        """
+        self.interner = interner
+        self.objects = list()
+        self.root = None
+        self._elements = list()  # Open elements.
+        self._nodes = list()  # Open nodes: tuples (element, attributes).
+        self._parser = Et.XMLPullParser(events=('start', 'end'))
+
+    def feed(self, data):
+        """
+        Feeds a chunk of the response.
+        :param data: Bytes.
+        :raise UnknownResponse: If the response is not well-formed XML.
+        """
+        try:
+            self._parser.feed(data)
+            self._process_events()  # Parse errors come out of read_events.
+        except Et.ParseError as e:
+            raise UnknownResponse(e)
+
+    def close(self):
+        """
+        Finishes the parsing.
+        :return: Tuple (objects, ended, totalcount), as returned by Connection._process_response (the tree always
+                 comes whole).
+        :raise UnknownResponse: If the response is not well-formed XML.
+        """
+        try:
+            self._parser.close()
+            self._process_events()
+        except Et.ParseError as e:
+            raise UnknownResponse(e)
+        if self.root is None:
+            raise UnknownResponse('Empty response')
+        return self.objects, 1, None
+
+    def _context(self, tag):
+        """
+        :return: Names of the probe, group and device above the node being closed, as its table would give them.
+        """
+        context = dict()
+        for element, attributes in reversed(self._nodes):
+            if element.tag == 'probenode':
+                context.setdefault('probe', attributes.get('name'))
+            if element.tag in ('group', 'probenode'):
+                context.setdefault('group', attributes.get('name'))
+            if element.tag == 'device' and tag == 'sensor':
+                context.setdefault('device', attributes.get('name'))
+        return context
+
+    def _process_events(self):
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                if self.root is None:
+                    self.root = element
+                if element.tag in self.NODES:
+                    attributes = {'objid': element.attrib.get('id')}
+                    if self._nodes:
+                        attributes['parentid'] = self._nodes[-1][1]['objid']
+                    self._nodes.append((element, attributes))
+                self._elements.append(element)
+                continue
+
+            self._elements.pop()
+            parent = self._elements[-1] if self._elements else None
+            if element.tag in self.NODES:
+                _, attributes = self._nodes.pop()
+                if element.tag != 'group' and element.tag != 'probenode':
+                    context = self._context(element.tag)
+                    context.update(attributes)
+                    attributes = context
+                entity = PrtgEncoder.encode_dict(attributes, self.NODES[element.tag], self.interner)
+                if entity is not None:
+                    self.objects.append(entity)
+            elif self._nodes and parent is self._nodes[-1][0]:
+                self._nodes[-1][1]['objid' if element.tag == 'id' else element.tag] = element.text
+            else:
+                continue  # Keep anything else (e.g.: the elements above the root node) as it is.
+            parent.remove(element)
 
 
 class Connection(object):
     """
-    PRTG Connection Object. It holds a response list. It is used by Client only once per query.
+    PRTG Connection Object. It holds a response list. It is used by Client only once per query, but the HTTP
+    connections underneath come from the Client's pool (if any) and are kept alive between pages and queries.
     """
 
+    DEFAULT_PAGE_WORKERS = 1
     EXPONENTIAL_BACKOFF_MULT = 2
     EXPONENTIAL_BACKOFF_SECS = 2
     ON_QUERY_HTTP_ERROR_ABORT = True
     ON_QUERY_HTTP_ERROR_TREAT_AS_ENDED = True
+    ACCEPT_ENCODING = ACCEPT_ENCODING
+    READ_CHUNK_SIZE = 64 * 1024
     RETRIES_PER_QUERY = 3
 
-    def __init__(self):
+    def __init__(self, pool=None, page_workers=DEFAULT_PAGE_WORKERS, page_sizer=None, limiter=None,
+                 response_cache=None, hedger=None, interner=None):
+        """
+        :param pool: prtg.pool.ConnectionPool instance. If None, every request opens its own connection (urllib).
+        :param page_workers: Maximum number of table pages fetched concurrently (1 means sequential pagination).
+        :param page_sizer: prtg.paging.AdaptivePageSize instance, to adapt the page size during sequential pagination
+                           (parallel pagination keeps the size it starts with).
+        :param limiter: prtg.throttle.Limiter instance every request goes through (default: an unlimited one).
+        :param response_cache: prtg.cache.ResponseCache instance, consulted before every request of a read-only query.
+        :param hedger: prtg.latency.Hedger instance, to hedge the slow requests of read-only GET queries.
+        :param interner: Interner instance decoded objects go through (default: a new one). It is cleared once every
+                         query is done.
+        """
+        self.pool = pool
+        self.response_cache = response_cache
+        self.hedger = hedger
+        self.page_workers = page_workers
+        self.page_sizer = page_sizer
+        self.limiter = limiter if limiter is not None else Limiter(max_concurrency=max(1, page_workers))
         self.response = list()
+        self.bytes_read = 0
+        self.bytes_decoded = 0
+        self.interner = interner if interner is not None else Interner()
+        self._lock = Lock()
+
+    @staticmethod
+    def _encode_item(item, tag, interner=None):
+        """
+        Convert an <item> of a table response into a model object.
+        :param item: Element of the item.
+        :param tag: Table name ('groups', 'devices', 'sensors' or 'channels').
+        :param interner: Interner instance the item goes through (None means no interning).
+        :return: Model object (None if the table is unknown).
+        """
+        return PrtgEncoder.encode_dict(dict([(attribute.tag, attribute.text) for attribute in item]), tag, interner)
 
     @staticmethod
     def _encode_response(response, tag):
         """
         Convert the items in the response into model objects.
         :param response: HTTP response (urllib).
-        :param tag: Tag name ('groups': Group, 'devices': Device, 'sensors': Sensor, 'status': Status,
-                              'prtg': PrtgObject).
+        :param tag: Tag name ('groups': Group, 'devices': Device, 'sensors': Sensor, 'channels': Channel,
+                              'status': Status, 'prtg': PrtgObject).
         :return: List of objects, one per item in the response.
         """
         out = list()
         # TODO: Improve this matching.
-        if any([tag == 'groups', tag == 'devices', tag == 'sensors']):
+        if tag in TABLE_CONTENT_TYPES:
             for item in response.findall('item'):
-                entity = PrtgEncoder.encode_dict(dict([(attribute.tag, attribute.text) for attribute in item]), tag)
+                entity = Connection._encode_item(item, tag)
                 if entity is not None:
                     out.append(entity)
 
@@ -82,49 +435,213 @@ class Connection(object):
             attributes = dict()
             for item in response:
                 attributes[item.tag] = item.text
-            out.append(Status(**attributes))
+            out.append(Status.build(attributes))
+
+        if tag == 'sensordata':
+            attributes = dict()
+            for item in response:
+                attributes[item.tag] = item.text
+            out.append(SensorDetails.build(attributes))
 
         if tag == 'prtg':
             attributes = dict()
             for item in response:
                 attributes[item.tag] = item.text
-            out.append(PrtgObject(**attributes))
+            out.append(PrtgObject.build(attributes))
 
         return out
 
-    def _process_response(self, response, expect_return=True):
+    def _process_response(self, response, expect_return=True, output='xml', content=None, lazy=False):
         """
-        Process the response from the server.
+        Process the response from the server, parsing it incrementally while it is read (XML).
         :param response: HTTP response (urllib).
         :param expect_return: Basically, it is a flag that tells this function to process the response or not.
-        :return: Returns a list of objects, one per item in the response, and an indicator to whether the list in the
-                 response was finished (1) or not (?).
+        :param output: Response format ('xml', 'json' or 'csv', which is historic data).
+        :param content: Table queried, if any ('sensortree' needs its own parser).
+        :param lazy: If True, table items become lazy objects (see PrtgEncoder.encode_lazy); the sensor tree is always
+                     decoded eagerly.
+        :return: Returns a list of objects, one per item in the response, an indicator to whether the list in the
+                 response was finished (1) or not (?), and the total number of items in the list (None if the server
+                 did not say).
         """
-        try:
-            resp = Et.fromstring(response.read().decode('utf-8'))
-        except Et.ParseError as e:
-            raise UnknownResponse(e)
+        if output == 'json':
+            resp, ended, total = JsonDecoder.decode(response.read(), lazy, self.interner)
+            return (resp, ended, total) if expect_return else (list(), 1, None)
+        if output == 'csv':
+            return ([decode_csv(response.read())], 1, None) if expect_return else (list(), 1, None)
+        parser = SensorTreeParser(self.interner) if content == 'sensortree' else ResponseParser(lazy, self.interner)
+        chunk = response.read(self.READ_CHUNK_SIZE)
+        while chunk:
+            parser.feed(chunk)
+            chunk = response.read(self.READ_CHUNK_SIZE)
+        resp, ended, total = parser.close()
         if expect_return:
-            try:
-                ended = resp.attrib['listend']  # Catch KeyError and return finished
-            except KeyError:
-                ended = 1
-            return self._encode_response(resp, resp.tag), ended
+            return resp, ended, total
         else:
-            return list(), 1
+            return list(), 1, None
 
     def _build_request(self, query):
         """
-        Build the HTTP request (urllib).
+        Build the HTTP request (urllib), asking for a compressed response (unless ACCEPT_ENCODING is None).
         :param query: prtg.models.Query instance.
         """
         req, method = str(query), query.method
         logging.debug('REQUEST: target={} method={}'.format(req, method))
-        return request.Request(url=req, method=method)
+        headers = {'Accept-Encoding': self.ACCEPT_ENCODING} if self.ACCEPT_ENCODING else {}
+        return request.Request(url=req, method=method, headers=headers)
 
-    def _urlopen(self, req):
+    def _urlopen(self, req, timeout=None):
+        if self.pool is not None:
+            return self.pool.urlopen(req, timeout)
         install_opener()
-        return request.urlopen(req)
+        if timeout is None:
+            return request.urlopen(req)
+        return request.urlopen(req, timeout=timeout)
+
+    @staticmethod
+    def _page_result(query, resp, ended, total):
+        """
+        Works out whether the list ended for responses that do not say it (JSON tables), and converts the typed
+        columns of the page if the query asks for it.
+        :return: Tuple (objects, ended, totalcount).
+        """
+        if query.typed:
+            convert_page(resp)
+        if ended is None:
+            ended = int(len(resp) < query.maximum or (total is not None and query.counter + len(resp) >= int(total)))
+        return resp, ended, total
+
+    @staticmethod
+    def _time_left(query):
+        """
+        :param query: prtg.models.Query instance.
+        :return: Seconds left before the query's deadline (None if it has no deadline).
+        :raise DeadlineExceeded: If the deadline has passed.
+        """
+        if query.deadline is None:
+            return None
+        query.deadline.check(query)
+        return query.deadline.remaining()
+
+    @staticmethod
+    def _check_deadline_error(query, error):
+        """
+        Tells the timeouts caused by the query's deadline from any other I/O error.
+        :param query: prtg.models.Query instance.
+        :param error: Exception raised by the request.
+        :raise DeadlineExceeded: If the query's deadline has passed (the error is just its consequence).
+        """
+        if query.deadline is not None and query.deadline.expired:
+            raise DeadlineExceeded('Deadline of {}s exceeded: {}'.format(query.deadline.seconds, query)) from error
+
+    def _retry_back_off(self, query, trial):
+        """
+        Retry policy for the HTTP errors: exponential back-off, up to RETRIES_PER_QUERY retries.
+        :param query: prtg.models.Query instance.
+        :param trial: Number of the trial that failed (starting at 1).
+        :return: Seconds to back off before the next trial, or None if there are no retries left.
+        :raise DeadlineExceeded: If the back-off would go beyond the query's deadline.
+        """
+        if trial > self.RETRIES_PER_QUERY:
+            logging.error('QUERY FAILED {} TIMES: {}'.format(trial, query))
+            return None
+        logging.warning('Query failed (trial#{}, will retry): {}'.format(trial, query))
+        back_off = self.EXPONENTIAL_BACKOFF_SECS * self.EXPONENTIAL_BACKOFF_MULT ** (trial - 1)
+        if query.deadline is not None and query.deadline.remaining() <= back_off:
+            raise DeadlineExceeded('No time left to retry before the deadline: {}'.format(query))
+        logging.warning('Backing off {} seconds'.format(back_off))
+        return back_off
+
+    def _give_up(self, query, error):
+        """
+        Handles the HTTP error of a query with no retries left.
+        :param query: prtg.models.Query instance.
+        :param error: HTTPError of the last trial.
+        :return: The 'ended' flag of the failed page.
+        :raise HTTPError: If ON_QUERY_HTTP_ERROR_ABORT is set.
+        """
+        if self.ON_QUERY_HTTP_ERROR_ABORT:
+            logging.error('ABORTING QUERY')
+            raise error
+        if self.ON_QUERY_HTTP_ERROR_TREAT_AS_ENDED:
+            logging.error('QUERY ENDED FORCIBLY')
+            return 1
+        return 0
+
+    def _request_page(self, query, timeout=None):
+        """
+        Make a single HTTP request (urllib) for a page of items.
+        :param query: prtg.models.Query instance (its counter tells which page).
+        :param timeout: Socket timeout in seconds (None means the default one).
+        :return: Tuple (objects, ended, totalcount), as returned by _process_response.
+        """
+        with self.limiter.request(timeout):
+            if query.deadline is not None:
+                timeout = query.deadline.remaining()  # What is left once the limiter let the request through.
+            reader = DecompressingReader(self._urlopen(self._build_request(query), timeout))
+            try:
+                return self._page_result(query, *self._process_response(reader, query.expect_response, query.output,
+                                                                        query.extra.get('content'), query.lazy))
+            finally:
+                # A fully read response has already given its connection back to the pool; one that failed part-way
+                # (parse error, timeout...) is discarded, so that its slot is not lost.
+                reader.close()
+                with self._lock:
+                    self.bytes_read += reader.bytes_wire
+                    self.bytes_decoded += reader.bytes_decoded
+
+    def _fetch_page(self, query, page_sizer=None):
+        """
+        Make an HTTP request (urllib) to retrieve a single page of items, retrying with exponential back-off. If the
+        query has a deadline, no request or back-off goes beyond it: the waits for the limiter and for a pooled
+        connection, and the socket timeout, are bounded by the time left.
+        :param query: prtg.models.Query instance (its counter tells which page).
+        :param page_sizer: prtg.paging.AdaptivePageSize instance that shrinks the page on every failure (only for
+                           sequential pagination, where the next page starts wherever this one ends).
+        :return: Tuple (objects, ended, totalcount), as returned by _process_response.
+        :raise DeadlineExceeded: If the query's deadline passed before the page could be read.
+        """
+        cached = self.response_cache.get(query) if self.response_cache is not None and query.read_only else None
+        if cached is not None:
+            logging.debug('Cached response: {}'.format(query.key()))
+            return cached
+        logging.info('Making request: {}'.format(query))
+
+        trial = 0
+        while True:
+            trial += 1
+            timeout = self._time_left(query)
+            try:
+                if self.hedger is not None and query.read_only and query.method == 'GET':
+                    resp, ended, total = self.hedger.run(self._request_page, query, timeout, timeout=timeout)
+                else:
+                    resp, ended, total = self._request_page(query, timeout)
+                if self.response_cache is not None and query.read_only:
+                    self.response_cache.put(query, (resp, ended, total))
+                return resp, ended, total
+            except HTTPError as e:
+                back_off = self._retry_back_off(query, trial)
+                if back_off is None:
+                    return list(), self._give_up(query, e), None
+                if page_sizer is not None:
+                    query.maximum = page_sizer.failed()
+                sleep(back_off)
+            except OSError as e:
+                self._check_deadline_error(query, e)  # Socket timeout at the deadline.
+                raise
+
+    def _store(self, query, resp, cache):
+        # TODO: Find a better way to do this 'pseudo-transparent' caching.
+        if query.target_name == 'table' and query.extra.get('content') != 'channels':
+            cache.write_content(resp, True)
+        else:
+            self.response += resp
+
+        if query.target_name == 'setobjectproperty':
+            for objid in str(query.extra['id']).split(','):
+                cache.update_object(objid, query.extra['name'], query.extra['value'], query.parent_value)
+                if self.response_cache is not None:
+                    self.response_cache.invalidate(objid, query.extra['name'])
 
     def get_request(self, query, cache):
         """
@@ -132,51 +649,130 @@ class Connection(object):
         :param query: prtg.models.Query instance.
         :param cache: prtg.Cache instance.
         """
+        for resp in self.iter_pages(query):
+            self._store(query, resp, cache)
+
+    def iter_pages(self, query):
+        """
+        Generator that makes HTTP requests (urllib) to retrieve the full list of items, page by page. When it
+        finishes, the query's bytes_wire and bytes_decoded tell how many bytes came through the wire and how many
+        they were once decompressed. If the query has a timeout, its deadline starts now; a table query that runs
+        out of time just stops yielding pages and is marked as partial.
+        :param query: prtg.models.Query instance.
+        :yield: Lists of objects, one per page, in order.
+        :raise DeadlineExceeded: If a query other than a table runs out of time.
+        """
+        query.deadline = Deadline(query.timeout) if query.timeout is not None else None
+        query.partial = False
+        if self.page_workers > 1 and query.target_name == 'table':
+            pages = self._iter_parallel_pages(query)
+        else:
+            pages = self._iter_sequential_pages(query)
+        bytes_read, bytes_decoded = self.bytes_read, self.bytes_decoded
+        try:
+            for resp in pages:
+                yield resp
+        except DeadlineExceeded:
+            if query.target_name != 'table':
+                raise
+            query.partial = True
+            logging.warning('Deadline exceeded, the response is partial: {}'.format(query.key()))
+        finally:
+            self.interner.clear()
+            query.bytes_wire += self.bytes_read - bytes_read
+            query.bytes_decoded += self.bytes_decoded - bytes_decoded
+            logging.debug('Query read {} bytes ({} decoded): {}'.format(query.bytes_wire, query.bytes_decoded,
+                                                                       query.key()))
+
+    def _iter_sequential_pages(self, query):
+        """
+        Retrieve the list of items page after page, until the server says the list ended. If there is a page sizer,
+        every page is sized after the ones before it.
+        :param query: prtg.models.Query instance.
+        :yield: Lists of objects, one per page.
+        """
         ended = 0
         while not int(ended):
-            req = self._build_request(query)
-            logging.info('Making request: {}'.format(query))
-
-            resp = list()
-            done = False
-            trial = 0
-            back_off = self.EXPONENTIAL_BACKOFF_SECS
-            while not done and trial <= self.RETRIES_PER_QUERY:
-                trial += 1
-                try:
-                    resp, ended = self._process_response(self._urlopen(req), query.expect_response)
-                    done = True
-                except HTTPError:
-                    if trial <= self.RETRIES_PER_QUERY:
-                        logging.warning('Query failed (trial#{}, will retry): {}'.format(trial, query))
-                        logging.warning('Backing off {} seconds'.format(back_off))
-                        sleep(back_off)
-                        back_off *= self.EXPONENTIAL_BACKOFF_MULT
-                    else:
-                        logging.error('QUERY FAILED {} TIMES: {}'.format(trial, query))
-                        if self.ON_QUERY_HTTP_ERROR_ABORT:
-                            logging.error('ABORTING QUERY')
-                            raise
-                        elif self.ON_QUERY_HTTP_ERROR_TREAT_AS_ENDED:
-                            logging.error('QUERY ENDED FORCIBLY')
-                            ended = 1
-
-            # TODO: Find a better way to do this 'pseudo-transparent' caching.
-            if query.target == 'table.xml?':
-                cache.write_content(resp, True)
-            else:
-                self.response += resp
+            started, bytes_read = time(), self.bytes_read
+            resp, ended, _ = self._fetch_page(query, self.page_sizer)
+            yield resp
+            if not int(ended):
+                size = None
+                if self.page_sizer is not None:
+                    size = self.page_sizer.observe(len(resp), time() - started, self.bytes_read - bytes_read)
+                query.increment(size)
 
-            # if query.target == 'setobjectproperty.htm?':
-            #     try:
-            #         cached_object = cache.get_object(query.extra['id'])
-            #         cached_object.update_field(query.extra['name'], query.extra['value'], query.parent_value)
-            #         cache.write_content(cached_object, True)
-            #     except KeyError:
-            #         pass
+    def _iter_parallel_pages(self, query):
+        """
+        Retrieve the full list of items fetching the first page, reading the server's 'totalcount' from it and then
+        fetching all the remaining pages concurrently (at most self.page_workers at a time, and never more than twice
+        that number of pages ahead of the consumer). Pages are yielded in order. If the list grew while it was being
+        read (i.e., the last page does not say 'listend'), the rest of it is read sequentially.
+        :param query: prtg.models.Query instance.
+        :yield: Lists of objects, one per page.
+        """
+        resp, ended, total = self._fetch_page(query)
+        yield resp
+        if int(ended) or total is None:
+            return
 
-            if not int(ended):
-                query.increment()
+        pages = deque(query.page(start) for start in range(query.counter + query.maximum, int(total), query.maximum))
+        futures = deque()
+        with ThreadPoolExecutor(max_workers=self.page_workers) as executor:
+            while pages or futures:
+                while pages and len(futures) < 2 * self.page_workers:
+                    page = pages.popleft()
+                    futures.append((page, executor.submit(self._fetch_page, page)))
+                page, future = futures.popleft()
+                resp, ended, _ = future.result()
+                query.counter = page.counter
+                yield resp
+
+        if not int(ended):
+            query.increment()
+            yield from self._iter_sequential_pages(query)
+
+
+class SingleFlight(object):
+    """
+    Collapses identical concurrent calls into one: while a call for a key is in flight, other callers with the same
+    key wait for it and get its result (the very same object) or its exception.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.collapsed = 0
+        self._in_flight = dict()
+        self._lock = Lock()
+
+    def do(self, key, function, *args):
+        """
+        :param key: Identity of the call.
+        :param function: Function to call if there is no call in flight for the key.
+        :param args: Arguments for the function.
+        :return: Result of the (possibly shared) call.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                self.calls += 1
+            else:
+                self.collapsed += 1
+        if not leader:
+            return future.result()
+        try:
+            result = function(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
 
 
 class Client(object):
@@ -184,31 +780,252 @@ class Client(object):
     PRTG Client.
     """
 
-    def __init__(self, endpoint, username, password, cache_dir=None):
+    DEFAULT_BULK_WORKERS = 4
+    MAX_IDS_PER_REQUEST = 100
+
+    def __init__(self, endpoint, username, password, cache_dir=None, pool_size=ConnectionPool.DEFAULT_SIZE,
+                 idle_timeout=ConnectionPool.DEFAULT_IDLE_TIMEOUT, page_workers=Connection.DEFAULT_PAGE_WORKERS,
+                 target_page_latency=None, rate_limit=None, limiter=None, response_cache=None, hedge_percentile=None,
+                 cache=None):
         """
         :param endpoint: Root URL of the PRTG node (e.g.: 'http://127.0.0.1:8080').
         :param username: PRTG username.
         :param password: Password.
         :param cache_dir: Directory where the cache file is going to be written.
+        :param pool_size: Maximum number of persistent HTTP connections to the node (0 disables pooling, every request
+                          then going through urllib's opener). The pool honours the proxy environment variables and
+                          follows redirects, see prtg.pool.ConnectionPool.
+        :param idle_timeout: Seconds a pooled connection may stay unused before being closed.
+        :param page_workers: Maximum number of table pages fetched concurrently per query (1 means sequential).
+        :param target_page_latency: If set, seconds each table page should take: page sizes adapt toward it and the
+                                    learned size per content type (in page_sizes) is used by the next sweeps.
+        :param rate_limit: Maximum requests per second to the node (None means no limit).
+        :param limiter: prtg.throttle.Limiter instance shared by every request of this client (pagination, bulk
+                        writes, etc.). By default, one limited to rate_limit with a concurrency window of up to
+                        max(pool_size, page_workers) requests, which narrows on the node's errors.
+        :param response_cache: prtg.cache.ResponseCache instance for the responses of read-only queries (None means
+                               no response caching). Property changes sent by this client invalidate its entries.
+        :param hedge_percentile: If set, percentile (0-100) of the recent page latencies after which a read-only
+                                 request is sent again, the first answer being taken (see prtg.latency.Hedger).
+        :param cache: prtg.cache.Cache (or prtg.cache.CacheNamespace) instance to use instead of a new one.
         """
         self.endpoint = endpoint
         self.username = username
         self.password = password
-        if cache_dir:
+        if cache is not None:
+            self.cache = cache
+        elif cache_dir:
             self.cache = Cache(cache_dir)
         else:
             self.cache = Cache()
+        self.pool = ConnectionPool(endpoint, pool_size, idle_timeout) if pool_size else None
+        self.page_workers = page_workers
+        self.target_page_latency = target_page_latency
+        self.page_sizes = dict()
+        if limiter is None:
+            limiter = Limiter(rate_limit, max_concurrency=max(pool_size, page_workers, 1))
+        self.limiter = limiter
+        self.single_flight = SingleFlight()
+        self.response_cache = response_cache
+        self.hedger = None
+        if hedge_percentile:
+            self.hedger = Hedger(hedge_percentile, max_workers=2 * max(pool_size, page_workers, 1))
+        self.sensor_info = SensorInfo(self, response_cache)
+
+    def _connection(self, query, response_cache=None):
+        """
+        Creates a connection for a query, with a page sizer starting at the learned page size if paging is adaptive.
+        :param query: prtg.models.Query instance.
+        :param response_cache: prtg.cache.ResponseCache instance to use instead of the client's one.
+        :return: Connection instance.
+        """
+        page_sizer = None
+        if self.target_page_latency and query.target_name == 'table':
+            size = self.page_sizes.get(query.extra.get('content'), query.maximum)
+            page_sizer = AdaptivePageSize(size, self.target_page_latency)
+            query.maximum = page_sizer.size
+        return Connection(self.pool, self.page_workers, page_sizer, self.limiter,
+                          response_cache if response_cache is not None else self.response_cache, self.hedger)
+
+    def _learn(self, query, conn):
+        if conn.page_sizer is not None:
+            self.page_sizes[query.extra.get('content')] = conn.page_sizer.size
 
     def query(self, query):
         """
-        Creates a connection and sends a query, returning its response from the server.
+        Creates a connection and sends a query, returning its response from the server. Identical read-only queries
+        sent concurrently (e.g.: from several threads) are collapsed into one request, whose response all of them
+        get (see Query.key). A table query with a timeout that runs out of time is left with query.partial set.
         :param query: prtg.models.Query instance.
         :return: If not 'table', returns the queried value.
         """
-        conn = Connection()
+        if query.read_only:
+            return self.single_flight.do(query.key(), self._query, query)
+        response = self._query(query)
+        if query.target_name == 'setobjectproperty' and self.sensor_info.response_cache is not self.response_cache:
+            for objid in str(query.extra['id']).split(','):
+                self.sensor_info.invalidate(objid, query.extra['name'])
+        return response
+
+    def _query(self, query):
+        conn = self._connection(query)
         conn.get_request(query, self.cache)
+        self._learn(query, conn)
         return conn.response
 
+    def iter_query(self, query, cache=False):
+        """
+        Sends a query, yielding the objects in its response as each page arrives (only one page is held at a time).
+        :param query: prtg.models.Query instance.
+        :param cache: If True, the objects are also written into the cache (the same way 'query' does for tables).
+        :yield: Objects in the response, in order.
+        """
+        conn = self._connection(query)
+        for resp in conn.iter_pages(query):
+            if cache:
+                self.cache.write_content(resp, True)
+            for obj in resp:
+                yield obj
+        self._learn(query, conn)
+
+    def load_tree(self, objid=None):
+        """
+        Loads the whole hierarchy of groups (probes included), devices and sensors below an object with a single
+        streamed request (content=sensortree), instead of one paginated table per content type, and writes it into
+        the cache. The objects come with their parentid already set.
+        :param objid: Id of the object at the top of the tree (default: the root group).
+        :return: List of the loaded objects (every node after its children).
+        """
+        query = Query(client=self, target='table', content='sensortree', objid=objid)
+        objects = list(self.iter_query(query))
+        self.cache.write_content(objects, True)
+        logging.info('Loaded {} objects from the sensor tree'.format(len(objects)))
+        return objects
+
+    def sync(self, content, fingerprint_columns=None, columns=None):
+        """
+        Brings the cached objects of a content type up to date, downloading full columns only for the objects that
+        changed (see prtg.sync.CacheSync).
+        :param content: Content type (e.g.: 'sensors').
+        :param fingerprint_columns: Columns that reveal a change in an object (default: CacheSync.FINGERPRINT_COLUMNS).
+        :param columns: Full columns to keep in the cache (default: Query.default_columns).
+        :return: prtg.sync.SyncDelta instance, with the ids of the added, removed and modified objects.
+        """
+        return CacheSync(self, fingerprint_columns, columns).sync(content)
+
+    def sensor_details(self, objids, workers=DEFAULT_BULK_WORKERS):
+        """
+        Gets the details (getsensordetails) of many sensors concurrently. Responses are cached for a while (see
+        prtg.details.SensorInfo).
+        :param objids: Ids of the sensors.
+        :param workers: Maximum number of concurrent requests.
+        :return: Ordered dictionary of sensor id to prtg.models.SensorDetails instance (or the exception that made its
+                 request fail).
+        """
+        return self.sensor_info.details(objids, workers)
+
+    def channels(self, objids, workers=DEFAULT_BULK_WORKERS):
+        """
+        Gets the channels (table content=channels) of many sensors concurrently. Responses are cached for a while
+        (see prtg.details.SensorInfo).
+        :param objids: Ids of the sensors.
+        :param workers: Maximum number of concurrent requests.
+        :return: Ordered dictionary of sensor id to list of prtg.models.Channel instances (or the exception that made
+                 its request fail).
+        """
+        return self.sensor_info.channels(objids, workers)
+
+    def historic_data(self, objids, start, end, window=HistoricDataFetcher.DEFAULT_WINDOW,
+                      workers=HistoricDataFetcher.DEFAULT_WORKERS, average=0, checkpoint_dir=None):
+        """
+        Fetches the historic data of sensors into NumPy arrays, in concurrent windows (see
+        prtg.historic.HistoricDataFetcher).
+        :param objids: Ids of the sensors.
+        :param start: datetime.datetime of the beginning of the period.
+        :param end: datetime.datetime of the end of the period.
+        :param window: datetime.timedelta covered by every request.
+        :param workers: Maximum number of concurrent requests.
+        :param average: Averaging interval in seconds (0 means raw data).
+        :param checkpoint_dir: Directory where fetched windows are kept, so that an interrupted fetch can be resumed.
+        :return: Ordered dictionary of sensor id to prtg.historic.HistoricData instance.
+        """
+        return HistoricDataFetcher(self, window, workers, average, checkpoint_dir).fetch(objids, start, end)
+
+    def set_properties(self, changes, workers=DEFAULT_BULK_WORKERS, max_ids_per_request=MAX_IDS_PER_REQUEST):
+        """
+        Sets many object properties (setobjectproperty). Changes setting the same value to the same property are
+        grouped into multi-id requests (id=1,2,3) of at most max_ids_per_request ids; if a grouped request fails, its
+        objects are retried one by one, so that a single bad id does not fail the rest. Requests run concurrently and
+        the cached objects are updated without re-reading them.
+        :param changes: Iterable of (objid, name, value) or (objid, name, value, parent_value) tuples, parent_value
+                        being the parent object's values for inherited properties (e.g.: tags), as in Query.
+        :param workers: Maximum number of concurrent requests.
+        :param max_ids_per_request: Maximum number of ids per request (1 disables grouping).
+        :return: Dictionary of (objid, name) to True (success) or the exception that made the change fail.
+        """
+        groups = OrderedDict()
+        for change in changes:
+            objid, name, value = change[:3]
+            parent_value = change[3] if len(change) > 3 else None
+            groups.setdefault((name, value), list()).append((str(objid), parent_value))
+
+        batches = list()
+        for (name, value), objects in groups.items():
+            for i in range(0, len(objects), max(1, max_ids_per_request)):
+                batches.append((name, value, objects[i:i + max(1, max_ids_per_request)]))
+
+        def set_property(objids, name, value):
+            conn = Connection(self.pool, limiter=self.limiter)
+            conn._fetch_page(Query(client=self, target='setobjectproperty', objid=','.join(objids), name=name,
+                                   value=value))
+
+        results = dict()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = dict((executor.submit(set_property, [objid for objid, _ in objects], name, value),
+                            (name, value, objects)) for name, value, objects in batches)
+            retries = dict()
+            for future in as_completed(futures):
+                name, value, objects = futures[future]
+                error = future.exception()
+                if error is not None and len(objects) > 1:
+                    logging.warning('Grouped setobjectproperty failed ({}), retrying one by one'.format(error))
+                    for objid, parent_value in objects:
+                        retries[executor.submit(set_property, [objid], name, value)] = (name, value,
+                                                                                         [(objid, parent_value)])
+                else:
+                    self._set_properties_done(results, name, value, objects, error)
+            for future in as_completed(retries):
+                name, value, objects = retries[future]
+                self._set_properties_done(results, name, value, objects, future.exception())
+        return results
+
+    def _set_properties_done(self, results, name, value, objects, error):
+        for objid, parent_value in objects:
+            if error is None:
+                self.cache.update_object(objid, name, value, parent_value)
+                if self.response_cache is not None:
+                    self.response_cache.invalidate(objid, name)
+                self.sensor_info.invalidate(objid, name)
+                results[(objid, name)] = True
+            else:
+                logging.error('Unable to set {} of object {}: {}'.format(name, objid, error))
+                results[(objid, name)] = error
+
+    def close(self):
+        """
+        Closes the pooled connections to the node and stops the hedging threads.
+        """
+        if self.pool is not None:
+            self.pool.close()
+        if self.hedger is not None:
+            self.hedger.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
 
 """
     def refresh(self, query):
@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+"""
+Python library for Paessler's PRTG (http://www.paessler.com/)
+Columnar tables of objects held as NumPy arrays, for filters, group-bys and joins over a whole fleet without going
+object by object.
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from itertools import chain, islice
+
+from prtg.models import LIST_TYPE_PROPS, STATUS_CODES
+from prtg.values import import_numpy, integer
+
+INTEGER_COLUMNS = ('objid', 'parentid')
+MISSING = -1  # Code of missing values (and of ids that are not integers).
+CHUNK_SIZE = 10000  # Objects read at a time when building a table.
+
+
+def _rows(np, selection):
+    selection = np.asarray(selection)
+    return np.flatnonzero(selection) if selection.dtype == bool else selection
+
+
+def _status_code(obj):
+    """
+    :return: Status code of an object: its status_raw if it has one, else the code of its status text (MISSING if
+             there is none or it is unknown).
+    """
+    raw = getattr(obj, 'status_raw', None)
+    if isinstance(raw, str):
+        raw = integer(raw)
+    if raw is not None:
+        return int(raw)
+    return STATUS_CODES.get(getattr(obj, 'status', None), MISSING)
+
+
+def _missing(np, dtype):
+    """
+    :return: Value standing for "no value" in an array of that dtype: NaN for floats, NaT for datetimes and MISSING
+             for the integer columns (ids, status codes).
+    """
+    if dtype.kind in 'fc':
+        return np.nan
+    if dtype.kind in 'mM':
+        return np.array('NaT', dtype=dtype)
+    return MISSING
+
+
+class Categorical(object):
+    """
+    Column of strings stored as integer codes into its list of categories (MISSING where there is no value).
+    """
+
+    def __init__(self, codes, categories, index=None):
+        """
+        :param codes: numpy.int32 array.
+        :param categories: List of distinct values.
+        :param index: Dictionary of value to code (built from categories if not given).
+        """
+        self.codes = codes
+        self.categories = categories
+        self.index = index if index is not None else dict((value, code) for code, value in enumerate(categories))
+
+    @staticmethod
+    def encode(values):
+        """
+        :param values: List of values (None means missing).
+        :return: Categorical instance.
+        """
+        np = import_numpy()
+        index = dict()
+        codes = np.fromiter((MISSING if value is None else index.setdefault(value, len(index)) for value in values),
+                            dtype=np.int32, count=len(values))
+        return Categorical(codes, list(index), index)
+
+    def equals(self, value):
+        """
+        :return: Boolean mask of the rows holding the value.
+        """
+        code = self.index.get(value)
+        if code is None:
+            return import_numpy().zeros(len(self), dtype=bool)
+        return self.codes == code
+
+    def isin(self, values):
+        """
+        :return: Boolean mask of the rows holding any of the values.
+        """
+        return import_numpy().isin(self.codes, [self.index[value] for value in values if value in self.index])
+
+    def decode(self, code):
+        return None if code == MISSING else self.categories[code]
+
+    def select(self, selection):
+        """
+        :param selection: Boolean mask or array of row numbers.
+        :return: Categorical instance with the selected rows (sharing the categories).
+        """
+        return Categorical(self.codes[_rows(import_numpy(), selection)], self.categories, self.index)
+
+    def __getitem__(self, row):
+        return self.decode(self.codes[row])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __repr__(self):
+        return 'Categorical' + str({'rows': len(self), 'categories': len(self.categories)})
+
+
+class TagIndex(object):
+    """
+    Tags of every row in CSR form: the codes of the tags of row i are codes[indptr[i]:indptr[i + 1]], codes being
+    indexes into categories.
+    """
+
+    def __init__(self, indptr, codes, categories, index=None):
+        """
+        :param indptr: numpy.int64 array, one longer than the number of rows.
+        :param codes: numpy.int32 array with the tag codes of all the rows, one row after the other.
+        :param categories: List of distinct tags.
+        :param index: Dictionary of tag to code (built from categories if not given).
+        """
+        self.indptr = indptr
+        self.codes = codes
+        self.categories = categories
+        self.index = index if index is not None else dict((tag, code) for code, tag in enumerate(categories))
+
+    @staticmethod
+    def encode(tag_lists):
+        """
+        :param tag_lists: List of the tag lists of the rows (None means no tags).
+        :return: TagIndex instance.
+        """
+        np = import_numpy()
+        index = dict()
+        lengths = np.fromiter((len(tags) if tags else 0 for tags in tag_lists), dtype=np.int64, count=len(tag_lists))
+        codes = np.fromiter((index.setdefault(tag, len(index)) for tag in chain.from_iterable(
+            tags for tags in tag_lists if tags)), dtype=np.int32, count=int(lengths.sum()))
+        return TagIndex(np.concatenate([[0], np.cumsum(lengths)]), codes, list(index), index)
+
+    @property
+    def lengths(self):
+        return import_numpy().diff(self.indptr)
+
+    def _mask(self, hits):
+        np = import_numpy()
+        mask = np.zeros(len(self), dtype=bool)
+        mask[np.repeat(np.arange(len(self)), self.lengths)[hits]] = True
+        return mask
+
+    def has(self, tag):
+        """
+        :return: Boolean mask of the rows with the tag.
+        """
+        code = self.index.get(tag)
+        if code is None:
+            return import_numpy().zeros(len(self), dtype=bool)
+        return self._mask(self.codes == code)
+
+    def has_any(self, tags):
+        """
+        :return: Boolean mask of the rows with any of the tags.
+        """
+        return self._mask(import_numpy().isin(self.codes, [self.index[tag] for tag in tags if tag in self.index]))
+
+    def counts(self):
+        """
+        :return: Dictionary of tag to number of rows with it.
+        """
+        counts = import_numpy().bincount(self.codes, minlength=len(self.categories))
+        return OrderedDict((tag, int(count)) for tag, count in zip(self.categories, counts))
+
+    def select(self, selection):
+        """
+        :param selection: Boolean mask or array of row numbers.
+        :return: TagIndex instance with the selected rows (sharing the categories).
+        """
+        np = import_numpy()
+        rows = _rows(np, selection)
+        lengths = self.lengths[rows]
+        indptr = np.concatenate([[0], np.cumsum(lengths)])
+        entries = np.repeat(self.indptr[rows] - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return TagIndex(indptr, self.codes[entries], self.categories, self.index)
+
+    def __getitem__(self, row):
+        return [self.categories[code] for code in self.codes[self.indptr[row]:self.indptr[row + 1]]]
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __repr__(self):
+        return 'TagIndex' + str({'rows': len(self), 'tags': len(self.categories)})
+
+
+class ObjectTable(object):
+    """
+    Objects of a content type held by column: ids (INTEGER_COLUMNS) as numpy.int64 arrays, status as its numpy.int16
+    code (status_raw, or the code of the text in prtg.models.STATUS_CODES; MISSING if unknown), tags as a TagIndex,
+    typed columns (see prtg.values) as numpy.float64 or datetime64 arrays and any other column as a Categorical.
+    Filters return boolean masks that can be combined with & and |, and select turns a mask into a new table.
+    """
+
+    def __init__(self, content, columns):
+        """
+        :param content: Content type (e.g.: 'sensors').
+        :param columns: Ordered dictionary of column name to numpy array, Categorical or TagIndex.
+        """
+        self.content = content
+        self.columns = columns
+
+    @staticmethod
+    def _encode_column(np, name, values):
+        if name in LIST_TYPE_PROPS:
+            return TagIndex.encode(values)
+        if name in INTEGER_COLUMNS:
+            try:
+                return np.array(values, dtype=str).astype(np.int64) if values else np.array([], dtype=np.int64)
+            except ValueError:
+                pass  # Some ids are not integers (see PrtgObject.update_field): they become MISSING.
+            out = np.full(len(values), MISSING, dtype=np.int64)
+            for row, value in enumerate(values):
+                try:
+                    out[row] = int(value)
+                except (TypeError, ValueError):
+                    pass
+            return out
+        if name == 'status':  # Codes already (see _status_code).
+            return np.array(values, dtype=np.int16)
+        present = [value for value in values if value is not None]
+        if present and all(isinstance(value, datetime) for value in present):  # Typed columns (see prtg.values).
+            return np.array([value if value is not None else 'NaT' for value in values], dtype='datetime64[ms]')
+        if present and all(isinstance(value, (int, float)) for value in present):
+            return np.array([value if value is not None else np.nan for value in values], dtype=np.float64)
+        return Categorical.encode([value if value is None or isinstance(value, str) else str(value)
+                                   for value in values])
+
+    @staticmethod
+    def from_objects(objects, content=None, columns=None):
+        """
+        Builds a table from model objects (e.g.: a table response), reading them once.
+        :param objects: Iterable of objects of the same content type.
+        :param content: Content type (default: the one of the first object).
+        :param columns: Columns to take (default: the fields of the first object).
+        :return: ObjectTable instance.
+        """
+        np = import_numpy()
+        objects = iter(objects)
+        first = next(objects, None)
+        if first is not None:
+            content = content or first.content_type
+            if columns is None:
+                columns = [key for key in first.fields() if key != 'changed']
+            objects = chain([first], objects)
+        columns = list(columns or ())
+        values = OrderedDict((column, list()) for column in columns)
+        while True:
+            chunk = list(islice(objects, CHUNK_SIZE))
+            if not chunk:
+                break
+            for column, column_values in values.items():
+                if column == 'status':
+                    column_values += [_status_code(obj) for obj in chunk]
+                else:
+                    column_values += [getattr(obj, column, None) for obj in chunk]
+        return ObjectTable(content, OrderedDict((column, ObjectTable._encode_column(np, column, column_values))
+                                                for column, column_values in values.items()))
+
+    @staticmethod
+    def from_cache(cache, content, columns=None, namespace=None):
+        """
+        :param cache: prtg.cache.Cache (or prtg.cache.CacheNamespace) instance.
+        :param content: Content type (e.g.: 'sensors').
+        :param columns: Columns to take (default: the fields of the first object).
+        :param namespace: Cache namespace (None means every object).
+        :return: ObjectTable instance.
+        """
+        objects = cache.get_content(content) if namespace is None else cache.get_content(content, namespace)
+        return ObjectTable.from_objects(objects, content, columns)
+
+    @staticmethod
+    def from_query(client, query, columns=None):
+        """
+        Builds a table from the response to a table query, page by page (no more than one page of objects is held).
+        :param client: prtg.client.Client instance.
+        :param query: prtg.models.Query instance (target 'table').
+        :param columns: Columns to take (default: the fields of the first object).
+        :return: ObjectTable instance.
+        """
+        return ObjectTable.from_objects(client.iter_query(query), query.extra.get('content'), columns)
+
+    @property
+    def names(self):
+        return list(self.columns)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), ()))
+
+    def equals(self, column, value):
+        """
+        :return: Boolean mask of the rows whose column holds the value (a tag, for tags).
+        """
+        values = self.columns[column]
+        if isinstance(values, TagIndex):
+            return values.has(value)
+        if isinstance(values, Categorical):
+            return values.equals(value)
+        return values == self._code(column, value)
+
+    def isin(self, column, values):
+        """
+        :return: Boolean mask of the rows whose column holds any of the values (any of the tags, for tags).
+        """
+        column_values = self.columns[column]
+        if isinstance(column_values, TagIndex):
+            return column_values.has_any(values)
+        if isinstance(column_values, Categorical):
+            return column_values.isin(values)
+        return import_numpy().isin(column_values, [self._code(column, value) for value in values])
+
+    @staticmethod
+    def _code(column, value):
+        if column == 'status' and isinstance(value, str):
+            return STATUS_CODES.get(value, MISSING)
+        return int(value)
+
+    def select(self, selection):
+        """
+        :param selection: Boolean mask or array of row numbers.
+        :return: ObjectTable instance with the selected rows.
+        """
+        np = import_numpy()
+        rows = _rows(np, selection)
+        return ObjectTable(self.content, OrderedDict(
+            (name, values[rows] if isinstance(values, np.ndarray) else values.select(rows))
+            for name, values in self.columns.items()))
+
+    def count_by(self, *columns):
+        """
+        Counts the rows of every distinct combination of values (e.g.: count_by('parentid', 'status')).
+        :param columns: Names of the columns (not tags).
+        :return: Ordered dictionary of value (a tuple of values, for several columns) to number of rows, sorted by
+                 codes.
+        """
+        np = import_numpy()
+        if not len(self):
+            return OrderedDict()
+        keys = [self.columns[column] for column in columns]
+        codes = [(key.codes if isinstance(key, Categorical) else key).astype(np.int64) for key in keys]
+        # The codes of every row are packed into a single integer, so that grouping is a one-dimensional unique.
+        minimums = [int(code.min()) for code in codes]
+        sizes = [int(code.max()) - minimum + 1 for code, minimum in zip(codes, minimums)]
+        packed = np.ravel_multi_index([code - minimum for code, minimum in zip(codes, minimums)], sizes)
+        groups, counts = np.unique(packed, return_counts=True)
+        groups = np.stack(np.unravel_index(groups, sizes), axis=1) + minimums
+        out = OrderedDict()
+        for group, count in zip(groups.tolist(), counts.tolist()):
+            values = tuple(key.decode(code) if isinstance(key, Categorical) else int(code)
+                           for key, code in zip(keys, group))
+            out[values if len(values) > 1 else values[0]] = count
+        return out
+
+    def join(self, parents, columns=('name',), on='parentid', prefix='parent_'):
+        """
+        Adds columns of the parents of the rows (e.g.: the name of the device of every sensor).
+        :param parents: ObjectTable instance holding the parents, by objid.
+        :param columns: Names of the parents' columns to add (not tags).
+        :param on: Column holding the parent id.
+        :param prefix: Prefix of the added columns' names.
+        :return: ObjectTable instance, with missing values (MISSING, NaN or NaT, depending on the column's type) for
+                 rows whose parent is not in parents.
+        """
+        np = import_numpy()
+        ids = self.columns[on]
+        order = np.argsort(parents['objid'], kind='stable')
+        parent_ids = parents['objid'][order]
+        found = np.zeros(len(ids), dtype=bool)
+        rows = np.zeros(len(ids), dtype=np.int64)
+        if len(parent_ids):
+            positions = np.minimum(np.searchsorted(parent_ids, ids), len(parent_ids) - 1)
+            found = (parent_ids[positions] == ids) & (ids != MISSING)
+            rows = order[positions]
+        out = OrderedDict(self.columns)
+        for column in columns:
+            values = parents[column]
+            if isinstance(values, Categorical):
+                out[prefix + column] = Categorical(np.where(found, values.codes[rows], MISSING).astype(np.int32),
+                                                   values.categories, values.index)
+            else:
+                taken = values[rows] if len(values) else np.zeros(len(rows), dtype=values.dtype)
+                out[prefix + column] = np.where(found, taken, _missing(np, values.dtype)).astype(values.dtype)
+        return ObjectTable(self.content, out)
+
+    def __repr__(self):
+        return 'ObjectTable' + str({'content': self.content, 'rows': len(self), 'columns': self.names})
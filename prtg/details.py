@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Python library for Paessler's PRTG (http://www.paessler.com/)
+Bulk retrieval of per-sensor information: sensor details (getsensordetails) and channels (table content=channels).
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+from prtg.cache import ResponseCache
+from prtg.models import Query
+
+
+class SensorInfo(object):
+    """
+    Fetches the details or the channels of many sensors concurrently, through the client's pool, limiter and hedger.
+    Responses are kept in a ResponseCache (the client's one, if it has it), so repeated calls within their time to
+    live do not reach the server.
+    """
+
+    DEFAULT_TTLS = {'getsensordetails': 30, 'table': 30}
+    DEFAULT_WORKERS = 4
+
+    def __init__(self, client, response_cache=None, workers=DEFAULT_WORKERS):
+        """
+        :param client: prtg.client.Client instance.
+        :param response_cache: prtg.cache.ResponseCache instance (default: a new one, with DEFAULT_TTLS).
+        :param workers: Default maximum number of concurrent requests.
+        """
+        self.client = client
+        self.response_cache = response_cache if response_cache is not None else ResponseCache(self.DEFAULT_TTLS)
+        self.workers = workers
+
+    def _get(self, query):
+        conn = self.client._connection(query, self.response_cache)
+        conn.get_request(query, self.client.cache)
+        return conn.response
+
+    def _details(self, objid):
+        return self._get(Query(client=self.client, target='getsensordetails', objid=objid))[0]
+
+    def _channels(self, objid):
+        channels = self._get(Query(client=self.client, target='table', content='channels', objid=objid))
+        for channel in channels:
+            channel.parentid = str(objid)
+        return channels
+
+    def _fetch_all(self, function, objids, workers):
+        objids = [str(objid) for objid in objids]
+        with ThreadPoolExecutor(max_workers=workers or self.workers) as executor:
+            futures = OrderedDict((objid, executor.submit(function, objid)) for objid in OrderedDict.fromkeys(objids))
+        results = OrderedDict()
+        for objid, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                logging.error('Unable to get information of sensor {}: {}'.format(objid, error))
+            results[objid] = future.result() if error is None else error
+        return results
+
+    def details(self, objids, workers=None):
+        """
+        :param objids: Ids of the sensors.
+        :param workers: Maximum number of concurrent requests (default: self.workers).
+        :return: Ordered dictionary of sensor id to prtg.models.SensorDetails instance (or the exception that made
+                 its request fail).
+        """
+        return self._fetch_all(self._details, objids, workers)
+
+    def channels(self, objids, workers=None):
+        """
+        :param objids: Ids of the sensors.
+        :param workers: Maximum number of concurrent requests (default: self.workers).
+        :return: Ordered dictionary of sensor id to list of prtg.models.Channel instances, whose parentid is the
+                 sensor id (or the exception that made its request fail).
+        """
+        return self._fetch_all(self._channels, objids, workers)
+
+    def invalidate(self, objid, name=None):
+        """
+        Drops the cached information of a sensor (e.g.: after changing one of its properties).
+        :param objid: Sensor id.
+        :param name: Property name (None means every property).
+        """
+        self.response_cache.invalidate(objid, name)
@@ -38,3 +38,10 @@ class UnknownObjectType(PrtgException):
     Unknown object type
     """
     pass
+
+
+class DeadlineExceeded(PrtgException):
+    """
+    Query deadline exceeded
+    """
+    pass
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Python library for Paessler's PRTG (http://www.paessler.com/)
+Fan-out client: the same query sent to several independent PRTG servers at once, into a cache shared by all of them.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import as_completed, ThreadPoolExecutor
+import logging
+import time
+
+from prtg.cache import Cache
+from prtg.client import Client
+
+
+class ServerResult(object):
+    """
+    Outcome of a query on one of the servers of a FanOutClient.
+    """
+
+    def __init__(self, server, query, response=None, error=None, elapsed=0.0):
+        """
+        :param server: Server name.
+        :param query: prtg.models.Query instance sent to the server.
+        :param response: Response of the server (as returned by prtg.client.Client.query).
+        :param error: Exception that made the query fail on the server (None if it did not fail).
+        :param elapsed: Seconds the query took on the server.
+        """
+        self.server = server
+        self.query = query
+        self.response = response
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def partial(self):
+        return self.query.partial
+
+    def __repr__(self):
+        return 'ServerResult' + str({'server': self.server, 'ok': self.ok, 'partial': self.partial,
+                                     'elapsed': self.elapsed, 'error': self.error})
+
+
+class FanOutClient(object):
+    """
+    PRTG Client for several independent servers (e.g.: the cores of a cluster). Every query is sent to all the
+    servers concurrently, through one prtg.client.Client per server, and the objects are written into a single cache
+    in which every server has its own namespace (see prtg.cache.CacheNamespace), so that equal objids of different
+    servers do not collide. A server that fails or is slow does not affect the results of the others; to bound how
+    long a slow server may take, give the query a timeout.
+    """
+
+    def __init__(self, servers, username=None, password=None, cache_dir=None, credentials=None, **client_options):
+        """
+        :param servers: Dictionary of server name to root URL (e.g.: {'core1': 'https://core1.example.com'}).
+        :param username: PRTG username (for the servers without credentials of their own).
+        :param password: Password.
+        :param cache_dir: Directory where the shared cache file is going to be written.
+        :param credentials: Dictionary of server name to (username, password), for servers with their own credentials.
+        :param client_options: Keyword arguments for every prtg.client.Client (e.g.: pool_size, rate_limit).
+        """
+        if cache_dir:
+            self.cache = Cache(cache_dir)
+        else:
+            self.cache = Cache()
+        credentials = credentials or dict()
+        self.clients = OrderedDict()
+        for name, endpoint in servers.items():
+            server_username, server_password = credentials.get(name, (username, password))
+            self.clients[name] = Client(endpoint, server_username, server_password, cache=self.cache.namespace(name),
+                                        **client_options)
+
+    def _query_server(self, name, query):
+        client = self.clients[name]
+        query = query.bind(client)
+        started = time.monotonic()
+        try:
+            response = client.query(query)
+        except Exception as e:
+            logging.error('Query failed on server {}: {}'.format(name, e))
+            return ServerResult(name, query, error=e, elapsed=time.monotonic() - started)
+        elapsed = time.monotonic() - started
+        logging.debug('Query took {:.3f}s on server {}'.format(elapsed, name))
+        return ServerResult(name, query, response, elapsed=elapsed)
+
+    def iter_query(self, query, servers=None):
+        """
+        Sends a query to the servers concurrently, yielding the result of each server as soon as it finishes.
+        :param query: prtg.models.Query instance (it is copied for every server, see Query.bind).
+        :param servers: Names of the servers to send the query to (default: all of them).
+        :yield: ServerResult instances, in order of completion.
+        """
+        names = list(self.clients) if servers is None else list(servers)
+        executor = ThreadPoolExecutor(max_workers=max(1, len(names)))
+        try:
+            futures = [executor.submit(self._query_server, name, query) for name in names]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            executor.shutdown(wait=False)  # Do not wait for the servers whose results are no longer wanted.
+
+    def query(self, query, servers=None):
+        """
+        Sends a query to the servers concurrently, waiting for all of them.
+        :param query: prtg.models.Query instance (it is copied for every server, see Query.bind).
+        :param servers: Names of the servers to send the query to (default: all of them).
+        :return: Dictionary of server name to ServerResult, in the order of the servers.
+        """
+        names = list(self.clients) if servers is None else list(servers)
+        results = dict((result.server, result) for result in self.iter_query(query, names))
+        return OrderedDict((name, results[name]) for name in names)
+
+    def get_content(self, content_type):
+        """
+        Generator that retrieves the cached objects of every server by content type.
+        :param content_type: Content type to retrieve.
+        :yield: Tuples (server name, object).
+        """
+        for name in self.clients:
+            for obj in self.cache.get_content(content_type, name):
+                yield name, obj
+
+    def close(self):
+        """
+        Closes the connections to every server (see prtg.client.Client.close).
+        """
+        for client in self.clients.values():
+            client.close()
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Python library for Paessler's PRTG (http://www.paessler.com/)
+Historic data (historicdata.csv) decoded into NumPy arrays, fetched in concurrent windows that can be resumed.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import csv
+from datetime import timedelta
+import io
+import logging
+import os
+
+from prtg.models import Query
+from prtg.values import import_numpy
+
+OLE_EPOCH_DAYS = 25569.0  # OLE automation date (days since 1899-12-30) of 1970-01-01.
+MS_PER_DAY = 86400000.0
+TIMESTAMP_COLUMN = 'Date Time(RAW)'
+RAW_SUFFIX = '(RAW)'
+
+
+class HistoricData(object):
+    """
+    Historic data of a sensor: the timestamps of the samples (numpy.datetime64[ms] array) and one float64 array per
+    channel, taken from the raw values (NaN where there is no value).
+    """
+
+    def __init__(self, timestamps, channels):
+        """
+        :param timestamps: numpy.datetime64[ms] array.
+        :param channels: Ordered dictionary of channel name to numpy.float64 array (as long as timestamps).
+        """
+        self.timestamps = timestamps
+        self.channels = channels
+
+    @property
+    def names(self):
+        return list(self.channels)
+
+    @staticmethod
+    def concatenate(parts):
+        """
+        Joins consecutive pieces of the history of a sensor. Channels missing in some of them are filled with NaN.
+        Adjacent windows share their boundary (the end of one is the start of the next one) and PRTG returns a sample
+        on it with both, so the samples of a piece that are not after the last sample of the pieces before it are
+        dropped.
+        :param parts: Iterable of HistoricData instances, in order.
+        :return: HistoricData instance.
+        """
+        np = import_numpy()
+        parts = list(parts)
+        names = list()
+        rows = list()
+        last = None
+        for part in parts:
+            names += [name for name in part.channels if name not in names]
+            keep = np.flatnonzero(part.timestamps > last) if last is not None else np.arange(len(part))
+            rows.append(keep)
+            if len(keep):
+                last = part.timestamps[keep[-1]]
+        timestamps = np.concatenate([part.timestamps[keep] for part, keep in zip(parts, rows)] or
+                                    [np.array([], dtype='datetime64[ms]')])
+        channels = OrderedDict()
+        for name in names:
+            channels[name] = np.concatenate(
+                [part.channels[name][keep] if name in part.channels else np.full(len(keep), np.nan)
+                 for part, keep in zip(parts, rows)])
+        return HistoricData(timestamps, channels)
+
+    def save(self, path):
+        """
+        Writes the data into an .npz file (atomically, so that an interrupted write leaves no file behind).
+        :param path: File path.
+        """
+        np = import_numpy()
+        values = np.column_stack(list(self.channels.values())) if self.channels else np.empty((len(self), 0))
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            np.savez(f, timestamps=self.timestamps, values=values, names=np.array(self.names, dtype=str))
+        os.replace(temporary, path)
+
+    @staticmethod
+    def load(path):
+        """
+        Reads data written by save.
+        :param path: File path.
+        :return: HistoricData instance.
+        """
+        np = import_numpy()
+        with np.load(path) as data:
+            names = [str(name) for name in data['names']]
+            values = data['values']
+            return HistoricData(data['timestamps'], OrderedDict((name, values[:, i]) for i, name in enumerate(names)))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __repr__(self):
+        return 'HistoricData' + str({'samples': len(self), 'channels': self.names})
+
+
+def _parse_floats(np, buffer, starts, lengths, chunk=1 << 18):
+    """
+    Converts many fields of a buffer into floats at once (empty fields are NaN).
+    :param buffer: numpy.uint8 array.
+    :param starts: Array with the offset of every field.
+    :param lengths: Array with the length of every field.
+    :return: numpy.float64 array shaped like starts.
+    """
+    shape = starts.shape
+    starts, lengths = starts.ravel(), lengths.ravel()
+    out = np.empty(len(starts), dtype=np.float64)
+    width = max(3, int(lengths.max())) if len(lengths) else 3
+    # Every field is a row of a (strided, not copied) view of the buffer, so that fields are gathered in one go.
+    windows = np.lib.stride_tricks.sliding_window_view(np.concatenate([buffer, np.zeros(width, np.uint8)]), width)
+    offsets = np.arange(width)
+    nan = np.frombuffer(b'nan', dtype=np.uint8)
+    for first in range(0, len(starts), chunk):
+        chars = windows[starts[first:first + chunk]]
+        chunk_lengths = lengths[first:first + chunk]
+        chars[offsets >= chunk_lengths[:, None]] = 0
+        chars[chunk_lengths == 0, :3] = nan
+        out[first:first + chunk] = chars.view('S{}'.format(width)).ravel().astype(np.float64)
+    return out.reshape(shape)
+
+
+def _decode_fields(np, data, start, columns):
+    """
+    Locates the fields of a CSV body in which every field is quoted, without a Python loop over its rows.
+    :return: Tuple (buffer, starts, lengths), starts and lengths being shaped (rows, columns); None if the body is not
+             as expected (e.g.: it has escaped quotes).
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    quotes = np.flatnonzero(buffer[start:] == ord('"')) + start
+    if len(quotes) % (2 * columns):
+        return None
+    opening, closing = quotes[0::2], quotes[1::2]
+    if len(opening) > 1:
+        separators = buffer[closing[:-1] + 1]
+        row_end = (np.arange(1, len(opening)) % columns) == 0
+        commas = (separators == ord(',')) & (opening[1:] - closing[:-1] == 2)
+        newlines = (separators == ord('\r')) | (separators == ord('\n'))
+        if not np.all(np.where(row_end, newlines, commas)):
+            return None
+    return buffer, (opening + 1).reshape(-1, columns), (closing - opening - 1).reshape(-1, columns)
+
+
+def decode_csv(data):
+    """
+    Decodes a historicdata.csv response into arrays, from its raw columns ('Date Time(RAW)' and '<channel>(RAW)').
+    Fields are located and converted with vectorised NumPy operations; only responses that cannot be handled that way
+    (e.g.: with escaped quotes) go through the csv module. Rows without a timestamp (the averages at the end) are
+    dropped.
+    :param data: Response body (bytes).
+    :return: HistoricData instance.
+    """
+    np = import_numpy()
+    header_end = data.find(b'\n')
+    if header_end < 0:
+        header_end = len(data)
+    header = next(csv.reader([data[:header_end].decode('utf-8-sig').strip()]), [])
+    raw_columns = [i for i, name in enumerate(header) if name.endswith(RAW_SUFFIX)]
+    if TIMESTAMP_COLUMN not in header:
+        return HistoricData(np.array([], dtype='datetime64[ms]'), OrderedDict())
+
+    fields = _decode_fields(np, data, header_end + 1, len(header))
+    if fields is not None:
+        buffer, starts, lengths = fields
+        values = _parse_floats(np, buffer, starts[:, raw_columns], lengths[:, raw_columns])
+    else:
+        logging.debug('Historic data not decodable in bulk, using the csv module')
+        rows = [row for row in csv.reader(io.StringIO(data[header_end + 1:].decode('utf-8'))) if row]
+        values = np.array([[float(row[i]) if row[i] else np.nan for i in raw_columns] for row in rows],
+                          dtype=np.float64).reshape(-1, len(raw_columns))
+
+    days = values[:, raw_columns.index(header.index(TIMESTAMP_COLUMN))]
+    keep = ~np.isnan(days)
+    timestamps = np.round((days[keep] - OLE_EPOCH_DAYS) * MS_PER_DAY).astype(np.int64).astype('datetime64[ms]')
+    channels = OrderedDict()
+    for i, column in enumerate(raw_columns):
+        name = header[column]
+        if name != TIMESTAMP_COLUMN:
+            channels[name[:-len(RAW_SUFFIX)]] = values[keep, i]
+    return HistoricData(timestamps, channels)
+
+
+class HistoricDataFetcher(object):
+    """
+    Fetches the historic data of many sensors over a long period: the period is split into windows, and the windows of
+    all the sensors are requested concurrently (through the client, so its pool and limiter apply). If a checkpoint
+    directory is given, every window is written there as soon as it arrives and windows already there are not
+    requested again, so an interrupted fetch can be resumed by running it again.
+    """
+
+    DEFAULT_WINDOW = timedelta(days=1)
+    DEFAULT_WORKERS = 4
+    DATE_FORMAT = '%Y-%m-%d-%H-%M-%S'
+    FILE_DATE_FORMAT = '%Y%m%d%H%M%S'
+
+    def __init__(self, client, window=DEFAULT_WINDOW, workers=DEFAULT_WORKERS, average=0, checkpoint_dir=None):
+        """
+        :param client: prtg.client.Client instance.
+        :param window: datetime.timedelta covered by every request.
+        :param workers: Maximum number of concurrent requests.
+        :param average: Averaging interval in seconds (0 means raw data; PRTG limits its period per request).
+        :param checkpoint_dir: Directory where the fetched windows are kept (None means no checkpoints).
+        """
+        self.client = client
+        self.window = window
+        self.workers = workers
+        self.average = average
+        self.checkpoint_dir = checkpoint_dir
+
+    def windows(self, start, end):
+        """
+        :param start: datetime.datetime of the beginning of the period.
+        :param end: datetime.datetime of the end of the period.
+        :return: List of (start, end) tuples covering the period.
+        """
+        out = list()
+        while start < end:
+            out.append((start, min(start + self.window, end)))
+            start += self.window
+        return out
+
+    def _checkpoint(self, objid, start, end):
+        if self.checkpoint_dir is None:
+            return None
+        return os.path.join(self.checkpoint_dir, '{}_{}_{}_{}.npz'.format(
+            objid, start.strftime(self.FILE_DATE_FORMAT), end.strftime(self.FILE_DATE_FORMAT), self.average))
+
+    def _fetch_window(self, objid, start, end):
+        checkpoint = self._checkpoint(objid, start, end)
+        if checkpoint is not None and os.path.exists(checkpoint):
+            logging.debug('Historic data already fetched: {}'.format(checkpoint))
+            return HistoricData.load(checkpoint)
+        query = Query(client=self.client, target='historicdata', objid=objid, output='csv')
+        query.set_period(start.strftime(self.DATE_FORMAT), end.strftime(self.DATE_FORMAT), self.average)
+        data = self.client.query(query)[0]
+        if checkpoint is not None:
+            data.save(checkpoint)
+        return data
+
+    def fetch(self, objids, start, end):
+        """
+        :param objids: Ids of the sensors.
+        :param start: datetime.datetime of the beginning of the period.
+        :param end: datetime.datetime of the end of the period.
+        :return: Ordered dictionary of sensor id to HistoricData instance.
+        :raise Exception: The first error of a window, once every other window has been fetched (and checkpointed).
+        """
+        windows = self.windows(start, end)
+        if self.checkpoint_dir is not None:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = OrderedDict((str(objid), [executor.submit(self._fetch_window, objid, window_start, window_end)
+                                                for window_start, window_end in windows]) for objid in objids)
+        errors = [future.exception() for parts in futures.values() for future in parts if future.exception()]
+        if errors:
+            logging.error('{} historic data windows failed'.format(len(errors)))
+            raise errors[0]
+        return OrderedDict((objid, HistoricData.concatenate(future.result() for future in parts))
+                           for objid, parts in futures.items())
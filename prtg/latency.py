@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Python library for Paessler's PRTG (http://www.paessler.com/)
+Tail-latency control: deadline budgets for whole queries and hedged (duplicated) requests for slow pages.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import logging
+from threading import Lock
+import time
+
+from prtg.exceptions import DeadlineExceeded
+
+
+class Deadline(object):
+    """
+    Time budget of a query, shared by all its pages and retries.
+    """
+
+    def __init__(self, seconds):
+        """
+        :param seconds: Seconds from now until the deadline.
+        """
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        """
+        :return: Seconds left (0 if the deadline has passed).
+        """
+        return max(0.0, self.expires - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self, query):
+        """
+        :param query: Query the deadline belongs to (for the error message).
+        :raise DeadlineExceeded: If the deadline has passed.
+        """
+        if self.expired:
+            raise DeadlineExceeded('Deadline of {}s exceeded: {}'.format(self.seconds, query))
+
+    def __repr__(self):
+        return 'Deadline' + str({'seconds': self.seconds, 'remaining': self.remaining()})
+
+
+class Hedger(object):
+    """
+    Hedged requests: a request that takes longer than the given percentile of the latencies seen so far is sent again,
+    and whichever copy answers first wins (the other one is left to finish in the background and its result is
+    dropped). Only meant for idempotent requests. Hedging starts after MIN_SAMPLES requests, and at most max_ratio of
+    the requests are duplicated, so that a slow server is not flooded with copies.
+    """
+
+    DEFAULT_PERCENTILE = 95
+    MAX_RATIO = 0.1
+    MIN_SAMPLES = 20
+    WINDOW = 200
+
+    def __init__(self, percentile=DEFAULT_PERCENTILE, max_workers=8, max_ratio=MAX_RATIO, min_samples=MIN_SAMPLES,
+                 window=WINDOW):
+        """
+        :param percentile: Percentile (0-100) of the recent latencies after which a request is hedged.
+        :param max_workers: Maximum number of requests (originals and copies) in flight through the hedger.
+        :param max_ratio: Maximum fraction of the requests that may be hedged.
+        :param min_samples: Number of latencies to observe before hedging.
+        :param window: Number of recent latencies the percentile is computed over.
+        """
+        self.percentile = percentile
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prtg-hedge')
+
+    def delay(self):
+        """
+        :return: Seconds after which a request is hedged (None while there are not enough latencies observed).
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.percentile / 100.0))]
+
+    def observe(self, latency):
+        """
+        :param latency: Seconds a successful request took.
+        """
+        with self._lock:
+            self._latencies.append(latency)
+
+    def _timed(self, function, *args):
+        started = time.monotonic()
+        result = function(*args)
+        self.observe(time.monotonic() - started)
+        return result
+
+    def _take_hedge(self):
+        with self._lock:
+            if self.hedged + 1 > self.max_ratio * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def run(self, function, *args, timeout=None):
+        """
+        Calls a function, calling it again concurrently if it is slower than the hedging delay.
+        :param function: Idempotent function (e.g.: the request of a page).
+        :param args: Arguments for the function.
+        :param timeout: Seconds to wait for the result (None means no limit).
+        :return: Result of the first call that succeeds (or the exception of the last one, if all of them failed).
+        :raise DeadlineExceeded: If no call finished within the timeout.
+        """
+        with self._lock:
+            self.requests += 1
+        delay = self.delay()
+        if delay is None:
+            return self._timed(function, *args)
+
+        started = time.monotonic()
+        primary = self._executor.submit(self._timed, function, *args)
+        futures = [primary]
+        done, _ = wait(futures, timeout=delay if timeout is None else min(delay, timeout))
+        if not done and (timeout is None or delay < timeout) and self._take_hedge():
+            logging.debug('Request slower than {:.3f}s (p{}), hedging it'.format(delay, self.percentile))
+            futures.append(self._executor.submit(self._timed, function, *args))
+        while True:
+            remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - started))
+            done, _ = wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded('No response within {:.3f}s'.format(timeout))
+            for future in done:
+                futures.remove(future)
+                if future.exception() is None or not futures:
+                    if future is not primary and future.exception() is None:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+
+    def close(self):
+        """
+        Stops the worker threads (without waiting for the requests in flight).
+        """
+        self._executor.shutdown(wait=False)
+
+    def __repr__(self):
+        return 'Hedger' + str({'percentile': self.percentile, 'delay': self.delay(), 'requests': self.requests,
+                               'hedged': self.hedged, 'hedge_wins': self.hedge_wins})
@@ -4,7 +4,11 @@
 PrtgObject Models
 """
 
-from prtg.exceptions import BadTarget
+from copy import copy
+import urllib.parse
+
+from prtg.exceptions import BadRequest, BadTarget
+from prtg.values import raw_columns
 
 
 INHERITED_PROPS = {'tags'}
@@ -12,16 +16,60 @@ LIST_TYPE_PROPS = {'tags'}
 
 CONTENT_TYPE_ALL = 'all'
 CONTENT_TYPES = ['groups', 'devices', 'sensors']
+TABLE_CONTENT_TYPES = CONTENT_TYPES + ['channels']  # Channels belong to a sensor (their objids are not unique).
+
+FILTER_FUNCTIONS = ['sub', 'neq', 'above', 'below']
+STATUS_CODES = {
+    'Unknown': 1, 'Scanning': 2, 'Up': 3, 'Warning': 4, 'Down': 5, 'No Probe': 6, 'Paused by User': 7,
+    'Paused by Dependency': 8, 'Paused by Schedule': 9, 'Unusual': 10, 'Not Licensed': 11, 'Paused Until': 12,
+    'Down Acknowledged': 13, 'Down Partial': 14
+}
+
+
+def _to_tags(value):
+    """
+    :return: Tags (or any list property) as a tuple, immutable so that objects with the same tags can share it.
+    """
+    if isinstance(value, str):
+        return tuple(value.split(' ')) if value else ()
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def _materialise(key, value):
+    return _to_tags(value) if key in LIST_TYPE_PROPS else value
+
+
+_getstate = getattr(object, '__getstate__', None)  # Python 3.11+.
+
+
+def _rebuild(kind, fields):
+    """
+    Unpickles a model object (see PrtgObject.__reduce__).
+    """
+    prtg_object = kind.build(fields)
+    for key, value in fields.items():
+        if key not in prtg_object._fields:
+            setattr(prtg_object, key, value)
+    return prtg_object
 
 
 class PrtgObject(object):
     """
     PRTG base object.
+
+    Objects are built through a single path, build (which the constructor also takes): the columns found in the
+    item are stored in __slots__ of a record class generated, and cached, for that set of columns, so an object costs
+    one pointer per field it actually has instead of a dictionary. Any other attribute set later (e.g.: by rules or
+    cache updates) goes to the instance dictionary, which is only created then. 'changed', 'objid' and 'type' have
+    defaults (False, None and the class name). Objects built with build_lazy keep the raw values of their item and
+    decode each field the first time it is read.
     """
 
-    changed = False
+    __slots__ = ('changed', '__dict__')
+
     content_type = 'prtg'
-    objid = None
 
     column_table = {
         'all': [
@@ -44,31 +92,144 @@ class PrtgObject(object):
         'groups': [
             'group', 'device', 'sensor'
         ],
+        'sensordetails': [
+            'name', 'sensortype', 'interval', 'probename', 'parentgroupname', 'parentdevicename', 'parentdeviceid',
+            'lastvalue', 'lastmessage', 'favorite', 'statustext', 'statusid', 'lastup', 'lastdown', 'lastcheck',
+            'uptime', 'uptimetime', 'downtime', 'downtimetime', 'updowntotal', 'updownsince'
+        ],
+        'channels': [
+            'lastvalue', 'lastvalue_raw'
+        ],
         'status': [
             'NewMessages', 'NewAlarms', 'Alarms', 'AckAlarms', 'NewToDos', 'Clock', 'ActivationStatusMessage',
             'BackgroundTasks', 'CorrelationTasks', 'AutoDiscoTasks', 'Version', 'PRTGUpdateAvailable', 'IsAdminUser',
             'IsCluster', 'ReadOnlyUser', 'ReadOnlyAllowAcknowledge'
         ]
     }
+    common_columns = frozenset(column_table['all'])
+    columns = common_columns.union(raw_columns(common_columns))
+    defaults = {'changed': False, 'objid': None}
+
+    _fields = ()
+    _positions = dict()  # Lazy records: column name to position in the raw values.
+
+    def __init_subclass__(cls, record=False, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not record:
+            cls._kind = cls
+            cls._builders = dict()
+            cls._records = dict()
+            cls._lazy_records = dict()
+            columns = cls.common_columns.union(cls.column_table.get(cls.content_type, ()))
+            cls.columns = columns.union(raw_columns(columns))
+
+    def __new__(cls, **kwargs):
+        return cls.build(kwargs)
 
     def __init__(self, **kwargs):
-        self.type = str(self.__class__.__name__)
-        for key in self.column_table['all']:
+        pass  # Everything is done by build.
+
+    @classmethod
+    def build(cls, fields):
+        """
+        Builds an object from the fields of an item. Keys that are not columns of the class are ignored, and tags are
+        split into a list.
+        :param fields: Dictionary of column name to value (as text).
+        :return: Instance of (a record class of) this class.
+        """
+        keys = tuple(fields)
+        builder = cls._kind._builders.get(keys)
+        if builder is None:
+            builder = cls._kind._builders[keys] = cls._kind._make_builder(keys)
+        return builder(fields)
+
+    @classmethod
+    def _make_builder(cls, keys):
+        fields = tuple(key for key in keys if key in cls.columns)
+        record = cls._records.get(frozenset(fields))
+        if record is None:
+            record = type(cls.__name__, (cls,), {'__slots__': fields, '__module__': cls.__module__,
+                                                  '__qualname__': cls.__qualname__, '_fields': fields}, record=True)
+            cls._records[frozenset(fields)] = record
+        # The constructor of every set of keys is compiled once, so that building an object is a run of plain stores.
+        lines = ['def build(fields):', '    self = new(record)']
+        for key in fields:
+            value = 'fields[{!r}]'.format(key)
+            if key in LIST_TYPE_PROPS:
+                value = 'to_tags({})'.format(value)
+            lines.append('    self.{} = {}'.format(key, value))
+        lines.append('    return self')
+        namespace = {'new': object.__new__, 'record': record, 'to_tags': _to_tags}
+        exec('\n'.join(lines), namespace)
+        return namespace['build']
+
+    @classmethod
+    def build_lazy(cls, keys, values, materialise=None):
+        """
+        Builds an object that keeps the raw values of an item as they come and decodes every field only the first time
+        it is read (then the decoded value is kept). Writing the object into the cache (pickling it) decodes them all.
+        :param keys: Tuple of the column names of the item.
+        :param values: Tuple of their raw values, in the same order.
+        :param materialise: Function (column name, raw value) -> value (default: tags are split into a list, the rest
+                            is kept as it is).
+        :return: Instance of (a lazy record class of) this class.
+        """
+        record = cls._kind._lazy_records.get((keys, materialise))
+        if record is None:
+            record = cls._kind._lazy_records[(keys, materialise)] = cls._kind._make_lazy_record(keys, materialise)
+        self = object.__new__(record)
+        self._raw = values
+        return self
+
+    @classmethod
+    def _make_lazy_record(cls, keys, materialise):
+        positions = dict()
+        for position, key in enumerate(keys):
+            if key in cls.columns and key not in positions:
+                positions[key] = position
+        fields = tuple(positions)
+        return type(cls.__name__, (cls,), {
+            '__slots__': fields + ('_raw',), '__module__': cls.__module__, '__qualname__': cls.__qualname__,
+            '_fields': fields, '_positions': positions,
+            '_materialise': staticmethod(materialise or _materialise)}, record=True)
+
+    def __getattr__(self, name):
+        position = self._positions.get(name)
+        if position is not None:
+            value = self._materialise(name, self._raw[position])
+            setattr(self, name, value)
+            return value
+        if name == 'type':
+            return self._kind.__name__
+        try:
+            return self.defaults[name]
+        except KeyError:
+            raise AttributeError('{!r} object has no attribute {!r}'.format(self.__class__.__name__, name))
+
+    def fields(self):
+        """
+        :return: Dictionary of the attributes set on the object.
+        """
+        out = dict()
+        for key in self._fields + ('changed',):
             try:
-                value = kwargs[key]
-                self.update_field(key, value)
-            except KeyError:
-                pass
+                out[key] = object.__getattribute__(self, key)
+            except AttributeError:
+                if key in self._positions:
+                    out[key] = getattr(self, key)
+        if _getstate is None:
+            out.update(vars(self))
+        else:  # Unlike vars, it does not create the instance dictionary of objects that have none.
+            state = _getstate(self)
+            out.update((state[0] if isinstance(state, tuple) else state) or ())
+        return out
 
     def update_field(self, key, value, inherited_values=None):
-        if key in LIST_TYPE_PROPS:  # Process as a list
+        if key in LIST_TYPE_PROPS:  # Process as a list (of tags), held as a tuple
             if isinstance(value, str):
-                if value:
-                    value = value.split(' ')
-                else:
-                    value = []
+                value = _to_tags(value)
                 if inherited_values:
-                    value += inherited_values
+                    value += tuple(inherited_values)
         # This was commented out because we found non-integer ids which we don't know if they are correct.
         # if key == 'objid':
         #     value = int(value)
@@ -76,57 +237,54 @@ class PrtgObject(object):
         #     value = int(value)
         self.__setattr__(key, value)
 
+    def __reduce__(self):
+        return _rebuild, (self._kind, self.fields())
+
     def __repr__(self):
-        return self.__class__.__name__ + str(vars(self))
+        return self.__class__.__name__ + str(self.fields())
+
+
+PrtgObject._kind = PrtgObject
+PrtgObject._builders = dict()
+PrtgObject._records = dict()
+PrtgObject._lazy_records = dict()
 
 
-# TODO: Generify these.
 class Sensor(PrtgObject):
     """
     PRTG sensor object.
     """
 
+    __slots__ = ()
     content_type = 'sensors'
 
-    def __init__(self, **kwargs):
-        PrtgObject.__init__(self, **kwargs)
-        for key in self.column_table['sensors']:
-            try:
-                self.__setattr__(key, kwargs[key])
-            except KeyError:
-                pass
-
 
 class Device(PrtgObject):
     """
     PRTG device object.
     """
 
+    __slots__ = ()
     content_type = 'devices'
 
-    def __init__(self, **kwargs):
-        PrtgObject.__init__(self, **kwargs)
-        for key in self.column_table['devices']:
-            try:
-                self.__setattr__(key, kwargs[key])
-            except KeyError:
-                pass
-
 
 class Group(PrtgObject):
     """
     PRTG group object.
     """
 
+    __slots__ = ()
     content_type = 'groups'
 
-    def __init__(self, **kwargs):
-        PrtgObject.__init__(self, **kwargs)
-        for key in self.column_table['groups']:
-            try:
-                self.__setattr__(key, kwargs[key])
-            except KeyError:
-                pass
+
+class Channel(PrtgObject):
+    """
+    PRTG channel object (table content=channels). Its objid is the channel id within its sensor, whose id is its
+    parentid.
+    """
+
+    __slots__ = ()
+    content_type = 'channels'
 
 
 class Status(PrtgObject):
@@ -134,15 +292,17 @@ class Status(PrtgObject):
     PRTG Status Object.
     """
 
+    __slots__ = ()
     content_type = 'status'
 
-    def __init__(self, **kwargs):
-        PrtgObject.__init__(self, **kwargs)
-        for key in self.column_table['status']:
-            try:
-                self.__setattr__(key, kwargs[key])
-            except KeyError:
-                pass
+
+class SensorDetails(PrtgObject):
+    """
+    PRTG sensor details object (getsensordetails).
+    """
+
+    __slots__ = ()
+    content_type = 'sensordetails'
 
 
 class Query(object):
@@ -154,9 +314,12 @@ class Query(object):
     __DEFAULT_MAXIMUM = 500
 
     targets = {
-        'table': {'extension': '.xml?'}, 'getstatus': {'extension': '.xml?'}, 'getpasshash': {'extension': '.htm?'},
-        'setobjectproperty': {'extension': '.htm?'}, 'getobjectproperty': {'extension': '.htm?'}
+        'table': {'extension': '.xml?', 'json': '.json?'}, 'getstatus': {'extension': '.xml?', 'json': '.json?'},
+        'getsensordetails': {'extension': '.xml?', 'json': '.json?'}, 'getpasshash': {'extension': '.htm?'},
+        'setobjectproperty': {'extension': '.htm?'}, 'getobjectproperty': {'extension': '.htm?'},
+        'historicdata': {'extension': '.xml?', 'csv': '.csv?'}
     }
+    outputs = ['xml', 'json', 'csv']
 
     args = []
     target = ''
@@ -164,28 +327,43 @@ class Query(object):
     url_str = '{}/api/{}username={}&password={}'
     method = 'GET'
     default_columns = ['objid', 'parentid', 'name', 'tags', 'active', 'status']
+    channel_columns = ['objid', 'name', 'lastvalue_']  # 'lastvalue_' gives both lastvalue and lastvalue_raw.
 
     def __init__(self, client, target, maximum=__DEFAULT_MAXIMUM, content='', objid=None, name=None, value=None,
-                 parent_value=None):
+                 parent_value=None, output='xml', columns=None, filters=None, timeout=None, typed=False, lazy=False):
         """
         :param client: prtg.client.Client instance.
         :param target: Target string (e.g.: 'table').
         :param maximum: Maximum number of items per iteration.
         :param content: If target 'table', table which is going to be queried.
-        :param objid: Object Id.
+        :param objid: Object Id (for the sensor tree, the object at its top; for channels, their sensor).
         :param name: Attribute name.
         :param value: Value.
         :param parent_value: Parent object's value.
+        :param output: Response format, 'xml', 'json' or 'csv' (only for targets that support it).
+        :param columns: If target 'table', columns to retrieve (default: default_columns). They have to be known
+                        columns of the content type (see PrtgObject.column_table); 'objid' is always included.
+        :param filters: If target 'table', server-side filters as (column, value) pairs (see add_filter).
+        :param timeout: Seconds the whole query may take, all its pages and retries included (None means no limit).
+                        If a table query runs out of time, the pages read so far are kept and it is marked as partial.
+        :param typed: If True, the raw variants of the columns are requested too, and converted into typed values as
+                      every page is decoded (see prtg.values.convert_page).
+        :param lazy: If True, table items are decoded lazily: every object keeps the raw values of its item and
+                     decodes a field the first time it is read (see PrtgObject.build_lazy).
         """
 
         if target not in self.targets:
             raise BadTarget('Invalid API target: {}'.format(target))
+        if output not in self.outputs or (output != 'xml' and output not in self.targets[target]):
+            raise BadTarget('Invalid output for API target {}: {}'.format(target, output))
 
         self.endpoint = client.endpoint
         self.username = client.username
         self.password = client.password
         self.method = 'GET'
-        self.target = target + self.targets[target]['extension']
+        self.target_name = target
+        self.output = output
+        self.target = target + self.targets[target]['extension' if output == 'xml' else output]
         self.parent_value = parent_value
         self.paginate = False
         self.response = list()
@@ -193,13 +371,38 @@ class Query(object):
         self.maximum = maximum
         self.extra = dict()
         self.expect_response = True
+        self.columns = None
+        self.filters = list()
+        self.bytes_wire = 0
+        self.bytes_decoded = 0
+        self.timeout = timeout
+        self.deadline = None
+        self.partial = False
+        self.typed = typed
+        self.lazy = lazy
 
         if target == 'table':
-            self.extra.update({'columns': ','.join(self.default_columns)})
+            default_columns = self.channel_columns if content == 'channels' else self.default_columns
+            self.columns = default_columns if columns is None else self.project(content, columns)
+            if typed:
+                self.columns = self.columns + [column for column in raw_columns(self.columns)
+                                               if column not in self.columns]
+            self.extra.update({'columns': ','.join(self.columns)})
 
         if content:
             self.extra.update({'content': content})
 
+        if content == 'channels':
+            if not objid:
+                raise BadTarget('Channels need the id of their sensor')
+            self.extra.update({'id': str(objid)})
+
+        if content == 'sensortree':
+            if output != 'xml':
+                raise BadTarget('The sensor tree is only available as XML')
+            if objid:
+                self.extra.update({'id': str(objid)})  # Root of the tree.
+
         if target == 'setobjectproperty':
             if not objid or not name or value is None:
                 raise BadTarget
@@ -211,11 +414,154 @@ class Query(object):
                 raise BadTarget
             self.extra.update({'id': objid, 'name': name})
 
-    def increment(self):
+        if target == 'getsensordetails':
+            if not objid:
+                raise BadTarget
+            self.extra.update({'id': objid})
+
+        if target == 'historicdata':
+            if not objid:
+                raise BadTarget
+            self.extra.update({'id': str(objid)})
+
+        for column, filter_value in filters or []:
+            self.add_filter(column, filter_value)
+
+    @staticmethod
+    def project(content, columns):
+        """
+        Validates a column projection for a table.
+        :param content: Content type (e.g.: 'sensors').
+        :param columns: Iterable of column names.
+        :return: List of columns, in the given order and starting with 'objid'.
+        :raise BadRequest: If the content type is unknown or a column does not belong to it.
+        """
+        if content not in TABLE_CONTENT_TYPES:
+            raise BadRequest('Cannot project columns of unknown content type: {}'.format(content))
+        valid = set(PrtgObject.column_table[CONTENT_TYPE_ALL] + PrtgObject.column_table[content])
+        valid.update(raw_columns(valid))
+        invalid = [column for column in columns if column not in valid]
+        if invalid:
+            raise BadRequest('Invalid columns for {}: {}'.format(content, ', '.join(invalid)))
+        projection = ['objid']
+        for column in columns:
+            if column not in projection:
+                projection.append(column)
+        return projection
+
+    def add_filter(self, column, value, function=None):
+        """
+        Adds a server-side filter (filter_<column>=<value>). PRTG ORs the values given for the same column and ANDs
+        the different columns.
+        :param column: Column name (it has to belong to the queried content type).
+        :param value: Value to match (it can already be a function, e.g.: '@sub(abc)').
+        :param function: Optional filter function wrapping the value ('sub', 'neq', 'above' or 'below').
+        :return: This query.
+        :raise BadTarget: If the target is not 'table'.
+        :raise BadRequest: If the column or the function is unknown.
+        """
+        if self.target_name != 'table':
+            raise BadTarget('Filters can only be applied to tables')
+        content = self.extra.get('content')
+        valid = PrtgObject.column_table[CONTENT_TYPE_ALL] + PrtgObject.column_table.get(content, [])
+        if column not in valid:
+            raise BadRequest('Cannot filter {} by column: {}'.format(content, column))
+        if function is not None:
+            if function not in FILTER_FUNCTIONS:
+                raise BadRequest('Invalid filter function: {}'.format(function))
+            value = '@{}({})'.format(function, value)
+        self.filters.append(('filter_' + column, str(value)))
+        return self
+
+    def filter_status(self, *statuses):
+        """
+        Keeps only the objects in any of the given statuses.
+        :param statuses: Status names (see STATUS_CODES) or codes.
+        :return: This query.
+        """
+        for status in statuses:
+            self.add_filter('status', STATUS_CODES.get(status, status))
+        return self
+
+    def filter_tags(self, *tags):
+        """
+        Keeps only the objects having any of the given tags.
+        :param tags: Tag names.
+        :return: This query.
+        """
+        return self.add_filter('tags', '@tag({})'.format(','.join(tags)))
+
+    def set_period(self, start, end, average=0):
+        """
+        Sets the period of a historicdata query.
+        :param start: Beginning of the period, as PRTG takes it (e.g.: '2016-01-20-00-00-00').
+        :param end: End of the period.
+        :param average: Averaging interval in seconds (0 means raw data).
+        :return: This query.
+        :raise BadTarget: If the target is not 'historicdata'.
+        """
+        if self.target_name != 'historicdata':
+            raise BadTarget('Only historic data has a period')
+        self.extra.update({'sdate': start, 'edate': end, 'avg': str(average)})
+        return self
+
+    def increment(self, maximum=None):
         """
         Increment counter in self.maximum, to continue iterating through the list of items.
+        :param maximum: If given, new maximum number of items for the next iterations.
         """
         self.counter += self.maximum
+        if maximum is not None:
+            self.maximum = maximum
+
+    def page(self, start):
+        """
+        Copy of this query pointing at another page of the list of items.
+        :param start: Index of the first item of the page.
+        :return: prtg.models.Query instance.
+        """
+        query = copy(self)
+        query.extra = dict(self.extra)
+        query.filters = list(self.filters)
+        query.counter = start
+        return query
+
+    def bind(self, client):
+        """
+        Copy of this query to be sent through another client (i.e., to another PRTG server), from its first page.
+        :param client: prtg.client.Client instance.
+        :return: prtg.models.Query instance.
+        """
+        query = self.page(0)
+        query.endpoint = client.endpoint
+        query.username = client.username
+        query.password = client.password
+        query.bytes_wire = 0
+        query.bytes_decoded = 0
+        query.deadline = None
+        query.partial = False
+        return query
+
+    @property
+    def read_only(self):
+        """
+        True if sending the query does not change anything in the server.
+        """
+        return self.target_name != 'setobjectproperty'
+
+    def key(self):
+        """
+        Normalised identity of the query: its URL without credentials and with the parameters sorted (filters are
+        sorted too, since their order does not change the result), plus the decode mode, since lazy and eager objects
+        cannot stand in for one another.
+        :return: String.
+        """
+        params = [('start', self.counter), ('count', self.maximum)]
+        params += sorted((key, str(value)) for key, value in self.extra.items() if value)
+        params += sorted(self.filters)
+        if self.lazy:
+            params.append(('lazy', 1))
+        return '{} {}/api/{}{}'.format(self.method, self.endpoint, self.target, urllib.parse.urlencode(params))
 
     def get_url(self):
         """
@@ -227,10 +573,13 @@ class Query(object):
         _url += '&start={}&count={}'.format(self.counter, self.maximum)
 
         if self.extra:
-            import urllib.parse
             _url += '&' + '&'.join(map(lambda x: '{}={}'.format(x[0], urllib.parse.quote(x[1])),
                                        filter(lambda z: z[1], self.extra.items())))
 
+        if self.filters:
+            _url += '&' + '&'.join(map(lambda x: '{}={}'.format(x[0], urllib.parse.quote(x[1], safe='@(),')),
+                                       self.filters))
+
         return _url
 
     def __str__(self):
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Python library for Paessler's PRTG (http://www.paessler.com/)
+"""
+
+import logging
+
+
+class AdaptivePageSize(object):
+    """
+    Page size ('count') for table pagination that adapts to the observed latency and size of the pages: it grows or
+    shrinks toward the number of items the server delivers in target_latency seconds (and, optionally, in max_bytes
+    bytes), never changing more than by a factor of MAX_STEP at a time, and it halves on errors.
+    """
+
+    DEFAULT_TARGET_LATENCY = 2.0
+    MAX_STEP = 2.0
+    MAXIMUM = 50000  # Maximum 'count' accepted by PRTG.
+    MINIMUM = 50
+
+    def __init__(self, size, target_latency=DEFAULT_TARGET_LATENCY, minimum=MINIMUM, maximum=MAXIMUM, max_bytes=None):
+        """
+        :param size: Initial page size.
+        :param target_latency: Seconds a page should take.
+        :param minimum: Minimum page size.
+        :param maximum: Maximum page size.
+        :param max_bytes: Maximum bytes a page should take (None means no limit).
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.max_bytes = max_bytes
+        self.size = self._clamp(size)
+
+    def _clamp(self, size):
+        return int(max(self.minimum, min(self.maximum, size)))
+
+    def observe(self, items, elapsed, nbytes=None):
+        """
+        Learns from a page that has just been fetched with the current size.
+        :param items: Number of items in the page.
+        :param elapsed: Seconds the page took.
+        :param nbytes: Bytes of the page.
+        :return: New page size.
+        """
+        if items < self.size or elapsed <= 0:
+            return self.size  # Last (short) page: it says nothing about the rate.
+        ideal = items * self.target_latency / elapsed
+        if self.max_bytes and nbytes:
+            ideal = min(ideal, items * self.max_bytes / nbytes)
+        ideal = max(self.size / self.MAX_STEP, min(self.size * self.MAX_STEP, ideal))
+        size = self._clamp(ideal)
+        if size != self.size:
+            logging.debug('Page size {} -> {} ({} items in {:.3f}s)'.format(self.size, size, items, elapsed))
+        self.size = size
+        return size
+
+    def failed(self):
+        """
+        Learns from a failed page.
+        :return: New page size.
+        """
+        self.size = self._clamp(self.size // 2)
+        logging.debug('Page failed, page size shrunk to {}'.format(self.size))
+        return self.size
+
+    def __repr__(self):
+        return 'AdaptivePageSize' + str(vars(self))
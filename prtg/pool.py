@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+Python library for Paessler's PRTG (http://www.paessler.com/)
+"""
+
+import base64
+from collections import deque
+import http.client
+from io import BytesIO
+import logging
+import socket
+import threading
+import time
+from urllib.error import HTTPError
+import urllib.parse
+import urllib.request
+import zlib
+
+from prtg.exceptions import DeadlineExceeded
+
+ACCEPT_ENCODING = 'gzip, deflate'
+
+
+def create_ssl_context():
+    """
+    Creates the (non-verifying) SSL context used to talk to PRTG nodes, which usually have self-signed certificates.
+    :return: ssl.SSLContext instance.
+    """
+    import ssl
+    return ssl._create_stdlib_context(cert_reqs=ssl.CERT_NONE, check_hostname=False, certfile=None, keyfile=None,
+                                      cafile=None, capath=None, cadata=None)
+
+
+class DecompressingReader(object):
+    """
+    Wrapper around an HTTP response that decompresses its body (Content-Encoding gzip or deflate) while it is read,
+    so that it can be fed chunk by chunk to an incremental parser. Responses without those encodings are passed
+    through. It counts the bytes that came through the wire and the decoded bytes.
+    """
+
+    def __init__(self, response, encoding=None):
+        """
+        :param response: HTTP response (anything with read(amt)).
+        :param encoding: Content-Encoding of the response (default: taken from the response headers).
+        """
+        if encoding is None:
+            encoding = response.getheader('Content-Encoding', '') if hasattr(response, 'getheader') else ''
+        self.response = response
+        self.encoding = (encoding or '').strip().lower()
+        self.bytes_wire = 0
+        self.bytes_decoded = 0
+        self._decompressor = None
+        if self.encoding == 'gzip':
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding == 'deflate':
+            self._decompressor = zlib.decompressobj()
+        self._first = True
+
+    def _decompress(self, data):
+        try:
+            return self._decompressor.decompress(data)
+        except zlib.error:
+            if not (self._first and self.encoding == 'deflate'):
+                raise
+            # Some servers send raw deflate streams, without the zlib header.
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._decompressor.decompress(data)
+
+    def read(self, amt=None):
+        while True:
+            data = self.response.read(amt)
+            self.bytes_wire += len(data)
+            if self._decompressor is None:
+                self.bytes_decoded += len(data)
+                return data
+            decoded = self._decompress(data) if data else self._decompressor.flush()
+            self._first = False
+            self.bytes_decoded += len(decoded)
+            if decoded or not data:
+                return decoded
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+
+def decompress(body, encoding):
+    """
+    Decompresses a whole response body.
+    :param body: Bytes.
+    :param encoding: Content-Encoding of the response.
+    :return: Decoded bytes.
+    """
+    reader = DecompressingReader(BytesIO(body), encoding)
+    return reader.read() + reader.read()
+
+
+class PooledResponse(object):
+    """
+    Wrapper around http.client.HTTPResponse that gives the underlying connection back to its pool as soon as the body
+    has been fully read (or discards it if the response is closed before that).
+    """
+
+    def __init__(self, response, connection, pool):
+        self.response = response
+        self.connection = connection
+        self.pool = pool
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+
+    def getheader(self, name, default=None):
+        return self.response.getheader(name, default)
+
+    def read(self, amt=None):
+        data = self.response.read(amt)
+        if self.response.isclosed():
+            self._release()
+        return data
+
+    def close(self):
+        if self.connection is not None:
+            self.pool.discard(self.connection)
+            self.connection = None
+        self.response.close()
+
+    def _release(self):
+        if self.connection is not None:
+            if self.response.will_close:
+                self.pool.discard(self.connection)
+            else:
+                self.pool.release(self.connection)
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ConnectionPool(object):
+    """
+    Pool of persistent (keep-alive) HTTP(S) connections to a single PRTG node. It is shared by all the queries of a
+    prtg.client.Client, so every page of every query reuses the already established sockets.
+    Like urllib, it goes through the proxy of the environment (HTTP_PROXY, HTTPS_PROXY, NO_PROXY) and follows
+    redirects: those to the node itself reuse the pooled connections, the others are handed over to urllib.
+    """
+
+    DEFAULT_IDLE_TIMEOUT = 30
+    DEFAULT_SIZE = 4
+    MAX_REDIRECTS = 10
+    REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+    def __init__(self, endpoint, size=DEFAULT_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT, timeout=None):
+        """
+        :param endpoint: Root URL of the PRTG node (e.g.: 'http://127.0.0.1:8080').
+        :param size: Maximum number of simultaneous connections to the node.
+        :param idle_timeout: Seconds after which an unused connection is closed instead of being reused.
+        :param timeout: Socket timeout in seconds (None means the global default).
+        """
+        url = urllib.parse.urlsplit(endpoint)
+        self.scheme = url.scheme or 'http'
+        self.host = url.hostname
+        self.port = url.port
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.handshakes = 0
+        self.requests = 0
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._ssl_context = create_ssl_context() if self.scheme == 'https' else None
+        self._opener = None
+        self.proxy = None
+        self._proxy_headers = dict()
+        proxy = urllib.request.getproxies().get(self.scheme)
+        if proxy and not urllib.request.proxy_bypass(self.host):
+            self.proxy = urllib.parse.urlsplit(proxy if '://' in proxy else 'http://' + proxy)
+            if self.proxy.username is not None:
+                credentials = '{}:{}'.format(urllib.parse.unquote(self.proxy.username),
+                                             urllib.parse.unquote(self.proxy.password or ''))
+                self._proxy_headers['Proxy-Authorization'] = 'Basic ' + base64.b64encode(
+                    credentials.encode()).decode('ascii')
+
+    def _new_connection(self):
+        host, port = (self.proxy.hostname, self.proxy.port) if self.proxy is not None else (self.host, self.port)
+        if self._ssl_context is not None:
+            connection = http.client.HTTPSConnection(host, port, timeout=self.timeout, context=self._ssl_context)
+            if self.proxy is not None:
+                connection.set_tunnel(self.host, self.port, headers=self._proxy_headers)
+        else:
+            connection = http.client.HTTPConnection(host, port, timeout=self.timeout)
+        with self._lock:
+            self.handshakes += 1
+        logging.debug('Opening pooled connection #{} to {}://{}:{}'.format(self.handshakes, self.scheme, self.host,
+                                                                          self.port))
+        return connection
+
+    def _get_connection(self):
+        """
+        :return: A tuple (connection, reused), reused being True if it was taken from the idle connections.
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                connection, last_used = self._idle.pop()
+                if now - last_used <= self.idle_timeout:
+                    return connection, True
+                connection.close()
+        return self._new_connection(), False
+
+    def release(self, connection):
+        """
+        Gives back a connection to the pool, to be reused by the next request.
+        :param connection: http.client.HTTPConnection instance.
+        """
+        with self._lock:
+            self._idle.append((connection, time.monotonic()))
+        self._slots.release()
+
+    def discard(self, connection):
+        """
+        Closes a connection that cannot be reused, freeing its slot in the pool.
+        :param connection: http.client.HTTPConnection instance.
+        """
+        connection.close()
+        self._slots.release()
+
+    def urlopen(self, req, timeout=None):
+        """
+        Sends a request through a pooled connection, following redirects.
+        :param req: urllib.request.Request instance.
+        :param timeout: Seconds left for this request (defaults to the pool's socket timeout): both the wait for a
+                        pooled connection and the socket timeout.
+        :return: PooledResponse instance (or, after a redirect to another host, the response of urllib).
+        :raise HTTPError: If the server answers with an error status (>= 400).
+        :raise DeadlineExceeded: If no pooled connection got free within the timeout.
+        """
+        for _ in range(self.MAX_REDIRECTS + 1):
+            pooled = self._send(req, timeout)
+            status = pooled.status
+            if status < 300 or (status < 400 and status not in self.REDIRECT_CODES):
+                return pooled
+            try:
+                pooled.read()  # Drain the body so the connection can be reused.
+            finally:
+                pooled.close()
+            if status >= 400:
+                raise HTTPError(req.full_url, status, pooled.reason, pooled.headers, None)
+            location = pooled.getheader('Location')
+            if not location:
+                raise HTTPError(req.full_url, status, 'Redirect without a Location', pooled.headers, None)
+            url = urllib.parse.urljoin(req.full_url, location)
+            logging.debug('Redirected ({}) to {}'.format(status, url))
+            method = 'GET' if status == 303 else req.get_method()
+            req = urllib.request.Request(url, headers=dict(req.header_items()), method=method)
+            target = urllib.parse.urlsplit(url)
+            if (target.scheme, target.hostname, target.port) != (self.scheme, self.host, self.port):
+                return self._urllib_open(req, timeout)
+        raise HTTPError(req.full_url, status, 'Too many redirects', pooled.headers, None)
+
+    def _send(self, req, timeout):
+        url = urllib.parse.urlsplit(req.full_url)
+        path = url.path + ('?' + url.query if url.query else '')
+        if self.proxy is not None and self._ssl_context is None:
+            path = req.full_url  # Plain HTTP proxies take the absolute URL.
+        headers = dict(req.header_items())
+        if self.proxy is not None and self._ssl_context is None:
+            headers.update(self._proxy_headers)
+        if not self._slots.acquire(timeout=timeout):
+            raise DeadlineExceeded('No pooled connection within {:.3f}s'.format(timeout))
+        connection = None
+        try:
+            connection, reused = self._get_connection()
+            connection.timeout = timeout if timeout is not None else self.timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(connection.timeout)
+            try:
+                connection.request(req.get_method(), path, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                connection.close()
+                if not reused:
+                    raise
+                # The server dropped an idle keep-alive connection: retry once over a fresh one.
+                logging.debug('Pooled connection went stale, reconnecting')
+                connection = self._new_connection()
+                connection.timeout = timeout if timeout is not None else self.timeout
+                connection.request(req.get_method(), path, headers=headers)
+                response = connection.getresponse()
+        except:
+            if connection is not None:
+                connection.close()  # Whatever failed (the request or its retry), its socket cannot be reused.
+            self._slots.release()
+            raise
+        with self._lock:
+            self.requests += 1
+        return PooledResponse(response, connection, self)
+
+    def _urllib_open(self, req, timeout):
+        """
+        Sends a request that is not for the pooled node (e.g.: after a redirect to another host) through urllib.
+        """
+        if self._opener is None:
+            self._opener = urllib.request.build_opener(urllib.request.HTTPSHandler(context=create_ssl_context()))
+        if timeout is None:
+            timeout = self.timeout if self.timeout is not None else socket._GLOBAL_DEFAULT_TIMEOUT
+        return self._opener.open(req, timeout=timeout)
+
+    def close(self):
+        """
+        Closes every idle connection.
+        """
+        with self._lock:
+            while self._idle:
+                self._idle.pop()[0].close()
+
+    def __repr__(self):
+        return 'ConnectionPool{}'.format({'endpoint': '{}://{}:{}'.format(self.scheme, self.host, self.port),
+                                          'size': self.size, 'handshakes': self.handshakes,
+                                          'requests': self.requests})
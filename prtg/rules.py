@@ -4,7 +4,10 @@ from copy import deepcopy
 import logging
 import re
 
-from prtg.models import INHERITED_PROPS, LIST_TYPE_PROPS
+from prtg.models import CONTENT_TYPE_ALL, INHERITED_PROPS, LIST_TYPE_PROPS, PrtgObject
+
+
+REGEX_SPECIAL_CHARS = set('.^$*+?{}[]\\|()')
 
 
 def _subtract_set_from_list(a_list, a_set_of_removals):
@@ -19,7 +22,7 @@ def _get_entity_value(entity, prop, parent_value):
     :param parent_value: Parent's property value.
     :return: PRTG instance's property own value.
     """
-    entity_value = entity.__getattribute__(prop)
+    entity_value = getattr(entity, prop)
     if isinstance(entity_value, str):
         entity_value = [entity_value]
     return _subtract_set_from_list(entity_value, parent_value)
@@ -37,9 +40,9 @@ def _get_inherited_values(parent_object, prop, inherited_values_map):
             inherited_values = inherited_values_map[prop]
         else:
             if prop in LIST_TYPE_PROPS:
-                inherited_values = set(parent_object.__getattribute__(prop))
+                inherited_values = set(getattr(parent_object, prop))
             else:
-                inherited_values = {parent_object.__getattribute__(prop)}
+                inherited_values = {getattr(parent_object, prop)}
             inherited_values_map[prop] = inherited_values
     else:
         inherited_values = set()
@@ -180,13 +183,59 @@ class Rule(object):
         return 'Rule' + str(vars(self))
 
 
+def _pattern_literal(pattern):
+    """
+    Extracts the literal text a pattern (as used with re.match) requires.
+    :param pattern: Regular expression.
+    :return: Tuple (literal, exact), exact being True if the pattern matches that literal only, or None if the pattern
+             is not a plain (possibly escaped and anchored) literal.
+    """
+    if pattern.startswith('^'):
+        pattern = pattern[1:]
+    exact = False
+    if pattern.endswith('$') and not pattern.endswith('\\$'):
+        pattern, exact = pattern[:-1], True
+    literal = []
+    escaped = False
+    for char in pattern:
+        if escaped:
+            if char.isalnum():
+                return None  # Character classes (e.g.: '\d') and back-references.
+            literal.append(char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char in REGEX_SPECIAL_CHARS:
+            return None
+        else:
+            literal.append(char)
+    if escaped:
+        return None
+    return ''.join(literal), exact
+
+
 class NameMatch(Rule):
     """
     Name match rule.
     """
 
     def matches(self, prtg_object):
-        return re.match(self.pattern, str(prtg_object.__getattribute__(self.attribute)))
+        return re.match(self.pattern, str(getattr(prtg_object, self.attribute)))
+
+    def pushdown_filter(self):
+        """
+        Server-side filter selecting (a superset of) the objects this rule matches. It can only be derived when the
+        pattern is a plain literal on a single-valued attribute; PRTG compares text case-insensitively, so the server
+        may return some extra candidates, which 'matches' then discards.
+        :return: Tuple (column, filter value) for prtg.models.Query.add_filter, or None if it cannot be derived.
+        """
+        if self.attribute in LIST_TYPE_PROPS:
+            return None
+        literal = _pattern_literal(self.pattern)
+        if literal is None or not literal[0]:
+            return None
+        text, exact = literal
+        return self.attribute, text if exact else '@sub({})'.format(text)
 
 
 class RuleChain(object):
@@ -205,6 +254,22 @@ class RuleChain(object):
         if args:
             self.rules = [NameMatch(**arg) for arg in args]
 
+    def pushdown_filters(self, content=None):
+        """
+        Server-side filters selecting the candidate objects for this chain, so that rule runs only download those.
+        Since PRTG ORs the values of a filter column, the filters can only be derived when every rule tests the same
+        attribute with a pattern that can be pushed down (see NameMatch.pushdown_filter).
+        :param content: Content type the chain is going to be applied to (to check the attribute is a column of it).
+        :return: List of (column, filter value) pairs for prtg.models.Query (empty if every object is a candidate).
+        """
+        filters = [rule.pushdown_filter() for rule in self.rules]
+        if not filters or None in filters or len(set(column for column, _ in filters)) > 1:
+            return []
+        if content is not None and filters[0][0] not in (PrtgObject.column_table[CONTENT_TYPE_ALL] +
+                                                         PrtgObject.column_table.get(content, [])):
+            return []
+        return list(dict.fromkeys(filters))
+
     def apply(self, prtg_object, parent_object):
         """
         Applies the rules to a PRTG object (thus modifying it).
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Python library for Paessler's PRTG (http://www.paessler.com/)
+Incremental (delta) synchronisation of the object cache.
+"""
+
+import logging
+
+from prtg.models import LIST_TYPE_PROPS, Query
+
+
+class SyncDelta(object):
+    """
+    Result of a synchronisation: ids of the objects added, removed and modified since the cache was last filled.
+    """
+
+    def __init__(self, content, added, removed, modified, full_sweep=False):
+        self.content = content
+        self.added = added
+        self.removed = removed
+        self.modified = modified
+        self.full_sweep = full_sweep
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified)
+
+    def __repr__(self):
+        return 'SyncDelta' + str(vars(self))
+
+
+class CacheSync(object):
+    """
+    Brings the cached objects of a content type up to date by downloading a cheap projection of every object (objid
+    plus a set of fingerprint columns), comparing it with the cache, and then downloading the full columns only for
+    the objects that were added or whose fingerprint changed.
+    """
+
+    FINGERPRINT_COLUMNS = ['parentid', 'name', 'tags', 'active', 'status']
+    FULL_SWEEP_RATIO = 0.5
+    IDS_PER_REQUEST = 200
+
+    def __init__(self, client, fingerprint_columns=None, columns=None):
+        """
+        :param client: prtg.client.Client instance.
+        :param fingerprint_columns: Columns that reveal a change in an object (they must be among the full columns).
+        :param columns: Full columns to keep in the cache (default: Query.default_columns).
+        """
+        self.client = client
+        self.fingerprint_columns = fingerprint_columns or self.FINGERPRINT_COLUMNS
+        self.columns = columns
+
+    def _fingerprint(self, obj):
+        values = list()
+        for column in self.fingerprint_columns:
+            value = getattr(obj, column, None)
+            if column in LIST_TYPE_PROPS and value is not None:
+                value = tuple(sorted(value))
+            values.append(value)
+        return tuple(values)
+
+    def _query(self, content, columns=None, objids=None):
+        query = Query(client=self.client, target='table', content=content, columns=columns)
+        for objid in objids or []:
+            query.add_filter('objid', objid)
+        return query
+
+    def sync(self, content):
+        """
+        Synchronises the cached objects of a content type.
+        :param content: Content type (e.g.: 'sensors').
+        :return: SyncDelta instance.
+        """
+        cache = self.client.cache
+        current = dict((str(obj.objid), self._fingerprint(obj))
+                       for obj in self.client.iter_query(self._query(content, self.fingerprint_columns)))
+        cached = dict((str(obj.objid), self._fingerprint(obj)) for obj in cache.get_content(content))
+
+        added = [objid for objid in current if objid not in cached]
+        removed = [objid for objid in cached if objid not in current]
+        modified = [objid for objid, fingerprint in current.items()
+                    if objid in cached and cached[objid] != fingerprint]
+        changed = added + modified
+        logging.info('Sync of {}: {} added, {} removed, {} modified'.format(content, len(added), len(removed),
+                                                                              len(modified)))
+
+        full_sweep = len(changed) > self.FULL_SWEEP_RATIO * len(current)
+        if full_sweep:
+            for _ in self.client.iter_query(self._query(content, self.columns), cache=True):
+                pass
+        else:
+            for i in range(0, len(changed), self.IDS_PER_REQUEST):
+                query = self._query(content, self.columns, changed[i:i + self.IDS_PER_REQUEST])
+                for _ in self.client.iter_query(query, cache=True):
+                    pass
+        for objid in removed:
+            cache.delete_object(objid)
+        return SyncDelta(content, added, removed, modified, full_sweep)
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+Python library for Paessler's PRTG (http://www.paessler.com/)
+Client-side throttling toward the PRTG core: a token bucket for the request rate and an AIMD concurrency window.
+"""
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+import logging
+from threading import Condition, Lock
+import time
+from urllib.error import HTTPError
+
+from prtg.exceptions import DeadlineExceeded
+
+
+class TokenBucket(object):
+    """
+    Token bucket limiting the rate of requests. Tokens are reserved in advance, so callers are told how long to wait
+    instead of being blocked inside the bucket.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        :param rate: Requests per second.
+        :param burst: Maximum number of requests that can be sent at once (default: one second worth of them).
+        """
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def reserve(self):
+        """
+        Takes a token.
+        :return: Seconds the caller has to wait before sending its request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self):
+        """
+        Gives back a token that was reserved for a request that will not be sent.
+        """
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+
+class AimdWindow(object):
+    """
+    Concurrency window with additive increase and multiplicative decrease: it widens by about one request per window
+    of successful requests and narrows by DECREASE when a request fails with a 5xx/429 (or a connection error).
+    Latency is only taken as a congestion signal if asked for, either above a fixed threshold or above a tolerance
+    times the baseline latency (the best smoothed latency, which drifts up by BASELINE_DECAY per request so that it
+    follows a node that got durably slower). Page latencies vary with page sizes and loopback noise, which a
+    default trigger would mistake for congestion.
+    """
+
+    BASELINE_DECAY = 0.05
+    DECREASE = 0.5
+    SMOOTHING = 0.2
+
+    def __init__(self, maximum, initial=None, minimum=1, latency_threshold=None, latency_tolerance=None):
+        """
+        :param maximum: Maximum number of requests in flight.
+        :param initial: Initial window (default: maximum).
+        :param minimum: Minimum window.
+        :param latency_threshold: Seconds above which a request is taken as a congestion signal (None: no fixed
+                                  threshold).
+        :param latency_tolerance: If set (and there is no fixed threshold), latency above that many times the
+                                  baseline latency is taken as a congestion signal.
+        """
+        self.maximum = maximum
+        self.minimum = minimum
+        self.window = float(initial if initial is not None else maximum)
+        self.latency_threshold = latency_threshold
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.latency = None
+        self.best_latency = None
+        self._last_decrease = 0
+        self._condition = Condition()  # Reentrant, so that try_acquire can be its predicate.
+        self._async_waiters = deque()  # Futures of the coroutines waiting in acquire_async, in order.
+
+    def try_acquire(self):
+        """
+        :return: True if a request can be sent now (and then it is counted as in flight).
+        """
+        with self._condition:
+            if self.in_flight < int(self.window):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self, timeout=None):
+        """
+        Waits until a request can be sent.
+        :param timeout: Seconds to wait at most (None means no limit).
+        :return: True if the request can be sent (and then it is counted as in flight), False if the time ran out.
+        """
+        with self._condition:
+            return self._condition.wait_for(self.try_acquire, timeout)
+
+    async def acquire_async(self, timeout=None):
+        """
+        Waits (without blocking the event loop) until a request can be sent. Waiting coroutines are woken up one by
+        one, each as a place is handed over to it.
+        :param timeout: Seconds to wait at most (None means no limit).
+        :return: True if the request can be sent (and then it is counted as in flight), False if the time ran out.
+        """
+        with self._condition:
+            if self.try_acquire():
+                return True
+            future = asyncio.get_running_loop().create_future()
+            self._async_waiters.append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            with self._condition:
+                if future in self._async_waiters:
+                    self._async_waiters.remove(future)
+            return False  # A place handed over in the meantime is given back by _grant.
+
+    def _wake(self):
+        """
+        Hands the free places over to the waiting coroutines and wakes up the waiting threads (with the lock held).
+        """
+        while self._async_waiters and self.in_flight < int(self.window):
+            future = self._async_waiters.popleft()
+            self.in_flight += 1
+            future.get_loop().call_soon_threadsafe(self._grant, future)
+        self._condition.notify_all()
+
+    def _grant(self, future):
+        if future.done():  # The coroutine stopped waiting (timeout or cancellation).
+            self.cancel()
+        else:
+            future.set_result(True)
+
+    def cancel(self):
+        """
+        Gives back the place of a request that was not sent, without learning anything from it.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            self._wake()
+
+    def release(self, latency, failed=False):
+        """
+        Learns from a finished request.
+        :param latency: Seconds the request took.
+        :param failed: True if the server signalled overload (5xx/429) or the connection failed.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            self.latency = latency if self.latency is None else \
+                self.SMOOTHING * latency + (1 - self.SMOOTHING) * self.latency
+            if not failed:
+                if self.best_latency is None or self.latency < self.best_latency:
+                    self.best_latency = self.latency
+                else:
+                    self.best_latency += self.BASELINE_DECAY * (self.latency - self.best_latency)
+            threshold = self.latency_threshold
+            if threshold is None and self.latency_tolerance is not None and self.best_latency is not None:
+                threshold = self.best_latency * self.latency_tolerance
+            now = time.monotonic()
+            if failed or (threshold is not None and self.latency > threshold):
+                # Decrease at most once per round trip, since all the requests in flight see the same congestion.
+                if now - self._last_decrease > self.latency:
+                    self.window = max(self.minimum, self.window * self.DECREASE)
+                    self._last_decrease = now
+                    logging.debug('Concurrency window narrowed to {:.2f}'.format(self.window))
+            else:
+                self.window = min(self.maximum, self.window + 1.0 / self.window)
+            self._wake()
+
+
+class Limiter(object):
+    """
+    Throttle shared by every request a client sends: requests wait for a slot in the AIMD concurrency window and for a
+    token of the bucket (if a rate is set). Use it as:
+        with limiter.request():
+            ... request ...
+    """
+
+    def __init__(self, rate=None, burst=None, max_concurrency=4, latency_threshold=None, latency_tolerance=None):
+        """
+        :param rate: Maximum requests per second (None means no limit).
+        :param burst: Maximum burst of requests (see TokenBucket).
+        :param max_concurrency: Maximum number of requests in flight.
+        :param latency_threshold: Seconds above which a request is a congestion signal (see AimdWindow).
+        :param latency_tolerance: Latency, relative to the baseline, above which a request is a congestion signal (see
+                                  AimdWindow). By default, only errors narrow the window.
+        """
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.window = AimdWindow(max_concurrency, latency_threshold=latency_threshold,
+                                 latency_tolerance=latency_tolerance)
+        self.requests = 0
+        self.failures = 0
+        self.waited = 0.0
+        self._lock = Lock()
+
+    @staticmethod
+    def is_failure(status):
+        """
+        :param status: HTTP status of the response, or None if there was none (connection error).
+        :return: True if the response signals that the server is overloaded.
+        """
+        return status is None or status == 429 or status >= 500
+
+    def acquire(self, timeout=None):
+        """
+        Waits until a request can be sent.
+        :param timeout: Seconds to wait at most, e.g. the time left before the deadline of the query (None means no
+                        limit).
+        :raise DeadlineExceeded: If the request could not be sent within the timeout.
+        """
+        started = time.monotonic()
+        if not self.window.acquire(timeout):
+            self._waited(time.monotonic() - started)
+            raise DeadlineExceeded('No room in the concurrency window within {:.3f}s'.format(timeout))
+        delay = self._reserve(started, timeout)
+        if delay:
+            time.sleep(delay)
+        self._waited(time.monotonic() - started)
+
+    async def acquire_async(self, timeout=None):
+        """
+        Waits (without blocking the event loop) until a request can be sent.
+        :param timeout: Seconds to wait at most (None means no limit).
+        :raise DeadlineExceeded: If the request could not be sent within the timeout.
+        """
+        started = time.monotonic()
+        if not await self.window.acquire_async(timeout):
+            self._waited(time.monotonic() - started)
+            raise DeadlineExceeded('No room in the concurrency window within {:.3f}s'.format(timeout))
+        delay = self._reserve(started, timeout)
+        if delay:
+            await asyncio.sleep(delay)
+        self._waited(time.monotonic() - started)
+
+    def _reserve(self, started, timeout):
+        """
+        Takes a token of the bucket (if there is one), once the request has its place in the window.
+        :return: Seconds to wait for the token.
+        :raise DeadlineExceeded: If the token only comes after the timeout (the token and the place in the window are
+                                 given back).
+        """
+        delay = self.bucket.reserve() if self.bucket is not None else 0
+        if timeout is not None and time.monotonic() - started + delay > timeout:
+            if self.bucket is not None:
+                self.bucket.refund()
+            self.window.cancel()
+            self._waited(time.monotonic() - started)
+            raise DeadlineExceeded('No request token within {:.3f}s'.format(timeout))
+        return delay
+
+    def release(self, latency, status=200):
+        """
+        Reports a finished request.
+        :param latency: Seconds the request took.
+        :param status: HTTP status of the response (None if the connection failed).
+        """
+        failed = self.is_failure(status)
+        with self._lock:
+            self.requests += 1
+            self.failures += int(failed)
+        self.window.release(latency, failed)
+
+    @contextmanager
+    def request(self, timeout=None):
+        """
+        Context manager wrapping a request: it waits for the limiter and reports the outcome of the request (HTTP
+        errors, connection errors and deadlines exceeded inside it count as failures, narrowing the window).
+        :param timeout: Seconds to wait for the limiter at most (see acquire).
+        """
+        self.acquire(timeout)
+        started = time.monotonic()
+        status = 200
+        try:
+            yield
+        except HTTPError as e:
+            status = e.code
+            raise
+        except (OSError, DeadlineExceeded):
+            status = None
+            raise
+        finally:
+            self.release(time.monotonic() - started, status)
+
+    @asynccontextmanager
+    async def request_async(self, timeout=None):
+        """
+        Asynchronous version of request.
+        """
+        await self.acquire_async(timeout)
+        started = time.monotonic()
+        status = 200
+        try:
+            yield
+        except HTTPError as e:
+            status = e.code
+            raise
+        except (OSError, asyncio.TimeoutError, DeadlineExceeded):
+            status = None
+            raise
+        finally:
+            self.release(time.monotonic() - started, status)
+
+    def _waited(self, seconds):
+        with self._lock:
+            self.waited += seconds
+
+    def __repr__(self):
+        return 'Limiter' + str({'rate': self.bucket.rate if self.bucket else None, 'window': self.window.window,
+                                'requests': self.requests, 'failures': self.failures, 'waited': self.waited})
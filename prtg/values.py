@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Python library for Paessler's PRTG (http://www.paessler.com/)
+Typed values: conversion of the raw variants of PRTG columns (<column>_raw) into ints, floats, booleans and datetimes.
+"""
+
+from datetime import datetime, timedelta
+import re
+
+OLE_EPOCH = datetime(1899, 12, 30)  # Day 0 of OLE automation dates, which PRTG uses for its timestamps.
+NUMBER = re.compile(r'\s*(-?[0-9]+(?:\.[0-9]*)?(?:[eE][-+]?[0-9]+)?)')
+
+_UNSET = object()
+
+
+def import_numpy():
+    """
+    NumPy is an optional dependency, only needed by the object tables (prtg.columnar) and the historic data
+    (prtg.historic): they import it through this function when they first use it.
+    :return: numpy module.
+    :raise ImportError: If NumPy is not installed.
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('Object tables and historic data need NumPy (pip install numpy)')
+    return numpy
+
+
+def number(value):
+    """
+    :param value: Text starting with a number (e.g.: '99.9639%', '40511.5501967593[20 s ago]').
+    :return: The number as a float (None if there is none).
+    """
+    match = NUMBER.match(value)
+    return float(match.group(1)) if match else None
+
+
+def integer(value):
+    result = number(value)
+    return None if result is None else int(result)
+
+
+def boolean(value):
+    """
+    PRTG gives booleans as -1 or 1 (true) and 0 (false), or as text.
+    """
+    if value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    result = number(value)
+    return None if result is None else result != 0
+
+
+def ole_date(value):
+    """
+    :param value: OLE automation date (days since 1899-12-30), possibly followed by text (e.g.: '40511.55[20 s ago]').
+    :return: datetime.datetime instance (None if there is no date).
+    """
+    days = number(value)
+    return None if not days else OLE_EPOCH + timedelta(days=days)
+
+
+def ten_thousandths(value):
+    result = number(value)
+    return None if result is None else result / 10000
+
+
+# Column: (converter of its raw variant, converter of its text, or None if it cannot be read from the text). The
+# typed value is kept as <column>_raw, whichever it comes from.
+RAW_TYPES = {
+    'status': (integer, None),
+    'priority': (integer, None),
+    'active': (boolean, boolean),
+    'favorite': (boolean, None),
+    'interval': (integer, None),  # Seconds.
+    'lastvalue': (number, None),
+    'uptime': (ten_thousandths, number),  # Percentage.
+    'downtime': (ten_thousandths, number),  # Percentage.
+    'uptimetime': (integer, None),  # Seconds.
+    'downtimetime': (integer, None),  # Seconds.
+    'knowntime': (integer, None),  # Seconds.
+    'lastcheck': (ole_date, ole_date),
+    'lastup': (ole_date, ole_date),
+    'lastdown': (ole_date, ole_date),
+    'cumsince': (ole_date, ole_date),
+    'updownsince': (ole_date, ole_date),
+    'statusid': (None, integer),
+    'upsens': (integer, None),
+    'downsens': (integer, None),
+    'downacksens': (integer, None),
+    'partialdownsens': (integer, None),
+    'warnsens': (integer, None),
+    'pausedsens': (integer, None),
+    'unusualsens': (integer, None),
+    'undefinedsens': (integer, None),
+    'totalsens': (integer, None),
+}
+
+
+def raw_columns(columns):
+    """
+    :param columns: Column names.
+    :return: The raw variants (<column>_raw) of those that have one.
+    """
+    return [column + '_raw' for column in columns if column in RAW_TYPES and RAW_TYPES[column][0] is not None]
+
+
+def convert_page(objects):
+    """
+    Converts, in place, the typed columns of a page of objects: <column>_raw is set from the raw value the server gave
+    or, failing that, from the text of the column. Every column is converted in one pass over the page, and repeated
+    values (e.g.: statuses, intervals) are only parsed once.
+    :param objects: List of model objects.
+    :return: The same list.
+    """
+    fields = set()
+    for record in set(type(obj) for obj in objects):
+        fields.update(getattr(record, '_fields', ()))
+    for column, (from_raw, from_text) in RAW_TYPES.items():
+        raw = column + '_raw'
+        if from_raw is not None and raw in fields:
+            source, convert = raw, from_raw
+        elif from_text is not None and column in fields:
+            source, convert = column, from_text
+        else:
+            continue
+        converted = dict()
+        for obj in objects:
+            value = getattr(obj, source, None)
+            if isinstance(value, str):
+                typed = converted.get(value, _UNSET)
+                if typed is _UNSET:
+                    typed = converted[value] = convert(value)
+                setattr(obj, raw, typed)
+    return objects
@@ -12,6 +12,7 @@ setup(
     keywords=['PRTG', 'Network Monitoring'],
     license='MIT',
     packages=['prtg'],
+    extras_require={'historic': ['numpy'], 'columnar': ['numpy']},
     classifiers=[
         'Development Status :: 2 - Pre-Alpha',
         'Environment :: Console',
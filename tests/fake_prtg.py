@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal fake PRTG node, serving the API targets used by the unittests over a local HTTP/1.1 server.
+"""
+
+from datetime import datetime, timedelta
+import gzip
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+import urllib.parse
+from xml.sax.saxutils import escape
+
+
+def build_sensors(total):
+    return [{'objid': str(3000 + i), 'parentid': str(2000 + i % 10), 'name': 'sensor {}'.format(i),
+             'tags': 'ta tb{}'.format(i % 3), 'active': 'true', 'status': 'Up' if i % 4 else 'Down',
+             'status_raw': '3' if i % 4 else '5', 'lastcheck_raw': '42389.5'}
+            for i in range(total)]
+
+
+def build_sensortree(groups, devices, sensors):
+    """
+    Sensor tree with a probe holding the given number of groups, each of them with that many devices with that many
+    sensors.
+    """
+    out = ['<?xml version="1.0" encoding="UTF-8" ?>', '<prtg><prtg-version>15.1</prtg-version><sensortree><nodes>',
+           '<group id="0" noaccess="0"><id>0</id><name>Root</name><tags></tags>',
+           '<probenode id="1"><id>1</id><name>Local Probe</name><tags></tags><active>-1</active>']
+    for g in range(groups):
+        gid = 100 + g
+        out.append('<group id="{0}"><id>{0}</id><name>group {1}</name><tags>tg</tags>'.format(gid, g))
+        for d in range(devices):
+            did = 1000 + g * devices + d
+            out.append('<device id="{0}"><id>{0}</id><name>device {0}</name><host>10.0.0.{1}</host>'
+                       '<tags>td</tags>'.format(did, d))
+            for i in range(sensors):
+                sid = 10000 + (did - 1000) * sensors + i
+                out.append('<sensor id="{0}"><id>{0}</id><name>sensor {0}</name><sensortype>ping</sensortype>'
+                           '<status>Up</status><status_raw>3</status_raw><tags>ts pingsensor</tags>'
+                           '</sensor>'.format(sid))
+            out.append('</device>')
+        out.append('</group>')
+    out.append('</probenode></group></nodes></sensortree></prtg>')
+    return '\n'.join(out).encode('utf-8')
+
+
+def build_historic_csv(objid, start, end, step=timedelta(minutes=1), inclusive=False):
+    """
+    historicdata.csv body with one sample per step: 'Ping Time' is the minute of the day plus the sensor id divided by
+    1000, and 'Packet Loss' is empty every tenth sample. If inclusive, a sample at the end is included too.
+    """
+    out = ['"Date Time","Date Time(RAW)","Ping Time","Ping Time(RAW)","Packet Loss","Packet Loss(RAW)",'
+           '"Coverage","Coverage(RAW)"']
+    when, i = start, 0
+    while when < end or (inclusive and when == end):
+        days = (when - datetime(1899, 12, 30)).total_seconds() / 86400
+        value = when.hour * 60 + when.minute + int(objid) / 1000.0
+        loss = '' if i % 10 == 0 else '{:.4f}'.format(i % 3)
+        out.append('"{0}","{1:.10f}","{2} msec","{2:.4f}","{3} %","{3}","100 %","10000"'.format(
+            when.strftime('%m/%d/%Y %I:%M:%S %p'), days, value, loss))
+        when, i = when + step, i + 1
+    out.append('"Averages","","1 msec","1.0000","0 %","0.0000","100 %","10000"')
+    return ('\r\n'.join(out) + '\r\n').encode('utf-8')
+
+
+class FakePrtgHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = urllib.parse.parse_qs(url.query)
+        with self.server.lock:
+            self.server.requests.append(self.path)
+        target = url.path.rsplit('/', 1)[-1]
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        with self.server.lock:
+            delay = self.server.slow_once.pop(params.get('start', ['0'])[0], 0)
+        if delay:
+            time.sleep(delay)
+        body = self.server.respond(self, target, params)
+        if body is None:
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml')
+        if self.server.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def select_items(self, params):
+        items = self.server.items
+        if params.get('content', [''])[0] == 'channels':
+            items = [{'objid': str(i), 'name': 'channel {}'.format(i), 'lastvalue': '{} msec'.format(i),
+                      'lastvalue_raw': '{}.0000'.format(i)} for i in range(3)]
+        if 'filter_objid' in params:
+            objids = set(params['filter_objid'])
+            items = [item for item in items if item['objid'] in objids]
+        if 'columns' in params:
+            columns = params['columns'][0].replace('lastvalue_', 'lastvalue,lastvalue_raw').split(',')
+            items = [dict((column, item[column]) for column in columns if column in item) for item in items]
+        return items
+
+    def respond_table(self, params):
+        content = params.get('content', ['sensors'])[0]
+        if content == 'sensortree':
+            return self.server.sensortree
+        start = int(params.get('start', ['0'])[0])
+        count = int(params.get('count', ['500'])[0])
+        selected = self.select_items(params)
+        items = selected[start:start + count]
+        listend = 1 if start + count >= len(selected) else 0
+        out = ['<?xml version="1.0" encoding="UTF-8" ?>',
+               '<{} totalcount="{}" listend="{}">'.format(content, len(selected), listend),
+               '<prtg-version>15.1.14.1609+</prtg-version>']
+        for item in items:
+            out.append('<item>' + ''.join('<{0}>{1}</{0}>'.format(k, escape(v)) for k, v in item.items()) + '</item>')
+        out.append('</{}>'.format(content))
+        return '\n'.join(out).encode('utf-8')
+
+    def respond_json_table(self, params):
+        content = params.get('content', ['sensors'])[0]
+        start = int(params.get('start', ['0'])[0])
+        count = int(params.get('count', ['500'])[0])
+        selected = self.select_items(params)
+        items = [dict(item, objid=int(item['objid'])) for item in selected[start:start + count]]
+        return json.dumps({'prtg-version': '15.1.14.1609+', 'treesize': len(selected),
+                           content: items}).encode('utf-8')
+
+
+class FakePrtgServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, items=None):
+        ThreadingHTTPServer.__init__(self, ('127.0.0.1', 0), FakePrtgHandler)
+        self.items = items if items is not None else build_sensors(25)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = []
+        self.failing_ids = set()
+        self.delay = 0
+        self.compress = False
+        self.slow_once = dict()
+        self.sensortree = build_sensortree(2, 2, 3)
+        self.bodies = dict()
+        self.redirects = dict()
+        self.historic_inclusive = False
+        self.thread = None
+
+    @property
+    def endpoint(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def respond(self, handler, target, params):
+        if target in self.redirects:
+            handler.send_response(302)
+            handler.send_header('Location', self.redirects[target] + '?' + urllib.parse.urlsplit(handler.path).query)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+            return None
+        if target in self.bodies:
+            return self.bodies[target]
+        if target == 'table.xml':
+            return handler.respond_table(params)
+        if target == 'table.json':
+            return handler.respond_json_table(params)
+        if target == 'historicdata.csv':
+            start, end = (datetime.strptime(params[key][0], '%Y-%m-%d-%H-%M-%S') for key in ('sdate', 'edate'))
+            return build_historic_csv(params['id'][0], start, end, inclusive=self.historic_inclusive)
+        if target == 'getstatus.json':
+            return b'{"Version": "15.1", "Alarms": 2, "IsAdminUser": true}'
+        if target == 'getsensordetails.json':
+            return json.dumps({'prtgversion': '15.1', 'sensordata': {
+                'name': 'Ping', 'sensortype': 'ping', 'statusid': '3', 'parentdeviceid': params['id'][0]}}).encode()
+        if target == 'getsensordetails.xml':
+            if params['id'][0] in self.failing_ids:
+                handler.send_error(500)
+                return None
+            return ('<?xml version="1.0" encoding="UTF-8"?><sensordata><prtg-version>15.1</prtg-version>'
+                    '<name><![CDATA[Ping]]></name><sensortype><![CDATA[ping]]></sensortype>'
+                    '<statusid><![CDATA[3]]></statusid><parentdeviceid><![CDATA[{}]]></parentdeviceid>'
+                    '</sensordata>').format(params['id'][0]).encode()
+        if target == 'getstatus.xml':
+            return b'<?xml version="1.0" encoding="UTF-8" ?><status><Version>15.1</Version><Alarms>2</Alarms></status>'
+        if target == 'getobjectproperty.htm':
+            return b'<?xml version="1.0" encoding="UTF-8" ?><prtg><version>15.1</version><result>ta tb</result></prtg>'
+        if target == 'setobjectproperty.htm':
+            if set(params['id'][0].split(',')) & self.failing_ids:
+                handler.send_error(500)
+                return None
+            return b'<html></html>'
+        handler.send_error(404)
+        return None
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Unittests for PRTG AsyncClient
+"""
+
+import asyncio
+import unittest
+from unittest import mock
+from urllib.error import HTTPError
+from prtg.aio import AsyncClient, AsyncConnection
+from prtg.models import Query, Sensor
+from tests.fake_prtg import FakePrtgServer, build_sensors
+
+
+class TestAsyncClient(unittest.TestCase):
+
+    def test_table_query(self):
+        async def sweep(client):
+            await client.query(Query(client=client, target='table', content='sensors', maximum=10))
+            client.close()
+
+        with FakePrtgServer(build_sensors(95)) as server:
+            client = AsyncClient(endpoint=server.endpoint, username='u', password='p', concurrency=3)
+            asyncio.run(sweep(client))
+            self.assertEqual(10, len(server.requests))
+            self.assertLessEqual(client.pool.handshakes, 3)
+            sensors = list(client.cache.get_content('sensors'))
+            self.assertEqual(list(range(3000, 3095)), sorted(int(sensor.objid) for sensor in sensors))
+            self.assertIsInstance(sensors[0], Sensor)
+
+    def test_concurrent_queries(self):
+        async def statuses(client):
+            responses = await asyncio.gather(*[client.query(Query(client=client, target='getstatus'))
+                                               for _ in range(20)])
+            client.close()
+            return responses
+
+        with FakePrtgServer() as server:
+            client = AsyncClient(endpoint=server.endpoint, username='u', password='p', concurrency=4)
+            responses = asyncio.run(statuses(client))
+            self.assertEqual(['2'] * 20, [response[0].Alarms for response in responses])
+            self.assertLessEqual(client.pool.handshakes, 4)
+
+    @staticmethod
+    async def query_and_close(client, query):
+        try:
+            return await client.query(query)
+        finally:
+            client.close()
+
+    @mock.patch.object(AsyncConnection, 'EXPONENTIAL_BACKOFF_SECS', 0.01)
+    @mock.patch.object(AsyncConnection, 'RETRIES_PER_QUERY', 2)
+    def test_retries(self):
+        with FakePrtgServer() as server:
+            server.failing_ids.add('1003')
+            client = AsyncClient(endpoint=server.endpoint, username='u', password='p')
+            query = Query(client=client, target='getsensordetails', objid='1003')
+            self.assertRaises(HTTPError, asyncio.run, self.query_and_close(client, query))
+            self.assertEqual(3, len(server.requests))
+
+    @mock.patch.object(AsyncConnection, 'RETRIES_PER_QUERY', 0)
+    def test_redirect_not_followed(self):
+        with FakePrtgServer() as server:
+            server.redirects['getstatus.xml'] = '/api/table.xml'
+            client = AsyncClient(endpoint=server.endpoint, username='u', password='p')
+            with self.assertRaises(HTTPError) as error:
+                asyncio.run(self.query_and_close(client, Query(client=client, target='getstatus')))
+            self.assertEqual(302, error.exception.code)
+            self.assertEqual(1, len(server.requests))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Unittests for PRTG bulk property writes
+"""
+
+import unittest
+from unittest import mock
+import urllib.parse
+from prtg.client import Client, Connection
+from prtg.models import Device
+from tests.fake_prtg import FakePrtgServer
+
+
+class TestSetProperties(unittest.TestCase):
+
+    def test_grouped_writes_update_cache(self):
+        with FakePrtgServer() as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            client.cache.write_content([Device(objid='1', tags='old'), Device(objid='2', tags='old')])
+            changes = [(objid, 'tags', 'new') for objid in range(1, 6)] + [(6, 'name', 'x'), (2, 'name', 'y')]
+            results = client.set_properties(changes, max_ids_per_request=3)
+            self.assertEqual(4, len(server.requests))
+            ids = sorted(urllib.parse.parse_qs(urllib.parse.urlsplit(path).query)['id'][0]
+                         for path in server.requests)
+            self.assertEqual(['1,2,3', '2', '4,5', '6'], ids)
+            self.assertTrue(all(result is True for result in results.values()))
+            self.assertEqual(7, len(results))
+            self.assertEqual(('new',), client.cache.get_object('1').tags)
+            self.assertEqual('y', client.cache.get_object('2').name)
+
+    @mock.patch.object(Connection, 'RETRIES_PER_QUERY', 0)
+    def test_failed_group_is_retried_one_by_one(self):
+        with FakePrtgServer() as server:
+            server.failing_ids = {'2'}
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            results = client.set_properties([(objid, 'tags', 'new') for objid in ('1', '2', '3')])
+            self.assertEqual(4, len(server.requests))
+            self.assertIs(True, results[('1', 'tags')])
+            self.assertIs(True, results[('3', 'tags')])
+            self.assertIsInstance(results[('2', 'tags')], Exception)
+
+
+if __name__ == '__main__':
+    unittest.main()
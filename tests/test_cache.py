@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Unittests for PRTG caches
+"""
+
+import unittest
+from unittest import mock
+from prtg.cache import Cache, ResponseCache
+from prtg.client import Client
+from prtg.models import Device, PrtgObject, Query
+from tests.fake_prtg import FakePrtgServer, build_sensors
+
+ENDPOINT = 'http://127.0.0.1:8080'
+
+
+class TestCache(unittest.TestCase):
+
+    def test_update_and_delete_object(self):
+        cache = Cache()
+        cache.write_content([Device(objid='1', tags='a')])
+        self.assertTrue(cache.update_object('1', 'tags', 'b', ['p']))
+        self.assertEqual(('b', 'p'), cache.get_object('1').tags)
+        self.assertFalse(cache.update_object('2', 'tags', 'b'))
+        self.assertTrue(cache.delete_object('1'))
+        self.assertFalse(cache.delete_object('1'))
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.client = Client(endpoint=ENDPOINT, username='u', password='p')
+
+    def _property_query(self, objid, name='tags'):
+        return Query(client=self.client, target='getobjectproperty', objid=objid, name=name)
+
+    def test_ttl(self):
+        cache = ResponseCache({'getobjectproperty': 10})
+        query = self._property_query('1')
+        cache.put(query, ([PrtgObject(result='a')], 1, None))
+        self.assertEqual('a', cache.get(self._property_query('1'))[0][0].result)
+        with mock.patch('prtg.cache.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(cache.get(query))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+        cache.put(Query(client=self.client, target='getstatus'), ([], 1, None))
+        self.assertEqual(0, len(cache))
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_size=2)
+        for objid in ('1', '2'):
+            cache.put(self._property_query(objid), ([], 1, None))
+        cache.get(self._property_query('1'))
+        cache.put(self._property_query('3'), ([], 1, None))
+        self.assertIsNone(cache.get(self._property_query('2')))
+        self.assertIsNotNone(cache.get(self._property_query('1')))
+        self.assertEqual(1, cache.evictions)
+
+    def test_invalidation(self):
+        cache = ResponseCache()
+        cache.put(self._property_query('1', 'tags'), ([], 1, None))
+        cache.put(self._property_query('1', 'name'), ([], 1, None))
+        cache.put(Query(client=self.client, target='table', content='devices'), ([Device(objid='1')], 1, None))
+        cache.invalidate('1', 'tags')
+        self.assertIsNone(cache.get(self._property_query('1', 'tags')))
+        self.assertIsNotNone(cache.get(self._property_query('1', 'name')))
+        self.assertIsNone(cache.get(Query(client=self.client, target='table', content='devices')))
+
+    def test_client_response_cache(self):
+        with FakePrtgServer(build_sensors(30)) as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p', response_cache=ResponseCache())
+            self.addCleanup(client.close)
+            for _ in range(2):
+                client.query(Query(client=client, target='getobjectproperty', objid='3001', name='tags'))
+                client.query(Query(client=client, target='table', content='sensors', maximum=10))
+            self.assertEqual(4, len(server.requests))
+            self.assertEqual((4, 4), (client.response_cache.hits, client.response_cache.misses))
+            client.query(Query(client=client, target='setobjectproperty', objid='3001', name='tags', value='x'))
+            client.query(Query(client=client, target='getobjectproperty', objid='3001', name='tags'))
+            client.query(Query(client=client, target='table', content='sensors', maximum=10))
+            self.assertEqual(7, len(server.requests))  # Only the table page holding 3001 is re-read.
+
+    def test_lazy_and_eager_entries(self):
+        with FakePrtgServer(build_sensors(25)) as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p', response_cache=ResponseCache())
+            self.addCleanup(client.close)
+            eager = list(client.iter_query(Query(client=client, target='table', content='sensors', maximum=10)))
+            lazy = list(client.iter_query(Query(client=client, target='table', content='sensors', maximum=10,
+                                                lazy=True)))
+            self.assertEqual(6, len(server.requests))
+            self.assertEqual(('ta', 'tb0'), object.__getattribute__(eager[0], 'tags'))
+            self.assertRaises(AttributeError, object.__getattribute__, lazy[0], 'tags')  # Not decoded yet.
+            self.assertEqual([sensor.objid for sensor in eager], [sensor.objid for sensor in lazy])
+            list(client.iter_query(Query(client=client, target='table', content='sensors', maximum=10, lazy=True)))
+            self.assertEqual(6, len(server.requests))
+
+
+if __name__ == '__main__':
+    unittest.main()
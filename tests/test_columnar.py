@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Unittests for columnar object tables
+"""
+
+import unittest
+from prtg.cache import Cache
+from prtg.client import Client
+from prtg.models import Device, Query, Sensor
+from tests.fake_prtg import FakePrtgServer
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def build_tables():
+    from prtg.columnar import ObjectTable
+    sensors = [Sensor(objid=str(3000 + i), parentid=str(2000 + i % 3), name='sensor {}'.format(i),
+                      tags='ta tb{}'.format(i % 2), status='Up' if i % 4 else 'Down') for i in range(12)]
+    devices = [Device(objid=str(2000 + i), parentid='1', name='device {}'.format(i), tags='') for i in range(2)]
+    return ObjectTable.from_objects(sensors), ObjectTable.from_objects(devices)
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class TestObjectTable(unittest.TestCase):
+
+    def test_columns(self):
+        from prtg.columnar import Categorical, TagIndex
+        sensors, _ = build_tables()
+        self.assertEqual('sensors', sensors.content)
+        self.assertEqual(12, len(sensors))
+        self.assertEqual(numpy.int64, sensors['objid'].dtype)
+        self.assertEqual(3, sensors['status'][1])
+        self.assertIsInstance(sensors['name'], Categorical)
+        self.assertIsInstance(sensors['tags'], TagIndex)
+        self.assertEqual(['ta', 'tb1'], sensors['tags'][1])
+        self.assertEqual({'ta': 12, 'tb0': 6, 'tb1': 6}, dict(sensors['tags'].counts()))
+
+    def test_filters(self):
+        sensors, _ = build_tables()
+        down = sensors.select(sensors.equals('status', 'Down') & sensors.equals('tags', 'tb0'))
+        self.assertEqual([3000, 3004, 3008], list(down['objid']))
+        self.assertEqual(['ta', 'tb0'], down['tags'][2])
+        self.assertEqual('sensor 4', down['name'][1])
+        self.assertEqual(4, int(sensors.isin('parentid', [2000]).sum()))
+        self.assertEqual(0, int(sensors.equals('tags', 'missing').sum()))
+        self.assertEqual(2, int(sensors.isin('name', ['sensor 1', 'sensor 2', 'x']).sum()))
+
+    def test_count_by(self):
+        sensors, _ = build_tables()
+        self.assertEqual({3: 9, 5: 3}, dict(sensors.count_by('status')))
+        counts = sensors.count_by('parentid', 'status')
+        self.assertEqual(3, counts[(2000, 3)])
+        self.assertEqual(1, counts[(2000, 5)])
+        self.assertEqual(12, sum(counts.values()))
+
+    def test_join(self):
+        sensors, devices = build_tables()
+        joined = sensors.join(devices)
+        self.assertEqual('device 0', joined['parent_name'][0])
+        self.assertEqual('device 1', joined['parent_name'][1])
+        self.assertIsNone(joined['parent_name'][2])  # Device 2002 is not in the table.
+        self.assertEqual({'device 0': 4, 'device 1': 4, None: 4}, dict(joined.count_by('parent_name')))
+
+    def test_typed_columns(self):
+        from prtg.columnar import ObjectTable
+        from prtg.values import convert_page
+        sensors = convert_page([Sensor(objid='1', lastvalue_raw='2.5000', lastcheck_raw='42389.5'),
+                                Sensor(objid='2', lastvalue_raw='', lastcheck_raw='')])
+        table = ObjectTable.from_objects(sensors)
+        self.assertEqual(2.5, table['lastvalue_raw'][0])
+        self.assertTrue(numpy.isnan(table['lastvalue_raw'][1]))
+        self.assertEqual(numpy.datetime64('2016-01-20T12:00'), table['lastcheck_raw'][0])
+        self.assertTrue(numpy.isnat(table['lastcheck_raw'][1]))
+
+    def test_join_typed_columns(self):
+        from prtg.columnar import MISSING, ObjectTable
+        from prtg.values import convert_page
+        sensors, _ = build_tables()
+        # Parents of any content type can be joined: sensors have every typed column needed here.
+        devices = convert_page([Sensor(objid=str(2000 + i), status='Up', status_raw='3', lastcheck_raw='42389.5',
+                                       active='true') for i in range(2)])
+        devices = ObjectTable.from_objects(devices)
+        columns = ('status', 'lastcheck_raw', 'active_raw')
+        joined = sensors.join(devices, columns)
+        self.assertEqual([3, 3, MISSING], list(joined['parent_status'][:3]))
+        self.assertEqual(numpy.datetime64('2016-01-20T12:00'), joined['parent_lastcheck_raw'][1])
+        self.assertTrue(numpy.isnat(joined['parent_lastcheck_raw'][2]))
+        self.assertEqual(1.0, joined['parent_active_raw'][0])
+        self.assertTrue(numpy.isnan(joined['parent_active_raw'][2]))
+        empty = sensors.join(devices.select(devices.isin('objid', [])), columns)
+        self.assertTrue(numpy.isnat(empty['parent_lastcheck_raw']).all())
+        self.assertTrue((empty['parent_status'] == MISSING).all())
+
+    def test_from_cache_and_query(self):
+        from prtg.columnar import ObjectTable
+        with FakePrtgServer() as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p', cache_dir=None)
+            query = Query(client=client, target='table', content='sensors', maximum=10)
+            table = ObjectTable.from_query(client, query)
+            self.assertEqual(25, len(table))
+            self.assertEqual(['objid', 'parentid', 'name', 'tags', 'active', 'status'], table.names)
+        cache = Cache()
+        cache.write_content([Sensor(objid='1', status='Up'), Device(objid='2')])
+        table = ObjectTable.from_cache(cache, 'sensors', ['objid', 'status'])
+        self.assertEqual([1], list(table['objid']))
+        self.assertEqual(0, len(ObjectTable.from_cache(cache, 'groups', ['objid'])))
+        namespace = cache.namespace('node')
+        namespace.write_content([Sensor(objid='3', status='Down'), Sensor(objid='4', status='Up')])
+        self.assertEqual([3, 4], sorted(ObjectTable.from_cache(namespace, 'sensors', ['objid'])['objid']))
+        table = ObjectTable.from_cache(cache, 'sensors', ['objid', 'status'], 'node')
+        self.assertEqual([3], list(table.select(table.equals('status', 'Down'))['objid']))
+
+    def test_status_codes(self):
+        from prtg.columnar import MISSING, ObjectTable
+        sensors = [Sensor(objid='1', status='Up', status_raw='7'), Sensor(objid='2', status='Up'),
+                   Sensor(objid='3', status='Bogus'), Sensor(objid='4')]
+        table = ObjectTable.from_objects(sensors, columns=['status'])
+        self.assertEqual([7, 3, MISSING, MISSING], list(table['status']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,14 @@
 Unittests for PRTG Connection
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import pickle
 import unittest
-from prtg.client import Connection
+from prtg.client import Client, Connection, Interner, ResponseParser, SensorTreeParser, SingleFlight
+from prtg.exceptions import UnknownResponse
+from prtg.models import Query, Sensor
+from tests.fake_prtg import FakePrtgServer, build_sensors, build_sensortree
 
 
 class TestConnection(unittest.TestCase):
@@ -13,6 +19,222 @@ class TestConnection(unittest.TestCase):
         c = Connection()
         self.assertIsInstance(c, Connection)
 
+    def test_parallel_pagination(self):
+        with FakePrtgServer(build_sensors(95)) as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p', page_workers=4)
+            self.addCleanup(client.close)
+            client.query(Query(client=client, target='table', content='sensors', maximum=10))
+            # No extra request just to find 'listend=1'.
+            self.assertEqual(10, len(server.requests))
+            objids = sorted(int(sensor.objid) for sensor in client.cache.get_content('sensors'))
+            self.assertEqual(list(range(3000, 3095)), objids)
+
+    def test_parallel_pagination_list_grows(self):
+        with FakePrtgServer(build_sensors(30)) as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p', page_workers=4)
+            self.addCleanup(client.close)
+            query = Query(client=client, target='table', content='sensors', maximum=10)
+            conn = Connection(client.pool, client.page_workers)
+            original_fetch_page = conn._fetch_page
+
+            def fetch_page_and_grow(page_query, *args):
+                result = original_fetch_page(page_query, *args)
+                if page_query.counter == 0:
+                    server.items = build_sensors(45)
+                return result
+            conn._fetch_page = fetch_page_and_grow
+            conn.get_request(query, client.cache)
+            self.assertEqual(45, len(list(client.cache.get_content('sensors'))))
+
+    def test_iter_query(self):
+        with FakePrtgServer(build_sensors(35)) as server:
+            for page_workers in (1, 3):
+                client = Client(endpoint=server.endpoint, username='u', password='p', page_workers=page_workers)
+                self.addCleanup(client.close)
+                query = Query(client=client, target='table', content='sensors', maximum=10)
+                sensors = client.iter_query(query)
+                self.assertEqual('3000', next(sensors).objid)
+                self.assertEqual(list(range(3001, 3035)), [int(sensor.objid) for sensor in sensors])
+                self.assertEqual([], list(client.cache.get_content('sensors')))
+
+    def test_iter_query_with_cache(self):
+        with FakePrtgServer(build_sensors(35)) as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            self.addCleanup(client.close)
+            query = Query(client=client, target='table', content='sensors', maximum=10)
+            self.assertEqual(35, len(list(client.iter_query(query, cache=True))))
+            self.assertEqual(35, len(list(client.cache.get_content('sensors'))))
+
+    def test_json_output(self):
+        with FakePrtgServer(build_sensors(35)) as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            self.addCleanup(client.close)
+            query = Query(client=client, target='table', content='sensors', maximum=10, output='json')
+            sensors = list(client.iter_query(query))
+            self.assertEqual(4, len(server.requests))
+            self.assertEqual([str(objid) for objid in range(3000, 3035)], [sensor.objid for sensor in sensors])
+            self.assertEqual(('ta', 'tb0'), sensors[0].tags)
+            status = client.query(Query(client=client, target='getstatus', output='json'))[0]
+            self.assertEqual(('2', 'true'), (status.Alarms, status.IsAdminUser))
+            for output in ('xml', 'json'):
+                details = client.query(Query(client=client, target='getsensordetails', objid='77', output=output))[0]
+                self.assertEqual(('Ping', '77'), (details.name, details.parentdeviceid))
+
+
+class TestResponseParser(unittest.TestCase):
+
+    TABLE = (b'<?xml version="1.0" encoding="UTF-8" ?><devices totalcount="3" listend="0">'
+             b'<prtg-version>15.1</prtg-version>'
+             b'<item><objid>1</objid><name>a</name><tags>x y</tags></item>'
+             b'<item><objid>2</objid><name>b</name><tags></tags></item>'
+             b'<item><objid>3</objid><name>c</name></item></devices>')
+
+    def test_incremental_table(self):
+        parser = ResponseParser()
+        for i in range(0, len(self.TABLE), 7):
+            parser.feed(self.TABLE[i:i + 7])
+            # At most the item being received is held as XML.
+            self.assertLessEqual(len(parser.root.findall('item')) if parser.root is not None else 0, 1)
+        objects, ended, total = parser.close()
+        self.assertEqual(['1', '2', '3'], [device.objid for device in objects])
+        self.assertEqual(('x', 'y'), objects[0].tags)
+        self.assertEqual(('0', '3'), (ended, total))
+
+    def test_interned_values(self):
+        table = (b'<?xml version="1.0" encoding="UTF-8" ?><sensors totalcount="2" listend="1">'
+                 b'<item><objid>1</objid><parentid>9</parentid><device>d</device><tags>x y</tags></item>'
+                 b'<item><objid>2</objid><parentid>9</parentid><device>d</device><tags>x y</tags></item></sensors>')
+        interner = Interner()
+        parser = ResponseParser(interner=interner)
+        parser.feed(table)
+        first, second = parser.close()[0]
+        self.assertEqual(type(Sensor(tags='x y').tags), type(first.tags))
+        self.assertIs(first.tags, second.tags)
+        self.assertIs(first.parentid, second.parentid)
+        self.assertIs(first.device, second.device)
+        self.assertIsNot(first.objid, second.objid)
+        interner.clear()
+        self.assertEqual((0, 0), (len(interner.values), len(interner.tags)))
+
+    def test_interner_per_connection(self):
+        with FakePrtgServer(build_sensors(15)) as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            self.addCleanup(client.close)
+            conn = client._connection(Query(client=client, target='table', content='sensors'))
+            self.assertIsNot(conn.interner, client._connection(Query(client=client, target='getstatus')).interner)
+            sensors = [sensor for page in conn.iter_pages(Query(client=client, target='table', content='sensors',
+                                                                maximum=10)) for sensor in page]
+            self.assertIs(sensors[0].parentid, sensors[10].parentid)
+            self.assertEqual((0, 0), (len(conn.interner.values), len(conn.interner.tags)))  # Cleared after the query.
+
+    def test_lazy_table(self):
+        parser = ResponseParser(lazy=True)
+        parser.feed(self.TABLE)
+        objects, ended, total = parser.close()
+        self.assertEqual(('0', '3'), (ended, total))
+        device = objects[0]
+        self.assertEqual(('objid', 'name', 'tags'), device._fields)
+        self.assertRaises(AttributeError, object.__getattribute__, device, 'tags')  # Not decoded yet.
+        self.assertEqual(('x', 'y'), device.tags)
+        self.assertIs(device.tags, object.__getattribute__(device, 'tags'))
+        self.assertIsNone(objects[1].tags)
+        self.assertFalse(hasattr(objects[2], 'tags'))
+        self.assertEqual({'objid': '1', 'name': 'a', 'tags': ('x', 'y')}, device.fields())
+        copy = pickle.loads(pickle.dumps(device))
+        self.assertEqual(device.fields(), copy.fields())
+        self.assertNotIn('_raw', type(copy).__slots__)
+
+    def test_lazy_json(self):
+        with FakePrtgServer(build_sensors(15)) as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            self.addCleanup(client.close)
+            query = Query(client=client, target='table', content='sensors', maximum=10, output='json', lazy=True)
+            sensors = list(client.iter_query(query))
+            self.assertEqual([str(objid) for objid in range(3000, 3015)], [sensor.objid for sensor in sensors])
+            self.assertEqual(('ta', 'tb0'), sensors[0].tags)
+            self.assertEqual('Down', sensors[0].status)
+
+    def test_process_response_in_chunks(self):
+        conn = Connection()
+        conn.READ_CHUNK_SIZE = 16
+        objects, ended, total = conn._process_response(BytesIO(self.TABLE))
+        self.assertEqual(3, len(objects))
+
+    def test_non_table_response(self):
+        objects, ended, total = Connection()._process_response(
+            BytesIO(b'<prtg><version>15.1</version><result>tags</result></prtg>'))
+        self.assertEqual('tags', objects[0].result)
+        self.assertEqual((1, None), (ended, total))
+
+    def test_malformed_response(self):
+        with self.assertRaises(UnknownResponse):
+            Connection()._process_response(BytesIO(b'<prtg><version>'))
+        # Error past the first read chunk, found while feeding rather than when closing.
+        body = b'<sensors>' + b'<item><objid>1</objid></item>' * (Connection.READ_CHUNK_SIZE // 20) + b'<item></b>'
+        for parser in ('sensors', 'sensortree'):
+            with self.assertRaises(UnknownResponse):
+                Connection()._process_response(BytesIO(body + b' ' * Connection.READ_CHUNK_SIZE), content=parser)
+
+
+class TestSensorTreeParser(unittest.TestCase):
+
+    def test_incremental_tree(self):
+        data = build_sensortree(2, 2, 3)
+        parser = SensorTreeParser()
+        for i in range(0, len(data), 50):
+            parser.feed(data[i:i + 50])
+        objects, ended, total = parser.close()
+        self.assertEqual((1, None), (ended, total))
+        by_id = dict((obj.objid, obj) for obj in objects)
+        self.assertEqual(2 + 4 + 12 + 2, len(by_id))
+        self.assertEqual(['groups'] * 2, [by_id[objid].content_type for objid in ('0', '1')])
+        self.assertIsNone(getattr(by_id['0'], 'parentid', None))
+        self.assertEqual(('1', 'groups'), (by_id['100'].parentid, by_id['100'].content_type))
+        device = by_id['1003']
+        self.assertEqual(('devices', '101', '10.0.0.1', 'group 1', 'Local Probe'),
+                         (device.content_type, device.parentid, device.host, device.group, device.probe))
+        sensor = by_id['10011']
+        self.assertEqual(('sensors', '1003', 'device 1003', 'group 1', ('ts', 'pingsensor')),
+                         (sensor.content_type, sensor.parentid, sensor.device, sensor.group, sensor.tags))
+        self.assertEqual(0, len(parser.root.find('sensortree/nodes')))  # Nothing left behind.
+
+    def test_load_tree(self):
+        with FakePrtgServer() as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            self.addCleanup(client.close)
+            objects = client.load_tree()
+            self.assertEqual(1, len(server.requests))
+            self.assertIn('content=sensortree', server.requests[0])
+            self.assertEqual(20, len(objects))
+            self.assertEqual(12, len(list(client.cache.get_content('sensors'))))
+            self.assertEqual('1000', client.cache.get_object('10001').parentid)
+            client.load_tree(objid=100)
+            self.assertIn('id=100', server.requests[1])
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_identical_queries_are_collapsed(self):
+        with FakePrtgServer() as server:
+            server.delay = 0.2
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            self.addCleanup(client.close)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                responses = list(executor.map(lambda _: client.query(Query(client=client, target='getstatus')),
+                                              range(8)))
+            self.assertEqual(1, len(server.requests))
+            self.assertTrue(all(response is responses[0] for response in responses))
+            self.assertEqual((1, 7), (client.single_flight.calls, client.single_flight.collapsed))
+
+    def test_exceptions_are_shared(self):
+        single_flight = SingleFlight()
+
+        def fail():
+            raise ValueError()
+        with self.assertRaises(ValueError):
+            single_flight.do('key', fail)
+        self.assertEqual(1, single_flight.do('key', lambda: 1))
+
 
 if __name__ == '__main__':
     unittest.main()
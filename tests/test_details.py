@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Unittests for bulk sensor details and channels
+"""
+
+import unittest
+from urllib.error import HTTPError
+from prtg.client import Client, Connection
+from prtg.exceptions import BadTarget
+from prtg.models import Channel, Query, SensorDetails
+from tests.fake_prtg import FakePrtgServer
+
+
+class TestSensorInfo(unittest.TestCase):
+
+    def setUp(self):
+        self.retries = Connection.RETRIES_PER_QUERY
+        Connection.RETRIES_PER_QUERY = 0
+
+    def tearDown(self):
+        Connection.RETRIES_PER_QUERY = self.retries
+
+    def test_channels_query(self):
+        client = Client(endpoint='http://127.0.0.1:8080', username='u', password='p')
+        query = Query(client=client, target='table', content='channels', objid=1001)
+        self.assertIn('columns=objid%2Cname%2Clastvalue_', str(query))
+        self.assertIn('id=1001', str(query))
+        self.assertRaises(BadTarget, Query, client=client, target='table', content='channels')
+
+    def test_details(self):
+        with FakePrtgServer() as server:
+            server.failing_ids.add('1003')
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            details = client.sensor_details([1001, 1002, 1003, 1001])
+            self.assertEqual(['1001', '1002', '1003'], list(details))
+            self.assertIsInstance(details['1001'], SensorDetails)
+            self.assertEqual('1002', details['1002'].parentdeviceid)
+            self.assertIsInstance(details['1003'], HTTPError)
+            self.assertEqual(3, len(server.requests))
+
+            client.sensor_details([1001, 1002])
+            self.assertEqual(3, len(server.requests))  # Cached.
+            client.set_properties([(1001, 'name', 'renamed')])
+            client.sensor_details([1001, 1002])
+            self.assertEqual(5, len(server.requests))  # The write invalidated 1001 only.
+
+    def test_channels(self):
+        with FakePrtgServer() as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            channels = client.channels(['1001', '1002'])
+            self.assertEqual(['1001', '1002'], list(channels))
+            self.assertEqual(3, len(channels['1002']))
+            channel = channels['1002'][1]
+            self.assertIsInstance(channel, Channel)
+            self.assertEqual(('1', '1002', 'channel 1', '1 msec', '1.0000'),
+                             (channel.objid, channel.parentid, channel.name, channel.lastvalue, channel.lastvalue_raw))
+            self.assertEqual([], list(client.cache.get_content('channels')))  # Channel ids are not unique.
+            client.channels(['1001', '1002'])
+            self.assertEqual(2, len(server.requests))
+
+
+if __name__ == '__main__':
+    unittest.main()
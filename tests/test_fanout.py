@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Unittests for the PRTG fan-out client
+"""
+
+import time
+import unittest
+from prtg.cache import Cache
+from prtg.fanout import FanOutClient
+from prtg.models import Device, Query
+from tests.fake_prtg import FakePrtgServer, build_sensors
+
+
+class TestCacheNamespace(unittest.TestCase):
+
+    def test_same_objid_in_two_namespaces(self):
+        cache = Cache()
+        first, second = cache.namespace('a'), cache.namespace('b')
+        first.write_content([Device(objid='1', name='first')])
+        second.write_content([Device(objid='1', name='second')])
+        cache.write_content([Device(objid='1', name='plain')])
+        self.assertEqual('first', first.get_object('1').name)
+        self.assertEqual('second', second.get_object('1').name)
+        self.assertEqual('plain', cache.get_object('1').name)
+        self.assertEqual(['second'], [obj.name for obj in second.get_content('devices')])
+        self.assertEqual(3, len(list(cache.get_content('devices'))))
+        self.assertTrue(first.update_object('1', 'name', 'renamed'))
+        self.assertEqual('renamed', cache.get_object('1', 'a').name)
+        self.assertTrue(second.delete_object('1'))
+        self.assertRaises(KeyError, second.get_object, '1')
+        self.assertRaises(ValueError, cache.namespace, 'a/b')
+
+
+class TestFanOutClient(unittest.TestCase):
+
+    def test_fan_out(self):
+        with FakePrtgServer(build_sensors(30)) as fast, FakePrtgServer(build_sensors(20)) as slow:
+            slow.delay = 0.5
+            client = FanOutClient({'fast': fast.endpoint, 'slow': slow.endpoint, 'down': 'http://127.0.0.1:1'},
+                                  'u', 'p')
+            query = Query(client=client.clients['fast'], target='table', content='sensors', maximum=10)
+            started = time.monotonic()
+            results = client.iter_query(query)
+            first = next(results)
+            self.assertIn(first.server, ('fast', 'down'))
+            self.assertLess(time.monotonic() - started, 0.5)
+            results = dict((result.server, result) for result in [first] + list(results))
+
+            self.assertTrue(results['fast'].ok and results['slow'].ok)
+            self.assertIsInstance(results['down'].error, OSError)
+            self.assertGreater(results['slow'].elapsed, results['fast'].elapsed)
+            self.assertEqual(0, query.counter)
+            servers = [server for server, _ in client.get_content('sensors')]
+            self.assertEqual((30, 20), (servers.count('fast'), servers.count('slow')))
+            self.assertEqual(50, len(list(client.cache.get_content('sensors'))))
+            self.assertEqual(['fast', 'slow', 'down'], list(client.query(query)))
+            client.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Unittests for PRTG historic data
+"""
+
+from datetime import datetime, timedelta
+import os
+import tempfile
+import unittest
+from prtg.client import Client
+from prtg.exceptions import BadTarget
+from prtg.models import Query
+from tests.fake_prtg import FakePrtgServer, build_historic_csv
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+START = datetime(2016, 1, 20)
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class TestDecodeCsv(unittest.TestCase):
+
+    def test_decode(self):
+        from prtg.historic import decode_csv
+        data = decode_csv(build_historic_csv('2000', START, START + timedelta(minutes=30)))
+        self.assertEqual(['Ping Time', 'Packet Loss', 'Coverage'], data.names)
+        self.assertEqual(30, len(data))
+        self.assertEqual(numpy.datetime64('2016-01-20T00:05:00.000'), data.timestamps[5])
+        self.assertAlmostEqual(7.0, data.channels['Ping Time'][5])
+        self.assertTrue(numpy.isnan(data.channels['Packet Loss'][10]))
+        self.assertEqual(2.0, data.channels['Packet Loss'][11])
+
+    def test_escaped_quotes(self):
+        from prtg.historic import decode_csv
+        body = build_historic_csv('1', START, START + timedelta(minutes=3)).replace(b'"0 %"', b'"0 ""%"""', 1)
+        data = decode_csv(body)
+        self.assertEqual(3, len(data))
+        self.assertEqual([0.001, 1.001, 2.001], list(numpy.round(data.channels['Ping Time'], 3)))
+
+    def test_empty_response(self):
+        from prtg.historic import decode_csv
+        self.assertEqual(0, len(decode_csv(b'')))
+
+    def test_concatenate_boundary(self):
+        from prtg.historic import decode_csv, HistoricData
+        middle = START + timedelta(minutes=3)
+        parts = [decode_csv(build_historic_csv('1', START, middle, inclusive=True)),
+                 decode_csv(build_historic_csv('1', middle, middle + timedelta(minutes=3), inclusive=True))]
+        self.assertEqual(parts[0].timestamps[-1], parts[1].timestamps[0])  # A sample exactly on the boundary.
+        data = HistoricData.concatenate(parts)
+        self.assertEqual(7, len(data))
+        self.assertTrue(numpy.all(numpy.diff(data.timestamps) == numpy.timedelta64(60000, 'ms')))
+        self.assertEqual([2.001, 3.001, 4.001], list(numpy.round(data.channels['Ping Time'][2:5], 3)))
+        self.assertEqual(7, len(data.channels['Coverage']))
+
+
+class TestHistoricQuery(unittest.TestCase):
+
+    def test_query(self):
+        client = Client(endpoint='http://127.0.0.1:8080', username='u', password='p')
+        query = Query(client=client, target='historicdata', objid=1001, output='csv')
+        query.set_period('2016-01-20-00-00-00', '2016-01-21-00-00-00')
+        self.assertIn('/api/historicdata.csv?', str(query))
+        self.assertIn('id=1001&sdate=2016-01-20-00-00-00&edate=2016-01-21-00-00-00&avg=0', str(query))
+        self.assertRaises(BadTarget, Query, client=client, target='historicdata')
+        self.assertRaises(BadTarget, Query(client=client, target='getstatus').set_period, 'a', 'b')
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class TestHistoricDataFetcher(unittest.TestCase):
+
+    def test_fetch_and_resume(self):
+        with FakePrtgServer() as server, tempfile.TemporaryDirectory() as checkpoints:
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            end = START + timedelta(hours=5)
+            result = client.historic_data([1001, 1002], START, end, window=timedelta(hours=2),
+                                          checkpoint_dir=checkpoints)
+            self.assertEqual(['1001', '1002'], list(result))
+            self.assertEqual(6, len(server.requests))  # 3 windows per sensor.
+            data = result['1002']
+            self.assertEqual(300, len(data))
+            self.assertTrue(numpy.all(numpy.diff(data.timestamps) == numpy.timedelta64(60000, 'ms')))
+            self.assertAlmostEqual(300.002, data.channels['Ping Time'][-1])
+
+            self.assertEqual(6, len(os.listdir(checkpoints)))
+            os.remove(os.path.join(checkpoints, sorted(name for name in os.listdir(checkpoints)
+                                                       if name.startswith('1002_'))[-1]))
+            resumed = client.historic_data([1001, 1002], START, end, window=timedelta(hours=2),
+                                           checkpoint_dir=checkpoints)
+            self.assertEqual(7, len(server.requests))  # Only the missing window.
+            self.assertTrue(numpy.array_equal(data.channels['Ping Time'], resumed['1002'].channels['Ping Time']))
+
+    def test_fetch_inclusive_windows(self):
+        with FakePrtgServer() as server:
+            server.historic_inclusive = True
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            data = client.historic_data([1001], START, START + timedelta(hours=5), window=timedelta(hours=2))['1001']
+            self.assertEqual(301, len(data))  # Every minute from the start to the end, both included, once.
+            self.assertTrue(numpy.all(numpy.diff(data.timestamps) == numpy.timedelta64(60000, 'ms')))
+
+
+if __name__ == '__main__':
+    unittest.main()
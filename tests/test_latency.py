@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Unittests for PRTG deadlines and hedged requests
+"""
+
+import time
+import unittest
+from prtg.client import Client
+from prtg.exceptions import DeadlineExceeded
+from prtg.latency import Deadline, Hedger
+from prtg.models import Query
+from tests.fake_prtg import FakePrtgServer, build_sensors
+
+
+class TestDeadline(unittest.TestCase):
+
+    def test_deadline(self):
+        deadline = Deadline(0.05)
+        self.assertFalse(deadline.expired)
+        self.assertLessEqual(deadline.remaining(), 0.05)
+        time.sleep(0.06)
+        self.assertTrue(deadline.expired)
+        self.assertEqual(0, deadline.remaining())
+        self.assertRaises(DeadlineExceeded, deadline.check, 'query')
+
+    def test_partial_table(self):
+        with FakePrtgServer(build_sensors(100)) as server:
+            server.delay = 0.2
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            query = Query(client=client, target='table', content='sensors', maximum=10, timeout=0.5)
+            started = time.monotonic()
+            client.query(query)
+            self.assertLess(time.monotonic() - started, 1)
+            self.assertTrue(query.partial)
+            self.assertLess(len(list(client.cache.get_content('sensors'))), 100)
+
+            query = Query(client=client, target='table', content='sensors', maximum=50, timeout=5)
+            client.query(query)
+            self.assertFalse(query.partial)
+            self.assertEqual(100, len(list(client.cache.get_content('sensors'))))
+
+    def test_timeout_on_status(self):
+        with FakePrtgServer() as server:
+            server.delay = 0.5
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            query = Query(client=client, target='getstatus', timeout=0.1)
+            self.assertRaises(DeadlineExceeded, client.query, query)
+
+    def test_timeout_waiting_for_a_slot(self):
+        with FakePrtgServer() as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p', pool_size=1)
+            for hold, give_back in ((client.pool._slots.acquire, client.pool._slots.release),
+                                    (client.limiter.window.acquire, client.limiter.window.cancel)):
+                hold()
+                started = time.monotonic()
+                self.assertRaises(DeadlineExceeded, client.query, Query(client=client, target='getstatus', timeout=0.2))
+                self.assertLess(time.monotonic() - started, 1)
+                give_back()
+            self.assertEqual('15.1', client.query(Query(client=client, target='getstatus', timeout=1))[0].Version)
+            self.assertEqual(0, client.limiter.window.in_flight)
+
+
+class TestHedger(unittest.TestCase):
+
+    def test_slow_call_is_hedged(self):
+        hedger = Hedger(percentile=90, min_samples=5)
+        calls = list()
+
+        def call():
+            calls.append(None)
+            if len(calls) == 6:
+                time.sleep(1)
+                return 'slow'
+            time.sleep(0.01)
+            return 'fast'
+
+        for _ in range(5):
+            self.assertEqual('fast', hedger.run(call))
+        hedger.max_ratio = 1
+        started = time.monotonic()
+        self.assertEqual('fast', hedger.run(call))
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual((1, 1), (hedger.hedged, hedger.hedge_wins))
+        hedger.close()
+
+    def test_failed_copy_waits_for_the_other(self):
+        hedger = Hedger(min_samples=1, max_ratio=1)
+        hedger.observe(0.01)
+
+        def call(calls=list()):
+            calls.append(None)
+            if len(calls) == 1:
+                time.sleep(0.1)
+                return 'late'
+            raise ValueError()
+
+        self.assertEqual('late', hedger.run(call))
+        self.assertRaises(DeadlineExceeded, hedger.run, time.sleep, 1, timeout=0.05)
+        hedger.close()
+
+    def test_client_hedges_slow_pages(self):
+        with FakePrtgServer(build_sensors(200)) as server:
+            server.slow_once['150'] = 5
+            client = Client(endpoint=server.endpoint, username='u', password='p', hedge_percentile=95)
+            started = time.monotonic()
+            client.query(Query(client=client, target='table', content='sensors', maximum=5))
+            self.assertLess(time.monotonic() - started, 4)
+            self.assertEqual(200, len(list(client.cache.get_content('sensors'))))
+            self.assertGreaterEqual(client.hedger.hedged, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@
 Unittests for PRTG Query Builder
 """
 
+import pickle
 import unittest
 from prtg.client import Group, Device, Sensor, Status
 
@@ -27,6 +28,34 @@ class TestSensor(unittest.TestCase):
         s = Sensor()
         self.assertIsInstance(s, Sensor)
 
+    def test_lean_sensor(self):
+        s = Sensor(objid='1', parentid='2', tags='a b', unknown='x')
+        self.assertEqual({'objid', 'parentid', 'tags'}, set(s.fields()))
+        self.assertEqual(('a', 'b'), s.tags)
+        self.assertEqual('Sensor', s.type)
+        self.assertFalse(s.changed)
+        self.assertFalse(hasattr(s, 'unknown'))
+
+    def test_same_columns_share_record_class(self):
+        a = Sensor(objid='1', name='a')
+        b = Sensor(name='b', objid='2')
+        self.assertIs(type(a), type(b))
+        self.assertIsNone(Sensor(name='c').objid)
+
+    def test_extra_attribute(self):
+        s = Sensor(objid='1')
+        s.comments = 'x'
+        s.changed = True
+        self.assertEqual({'objid': '1', 'comments': 'x', 'changed': True}, s.fields())
+
+    def test_pickle(self):
+        s = Sensor(objid='1', tags='a b', status='Up')
+        s.changed = True
+        s.parentname = 'device'
+        copy = pickle.loads(pickle.dumps(s))
+        self.assertIsInstance(copy, Sensor)
+        self.assertEqual(s.fields(), copy.fields())
+
 
 class TestStatus(unittest.TestCase):
 
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Unittests for PRTG adaptive pagination
+"""
+
+import unittest
+from prtg.client import Client
+from prtg.models import Query
+from prtg.paging import AdaptivePageSize
+from tests.fake_prtg import FakePrtgServer, build_sensors
+
+
+class TestAdaptivePageSize(unittest.TestCase):
+
+    def test_grows_and_shrinks_toward_target_latency(self):
+        sizer = AdaptivePageSize(500, target_latency=2.0)
+        self.assertEqual(750, sizer.observe(500, 4.0 / 3))
+        self.assertEqual(1500, sizer.observe(750, 0.1))  # Never more than MAX_STEP at a time.
+        self.assertEqual(750, sizer.observe(1500, 10.0))
+        self.assertEqual(750, sizer.observe(20, 10.0))  # Short (last) pages are ignored.
+
+    def test_limits(self):
+        sizer = AdaptivePageSize(30000, target_latency=2.0, max_bytes=1000000)
+        self.assertEqual(AdaptivePageSize.MAXIMUM, sizer.observe(30000, 0.5, 1000))
+        self.assertEqual(25000, sizer.observe(50000, 0.5, 2000000))
+        self.assertEqual(12500, sizer.failed())
+        sizer = AdaptivePageSize(60, minimum=50)
+        self.assertEqual(50, sizer.failed())
+
+
+class TestAdaptivePagination(unittest.TestCase):
+
+    def test_learned_page_size(self):
+        with FakePrtgServer(build_sensors(1000)) as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p', target_page_latency=1000)
+            client.query(Query(client=client, target='table', content='sensors', maximum=50))
+            self.assertEqual(5, len(server.requests))
+            self.assertEqual(1000, len(list(client.cache.get_content('sensors'))))
+            self.assertEqual({'sensors': 800}, client.page_sizes)
+            query = Query(client=client, target='table', content='sensors', maximum=50)
+            self.assertEqual(1000, len(list(client.iter_query(query))))
+            self.assertIn('count=800', server.requests[5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Unittests for PRTG Connection Pool
+"""
+
+import asyncio
+import http.client
+from io import BytesIO
+import os
+import threading
+import unittest
+from unittest import mock
+import urllib.request
+import zlib
+from prtg.aio import AsyncClient
+from prtg.client import Client
+from prtg.exceptions import UnknownResponse
+from prtg.models import Query
+from prtg.pool import ConnectionPool, DecompressingReader
+from tests.fake_prtg import FakePrtgServer, build_sensors
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def test_one_handshake_per_pooled_socket(self):
+        with FakePrtgServer(build_sensors(50)) as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p', pool_size=2)
+            for _ in range(3):
+                client.query(Query(client=client, target='table', content='sensors', maximum=10))
+            self.assertEqual(15, len(server.requests))
+            self.assertEqual(1, client.pool.handshakes)
+            self.assertEqual(1, server.connections)
+            self.assertEqual(50, len(list(client.cache.get_content('sensors'))))
+
+    def test_idle_connections_expire(self):
+        with FakePrtgServer() as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p', idle_timeout=-1)
+            client.query(Query(client=client, target='getstatus'))
+            client.query(Query(client=client, target='getstatus'))
+            self.assertEqual(2, client.pool.handshakes)
+
+    def test_pooling_disabled(self):
+        with FakePrtgServer() as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p', pool_size=0)
+            self.assertIsNone(client.pool)
+            response = client.query(Query(client=client, target='getstatus'))
+            self.assertEqual('15.1', response[0].Version)
+
+    def test_close(self):
+        with FakePrtgServer() as server:
+            with Client(endpoint=server.endpoint, username='u', password='p', hedge_percentile=95) as client:
+                client.query(Query(client=client, target='getstatus'))
+                self.assertEqual(1, len(client.pool._idle))
+            self.assertEqual(0, len(client.pool._idle))
+            self.assertRaises(RuntimeError, client.hedger._executor.submit, print)
+
+    def test_failed_reconnection_is_closed(self):
+        pool = ConnectionPool('http://127.0.0.1:1', size=1)
+        stale, fresh = mock.Mock(sock=None), mock.Mock(sock=None)
+        stale.request.side_effect = http.client.RemoteDisconnected()
+        fresh.request.side_effect = ConnectionRefusedError()
+        pool._slots.acquire()
+        pool.release(stale)  # An idle connection that the server has dropped.
+        with mock.patch.object(pool, '_new_connection', return_value=fresh):
+            self.assertRaises(ConnectionRefusedError, pool.urlopen, urllib.request.Request('http://127.0.0.1:1/api'))
+        stale.close.assert_called()
+        fresh.close.assert_called()
+        self.assertTrue(pool._slots.acquire(timeout=0))  # The slot was given back.
+
+    def test_failed_body_frees_its_slot(self):
+        with FakePrtgServer() as server:
+            server.bodies['getstatus.xml'] = b'<status><Version>15.1</Alarms>' + b' ' * 500000
+            client = Client(endpoint=server.endpoint, username='u', password='p', pool_size=1)
+            with self.assertRaises(UnknownResponse):
+                client.query(Query(client=client, target='getstatus'))
+            del server.bodies['getstatus.xml']
+            responses = []
+            thread = threading.Thread(target=lambda: responses.append(
+                client.query(Query(client=client, target='getstatus'))), daemon=True)
+            thread.start()
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+            self.assertEqual('15.1', responses[0][0].Version)
+            self.assertEqual(2, client.pool.handshakes)  # The half-read connection was discarded.
+
+    def test_redirects(self):
+        with FakePrtgServer() as server, FakePrtgServer() as other:
+            server.redirects['getstatus.xml'] = '/api/status.xml'
+            server.bodies['status.xml'] = b'<status><Version>15.1</Version></status>'
+            server.redirects['table.xml'] = other.endpoint + '/api/table.xml'
+            client = Client(endpoint=server.endpoint, username='u', password='p', pool_size=1)
+            self.assertEqual('15.1', client.query(Query(client=client, target='getstatus'))[0].Version)
+            self.assertEqual(1, client.pool.handshakes)
+            query = Query(client=client, target='table', content='sensors', maximum=10)
+            self.assertEqual(25, len(list(client.iter_query(query))))
+            self.assertEqual(3, len(other.requests))
+
+    def test_proxy(self):
+        with FakePrtgServer() as proxy:
+            with mock.patch.dict(os.environ, {'http_proxy': proxy.endpoint, 'no_proxy': ''}):
+                client = Client(endpoint='http://prtg.invalid:8080', username='u', password='p')
+            self.assertEqual('15.1', client.query(Query(client=client, target='getstatus'))[0].Version)
+            self.assertTrue(proxy.requests[0].startswith('http://prtg.invalid:8080/api/getstatus.xml?'))
+
+
+class TestCompression(unittest.TestCase):
+
+    def test_deflate_streams(self):
+        data = b'<sensors>' + b'<item><objid>1</objid></item>' * 1000 + b'</sensors>'
+        raw = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        for encoding, body in (('deflate', zlib.compress(data)), ('deflate', raw.compress(data) + raw.flush()),
+                               ('', data)):
+            reader = DecompressingReader(BytesIO(body), encoding)
+            chunks = []
+            chunk = reader.read(64)
+            while chunk:
+                chunks.append(chunk)
+                chunk = reader.read(64)
+            self.assertEqual(data, b''.join(chunks))
+            self.assertEqual((len(body), len(data)), (reader.bytes_wire, reader.bytes_decoded))
+
+    def test_compressed_table(self):
+        with FakePrtgServer(build_sensors(200)) as server:
+            server.compress = True
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            query = Query(client=client, target='table', content='sensors', maximum=100)
+            self.assertEqual(200, len(list(client.iter_query(query))))
+            self.assertLess(query.bytes_wire * 5, query.bytes_decoded)
+
+            client = AsyncClient(endpoint=server.endpoint, username='u', password='p')
+            query = Query(client=client, target='table', content='sensors', maximum=100)
+            asyncio.run(client.query(query))
+            self.assertEqual(200, len(list(client.cache.get_content('sensors'))))
+            self.assertLess(client.pool.bytes_wire * 5, client.pool.bytes_decoded)
+            self.assertEqual((client.pool.bytes_wire, client.pool.bytes_decoded),
+                             (query.bytes_wire, query.bytes_decoded))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ Unittests for PRTG Query Builder
 """
 
 import unittest
+from prtg.exceptions import BadRequest, BadTarget
 from prtg.models import Query
 from prtg.client import Client
 
@@ -38,6 +39,55 @@ class TestQuery(unittest.TestCase):
         query = Query(client=client, target='getobjectproperty', objid='2001', name='tags')
         self.assertIsInstance(query, Query)
 
+    def test_json_output_query(self):
+        client = Client(endpoint=endpoint, username=username, password=password)
+        query = Query(client=client, target='table', content='sensors', output='json')
+        self.assertIn('/api/table.json?', str(query))
+        with self.assertRaises(BadTarget):
+            Query(client=client, target='getobjectproperty', objid='2001', name='tags', output='json')
+
+    def test_sensor_details_query(self):
+        client = Client(endpoint=endpoint, username=username, password=password)
+        query = Query(client=client, target='getsensordetails', objid='2001')
+        self.assertIn('/api/getsensordetails.xml?', str(query))
+        self.assertIn('id=2001', str(query))
+
+    def test_column_projection(self):
+        client = Client(endpoint=endpoint, username=username, password=password)
+        query = Query(client=client, target='table', content='sensors', columns=['parentid', 'tags'])
+        self.assertIn('columns=objid%2Cparentid%2Ctags&', str(query) + '&')
+        query = Query(client=client, target='table', content='sensors', columns=['objid', 'lastvalue', 'message'])
+        self.assertEqual(['objid', 'lastvalue', 'message'], query.columns)
+        with self.assertRaises(BadRequest):
+            Query(client=client, target='table', content='groups', columns=['lastvalue'])
+        with self.assertRaises(BadRequest):
+            Query(client=client, target='table', content='todos', columns=['objid'])
+        query = Query(client=client, target='table', content='channels', objid=1001, columns=['name', 'lastvalue_raw'])
+        self.assertEqual(['objid', 'name', 'lastvalue_raw'], query.columns)
+
+    def test_filters(self):
+        client = Client(endpoint=endpoint, username=username, password=password)
+        query = Query(client=client, target='table', content='sensors', filters=[('name', '@sub(db)')])
+        query.filter_status('Down', 'Warning').filter_tags('db', 'sql').add_filter('lastvalue', 10, 'above')
+        self.assertTrue(str(query).endswith('&filter_name=@sub(db)&filter_status=5&filter_status=4'
+                                            '&filter_tags=@tag(db,sql)&filter_lastvalue=@above(10)'))
+        self.assertEqual(query.filters, query.page(500).filters)
+        with self.assertRaises(BadRequest):
+            query.add_filter('host', 'x')
+        with self.assertRaises(BadRequest):
+            query.add_filter('name', 'x', 'regex')
+        with self.assertRaises(BadTarget):
+            Query(client=client, target='getstatus').filter_status('Down')
+
+    def test_key(self):
+        client = Client(endpoint=endpoint, username=username, password=password)
+        query = Query(client=client, target='table', content='sensors', filters=[('name', 'a'), ('name', 'b')])
+        other = Query(client=client, target='table', content='sensors', filters=[('name', 'b'), ('name', 'a')])
+        self.assertEqual(query.key(), other.key())
+        self.assertNotIn(password, query.key())
+        self.assertNotEqual(query.key(), query.page(500).key())
+        self.assertFalse(Query(client=client, target='setobjectproperty', objid='1', name='n', value='v').read_only)
+
 
 if __name__ == '__main__':
     unittest.main()
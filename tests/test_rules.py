@@ -218,8 +218,23 @@ class TestRuleChain(unittest.TestCase):
         changes = rule_chain.apply(sensor, parent)
         self._assert_sensor_naming_changes('x', 'a (device)', None, sensor, parent, changes)
 
+    def test_pushdown_filters(self):
+        rule_chain = RuleChain(build_tags_rule_dict(True, ['ta']),
+                               build_tags_rule_dict(True, ['tb'], pattern='^b\\.c$'))
+        self.assertEqual([('name', '@sub(a)'), ('name', 'b.c')], rule_chain.pushdown_filters('devices'))
+
+    def test_no_pushdown_filters(self):
+        for pattern in ('^', '^a.*b', '^a|b', '\\d+'):
+            rule_chain = RuleChain(build_tags_rule_dict(True, ['ta'], pattern=pattern))
+            self.assertEqual([], rule_chain.pushdown_filters('devices'))
+        rule_dict = build_tags_rule_dict(True, ['ta'])
+        rule_dict['attribute'] = 'host'
+        rule_chain = RuleChain(build_tags_rule_dict(True, ['tb']), rule_dict)
+        self.assertEqual([], rule_chain.pushdown_filters('devices'))
+        self.assertEqual([], RuleChain(rule_dict).pushdown_filters('groups'))
+
     def _assert_device_tags_and_changes(self, expected_new_value_dict, changed, device, parent, changes):
-        self.assertEqual(list, type(device.tags))
+        self.assertEqual(tuple, type(device.tags))
         self.assertEqual(expected_new_value_dict.union(parent.tags), set(device.tags))
         if changed:
             self.assertEqual({'tags'}, changes.keys())
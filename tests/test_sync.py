@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Unittests for PRTG cache synchronisation
+"""
+
+import unittest
+from prtg.client import Client
+from tests.fake_prtg import FakePrtgServer, build_sensors
+
+
+class TestCacheSync(unittest.TestCase):
+
+    def test_first_sync_is_a_full_sweep(self):
+        with FakePrtgServer(build_sensors(30)) as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            delta = client.sync('sensors')
+            self.assertTrue(delta.full_sweep)
+            self.assertEqual(30, len(delta.added))
+            self.assertEqual(30, len(list(client.cache.get_content('sensors'))))
+
+    def test_delta_sync(self):
+        with FakePrtgServer(build_sensors(30)) as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            client.sync('sensors')
+            items = build_sensors(31)
+            items[7]['tags'] = 'tz'
+            items[8]['message'] = 'not a fingerprint column'
+            del items[5]
+            server.items = items
+            del server.requests[:]
+
+            delta = client.sync('sensors')
+            self.assertFalse(delta.full_sweep)
+            self.assertEqual((['3030'], ['3005'], ['3007']), (delta.added, delta.removed, delta.modified))
+            self.assertEqual(2, len(server.requests))
+            self.assertIn('filter_objid=3030&filter_objid=3007', server.requests[1])
+            self.assertEqual(('tz',), client.cache.get_object('3007').tags)
+            self.assertEqual(30, len(list(client.cache.get_content('sensors'))))
+            with self.assertRaises(KeyError):
+                client.cache.get_object('3005')
+            self.assertFalse(client.sync('sensors'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Unittests for PRTG client-side throttling
+"""
+
+import asyncio
+import unittest
+from urllib.error import HTTPError
+from prtg.client import Client
+from prtg.exceptions import DeadlineExceeded
+from prtg.models import Query
+from prtg.throttle import AimdWindow, Limiter, TokenBucket
+from tests.fake_prtg import FakePrtgServer, build_sensors
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_reserve(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        self.assertEqual(0, bucket.reserve())
+        self.assertEqual(0, bucket.reserve())
+        self.assertAlmostEqual(0.1, bucket.reserve(), places=2)
+        self.assertAlmostEqual(0.2, bucket.reserve(), places=2)
+
+
+class TestAimdWindow(unittest.TestCase):
+
+    def test_additive_increase_multiplicative_decrease(self):
+        window = AimdWindow(maximum=8, initial=4, latency_threshold=1.0)
+        self.assertTrue(all(window.try_acquire() for _ in range(4)))
+        self.assertFalse(window.try_acquire())
+        window.release(0.1)
+        self.assertEqual(4.25, window.window)
+        window.release(0.1, failed=True)
+        self.assertEqual(2.125, window.window)
+        window.release(0.1, failed=True)  # Same round trip: no further decrease.
+        self.assertEqual(2.125, window.window)
+        self.assertEqual(1, window.in_flight)
+
+    def test_latency_signal(self):
+        window = AimdWindow(maximum=8, latency_threshold=1.0)
+        window.acquire()
+        window.release(5.0)
+        self.assertEqual(4, window.window)
+
+    def test_latency_signal_is_opt_in(self):
+        window = AimdWindow(maximum=8)
+        for latency in (0.01, 0.5, 5.0):
+            window.acquire()
+            window.release(latency)
+        self.assertEqual(8, window.window)
+        window = AimdWindow(maximum=8, latency_tolerance=3.0)
+        window.acquire()
+        window.release(0.01)
+        window.acquire()
+        window.release(5.0)
+        self.assertEqual(4, window.window)
+
+
+class TestLimiter(unittest.TestCase):
+
+    def test_request_outcomes(self):
+        limiter = Limiter(max_concurrency=2)
+        with limiter.request():
+            pass
+        with self.assertRaises(HTTPError):
+            with limiter.request():
+                raise HTTPError('http://x', 503, 'Service Unavailable', {}, None)
+        with self.assertRaises(HTTPError):
+            with limiter.request():
+                raise HTTPError('http://x', 404, 'Not Found', {}, None)
+        self.assertEqual((3, 1), (limiter.requests, limiter.failures))
+
+    def test_acquire_timeout(self):
+        limiter = Limiter(rate=1, burst=1, max_concurrency=1)
+        limiter.acquire(0.1)
+        self.assertRaises(DeadlineExceeded, limiter.acquire, 0.1)  # No room in the window.
+        limiter.release(0.01)
+        self.assertRaises(DeadlineExceeded, limiter.acquire, 0.1)  # No token before a second.
+        self.assertEqual(0, limiter.window.in_flight)
+        self.assertLess(limiter.bucket.reserve(), 1)  # The token was given back: only one is owed, not two.
+
+    def test_deadline_inside_a_request_is_a_failure(self):
+        limiter = Limiter(max_concurrency=4)
+        with self.assertRaises(DeadlineExceeded):
+            with limiter.request():
+                raise DeadlineExceeded('No pooled connection')
+        self.assertEqual((1, 1), (limiter.requests, limiter.failures))
+        self.assertEqual(2, limiter.window.window)
+
+    def test_async_waiters_are_woken_up(self):
+        window = AimdWindow(maximum=2)
+
+        async def request(delay):
+            self.assertTrue(await window.acquire_async())
+            await asyncio.sleep(delay)
+            window.release(delay)
+
+        async def run():
+            await asyncio.gather(*[request(0.01) for _ in range(20)])
+            self.assertTrue(window.try_acquire() and window.try_acquire())
+            self.assertFalse(window.try_acquire())
+            self.assertFalse(await window.acquire_async(0.05))
+            waiter = asyncio.ensure_future(window.acquire_async(1))
+            await asyncio.sleep(0)
+            window.cancel()
+            self.assertTrue(await waiter)
+
+        asyncio.run(run())
+        self.assertEqual(2, window.in_flight)
+        self.assertEqual(0, len(window._async_waiters))
+
+    def test_every_query_goes_through_the_limiter(self):
+        with FakePrtgServer(build_sensors(40)) as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p', page_workers=3, rate_limit=1000)
+            client.query(Query(client=client, target='table', content='sensors', maximum=10))
+            client.set_properties([('3000', 'tags', 'x'), ('3001', 'name', 'y')])
+            self.assertEqual(len(server.requests), client.limiter.requests)
+            self.assertEqual(0, client.limiter.window.in_flight)
+
+
+if __name__ == '__main__':
+    unittest.main()
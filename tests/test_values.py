@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Unittests for typed values
+"""
+
+from datetime import datetime
+import unittest
+from prtg.client import Client
+from prtg.models import Query, Sensor, SensorDetails
+from prtg.values import boolean, convert_page, number, ole_date, raw_columns
+from tests.fake_prtg import FakePrtgServer
+
+
+class TestConverters(unittest.TestCase):
+
+    def test_number(self):
+        self.assertEqual(99.9639, number('99.9639%'))
+        self.assertEqual(-3.0, number('-3 msec'))
+        self.assertIsNone(number('n/a'))
+
+    def test_boolean(self):
+        self.assertTrue(boolean('-1'))
+        self.assertFalse(boolean('0'))
+        self.assertTrue(boolean('true'))
+
+    def test_ole_date(self):
+        self.assertEqual(datetime(2010, 11, 29, 13, 12, 17), ole_date('40511.5502[20 s ago]').replace(microsecond=0))
+        self.assertIsNone(ole_date(''))
+
+    def test_raw_columns(self):
+        self.assertEqual(['status_raw', 'lastvalue_raw'], raw_columns(['objid', 'status', 'name', 'lastvalue']))
+
+
+class TestConvertPage(unittest.TestCase):
+
+    def test_raw_and_text(self):
+        sensors = [Sensor(objid='1', status='Up', status_raw='3', lastvalue_raw='99.5000', active='true'),
+                   Sensor(objid='2', status='Down', status_raw='5', lastvalue_raw='', active='false')]
+        convert_page(sensors)
+        self.assertEqual([3, 5], [sensor.status_raw for sensor in sensors])
+        self.assertEqual(99.5, sensors[0].lastvalue_raw)
+        self.assertIsNone(sensors[1].lastvalue_raw)
+        self.assertEqual([True, False], [sensor.active_raw for sensor in sensors])
+        self.assertEqual('Up', sensors[0].status)
+        convert_page(sensors)  # Already typed values are left as they are.
+        self.assertEqual(3, sensors[0].status_raw)
+
+    def test_sensor_details(self):
+        details = SensorDetails(statusid='3', uptime='99.9639%', lastcheck='40511.5501967593[20 s ago]')
+        convert_page([details])
+        self.assertEqual(3, details.statusid_raw)
+        self.assertEqual(99.9639, details.uptime_raw)
+        self.assertEqual(datetime(2010, 11, 29), details.lastcheck_raw.replace(hour=0, minute=0, second=0,
+                                                                               microsecond=0))
+
+
+class TestTypedQuery(unittest.TestCase):
+
+    def test_projection(self):
+        client = Client(endpoint='http://127.0.0.1:8080', username='u', password='p')
+        query = Query(client=client, target='table', content='sensors', columns=['name', 'status', 'lastcheck'],
+                      typed=True)
+        self.assertEqual(['objid', 'name', 'status', 'lastcheck', 'status_raw', 'lastcheck_raw'], query.columns)
+        self.assertEqual(['objid', 'parentid', 'name', 'tags', 'active', 'status'],
+                         Query(client=client, target='table', content='sensors').columns)
+
+    def test_typed_pages(self):
+        with FakePrtgServer() as server:
+            client = Client(endpoint=server.endpoint, username='u', password='p')
+            for output in ('xml', 'json'):
+                query = Query(client=client, target='table', content='sensors', columns=['status', 'lastcheck'],
+                              maximum=10, output=output, typed=True)
+                sensors = list(client.iter_query(query))
+                self.assertEqual(25, len(sensors))
+                self.assertEqual([5, 3], [sensors[0].status_raw, sensors[1].status_raw])
+                self.assertEqual(datetime(2016, 1, 20, 12), sensors[24].lastcheck_raw)
+
+
+if __name__ == '__main__':
+    unittest.main()